@@ -0,0 +1,401 @@
+"""
+Análise de IA dos ativos (comitê Warren/Trader/Viper).
+
+Prompts, fingerprint das entradas e chaves de cache compartilhados por
+`/api/ai/analyze` (main.py), pelo job noturno (batch_analysis.py) e pelo
+benchmark de prompts. Importar este módulo não sobe a API nem carrega modelos.
+"""
+
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, Optional
+import hashlib
+import json
+import math
+import os
+
+from dotenv import load_dotenv
+
+if TYPE_CHECKING:
+    from llm_client import LLMClient
+
+# As variáveis AI_* / CACHE_AI_* podem vir do .env
+load_dotenv()
+
+AI_ANALYSIS_CACHE_TTL = int(os.getenv("CACHE_AI_TTL", str(60 * 60 * 24)))
+# Análises endereçadas pelo conteúdo: reaproveitadas enquanto as entradas não mudarem
+AI_ANALYSIS_REUSE_TTL = int(os.getenv("CACHE_AI_REUSE_TTL", str(60 * 60 * 24 * 7)))
+# Variação relativa (ex.: 0.02 = 2%) abaixo da qual preço/histórico/fundamentos contam como iguais
+AI_ANALYSIS_CHANGE_THRESHOLD = float(os.getenv("AI_ANALYSIS_CHANGE_THRESHOLD", "0.02"))
+# Incrementar ao mudar os prompts de generate_real_ai_analysis (invalida o cache de análises)
+AI_PROMPT_VERSION = "tripla-v2"
+# compact: só os fundamentos citados no prompt, fechamentos amostrados em CSV e resumo técnico
+# pré-calculado; verbose: JSON indentado completo (formato original)
+AI_PROMPT_ENCODING = os.getenv("AI_PROMPT_ENCODING", "compact").lower()
+AI_PROMPT_HISTORY_POINTS = int(os.getenv("AI_PROMPT_HISTORY_POINTS", "45"))
+# Campos de fundamentals referenciados no system prompt (Warren e Viper)
+AI_PROMPT_FUNDAMENTAL_FIELDS = (
+    "indicators_pl",
+    "indicators_pvp",
+    "indicators_roe",
+    "indicators_div_yield",
+    "indicators_roic",
+    "indicators_marg_liquida",
+    "indicators_div_br_patrim",
+    "indicators_cresc_rec",
+    "oscillations_day",
+    "min_52_weeks",
+    "max_52_weeks",
+)
+
+
+def _quantize(value: Any, threshold: float = AI_ANALYSIS_CHANGE_THRESHOLD) -> Any:
+    """
+    Bucket relativo em escala log: valores que diferem menos que `threshold`
+    tendem a cair no mesmo bucket. Não numéricos passam inalterados.
+    """
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return value
+    if not math.isfinite(value):
+        return None
+    if value == 0 or threshold <= 0:
+        return round(value, 6)
+    bucket = round(math.log(abs(value)) / math.log1p(threshold))
+    return bucket if value > 0 else f"-{bucket}"
+
+
+def _history_digest(history: list) -> dict[str, Any]:
+    """Resumo quantizado dos últimos 90 dias (nível, faixa e tendência de 30 dias)."""
+    closes = []
+    for item in history[-90:]:
+        value = item.get("value", item.get("close")) if isinstance(item, dict) else item
+        if isinstance(value, (int, float)) and value > 0:
+            closes.append(float(value))
+    if not closes:
+        return {}
+    base = closes[-30] if len(closes) >= 30 else closes[0]
+    variation_30d = (closes[-1] - base) / base
+    return {
+        "last": _quantize(closes[-1]),
+        "min": _quantize(min(closes)),
+        "max": _quantize(max(closes)),
+        "variation_30d": (
+            round(variation_30d / AI_ANALYSIS_CHANGE_THRESHOLD)
+            if AI_ANALYSIS_CHANGE_THRESHOLD > 0
+            else round(variation_30d, 4)
+        ),
+    }
+
+
+def analysis_fingerprint(
+    symbol: str,
+    current_price: float,
+    history: list,
+    fundamentals: Optional[dict],
+    predictive_signals: Optional[dict],
+) -> str:
+    """
+    Hash das entradas normalizadas do prompt de análise. Entradas que não
+    mudaram materialmente (ver AI_ANALYSIS_CHANGE_THRESHOLD) geram o mesmo hash.
+    """
+    predictive_score = (predictive_signals or {}).get("score")
+    normalized = {
+        "prompt_version": f"{AI_PROMPT_VERSION}:{AI_PROMPT_ENCODING}",
+        "symbol": symbol.upper(),
+        "price": _quantize(current_price),
+        "history": _history_digest(history),
+        "fundamentals": {key: _quantize(value) for key, value in sorted((fundamentals or {}).items())},
+        "predictive_score": round(predictive_score * 2) / 2 if isinstance(predictive_score, (int, float)) else None,
+        "risk_level": (predictive_signals or {}).get("riskLevel"),
+    }
+    raw = json.dumps(normalized, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:24]
+
+
+def price_within_change_threshold(reference_price: Any, current_price: float) -> bool:
+    """Preço atual a menos de AI_ANALYSIS_CHANGE_THRESHOLD (relativo) do preço de referência."""
+    if isinstance(reference_price, bool) or not isinstance(reference_price, (int, float)) or reference_price <= 0:
+        return False
+    return abs(current_price / reference_price - 1) <= AI_ANALYSIS_CHANGE_THRESHOLD
+
+
+def analysis_cache_key(symbol: str, fingerprint: str) -> str:
+    return f"ai_analysis:{symbol.upper()}:{fingerprint}"
+
+
+def latest_analysis_cache_key(symbol: str) -> str:
+    # Ponteiro para a última análise gerada (leitura sem as entradas do prompt)
+    return f"ai_analysis:latest:{symbol.upper()}"
+
+
+def build_analysis_system_prompt(predictive_signals: Optional[dict] = None) -> str:
+    """System prompt do comitê de três analistas (com o score proprietário, se houver)."""
+    predictive_score = predictive_signals.get("score") if predictive_signals else None
+    risk_level = predictive_signals.get("riskLevel") if predictive_signals else None
+    risk_display = risk_level if risk_level else "N/D"
+    score_display = f"{predictive_score:.1f}" if predictive_score is not None else "N/D"
+
+    predictive_section = f"""
+[DADOS INTERNOS TAZE AI]
+Score Proprietário de Buy & Hold (ML): {score_display}/10.
+Risco Calculado: {risk_display}.
+INSTRUÇÃO: Você deve considerar nosso Score Proprietário na sua análise 'Warren'. Se o score for alto (>7), seja otimista citando "nossos modelos matemáticos". Se for baixo (<4), seja pessimista e mencione que "nossos modelos matemáticos" detectam risco elevado.
+"""
+    
+    # System Prompt Mestre (TRÊS analistas)
+    system_prompt = f"""Você é um comitê de TRÊS analistas financeiros de elite:
+
+1. **Analista Fundamentalista (Warren):** Focado em 'Buy & Hold' (longo prazo, anos).
+   Você ignora volatilidade diária. Sua análise foca EXCLUSIVAMENTE em fundamentalismo (P/L, P/VP, ROE, Dividend Yield e Dívida).
+   
+   **CAMPOS DISPONÍVEIS NOS DADOS:**
+   - indicators_pl (P/L - Preço/Lucro)
+   - indicators_pvp (P/VP - Preço/Valor Patrimonial)
+   - indicators_roe (ROE - Retorno sobre Patrimônio)
+   - indicators_div_yield (Dividend Yield %)
+   - indicators_roic (ROIC %)
+   - indicators_marg_liquida (Margem Líquida %)
+   - indicators_div_br_patrim (Dívida Bruta/Patrimônio)
+   - indicators_cresc_rec (Crescimento de Receita %)
+
+2. **Analista Técnico (Trader):** Focado em 'Swing Trade' (médio prazo, semanas/meses).
+   Você usa o histórico de 90 dias para identificar tendências, médias móveis, suporte e resistência.
+
+3. **Analista de Volatilidade (Viper):** Focado em 'Day Trade' (curto prazo, 1-2 dias).
+   Você analisa a volatilidade, oscillations_day e os min_52_weeks/max_52_weeks para oportunidades rápidas.
+
+{predictive_section}
+
+**REGRA CRÍTICA DE LÓGICA:** Sua análise técnica (suporte/resistência) DEVE ser 100% coerente com o currentPrice (preço atual) fornecido.
+Nunca diga que uma resistência (teto) é MENOR que o preço atual. Use o currentPrice como sua âncora para definir suportes (abaixo) e resistências (acima).
+
+**Sua tarefa:** Analisar os dados fornecidos e retornar um JSON ESTRITO:
+
+{{
+  "buy_and_hold_score": 7.5,
+  "buy_and_hold_summary": "Análise fundamentalista (1-2 frases).",
+  "swing_trade_score": 8.0,
+  "swing_trade_summary": "Análise técnica de médio prazo (1-2 frases).",
+  "day_trade_score": 6.5,
+  "day_trade_summary": "Análise de volatilidade de curto prazo (1-2 frases).",
+  "recommendation": "COMPRA FORTE"
+}}
+
+**Critérios de Score:**
+- 0-3: Ruim (evitar)
+- 4-5: Fraco (cautela)
+- 6-7: Razoável (considerar)
+- 8-9: Bom (recomendado)
+- 10: Excelente (altamente recomendado)
+
+**Opções de Recommendation:**
+COMPRA FORTE | COMPRA | MANTER | VENDA
+
+RETORNE APENAS O JSON, SEM TEXTO ADICIONAL."""
+    return system_prompt
+
+
+def _format_number(value: Any) -> str:
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return str(value)
+    return f"{value:.4g}" if abs(value) < 1000 else f"{value:.0f}"
+
+
+def summarize_history(history: list) -> dict[str, Any]:
+    """Estatísticas pré-calculadas do histórico (médias, faixa, tendência, volatilidade)."""
+    closes = []
+    for item in history:
+        value = item.get("value", item.get("close")) if isinstance(item, dict) else item
+        if isinstance(value, (int, float)) and value > 0:
+            closes.append(float(value))
+    if not closes:
+        return {}
+
+    returns = [current / previous - 1 for previous, current in zip(closes, closes[1:])]
+    mean_return = sum(returns) / len(returns) if returns else 0.0
+    volatility = (
+        math.sqrt(sum((r - mean_return) ** 2 for r in returns) / (len(returns) - 1))
+        if len(returns) > 1
+        else 0.0
+    )
+    base_30d = closes[-30] if len(closes) >= 30 else closes[0]
+    return {
+        "ma20": sum(closes[-20:]) / len(closes[-20:]),
+        "ma50": sum(closes[-50:]) / len(closes[-50:]),
+        "min": min(closes),
+        "max": max(closes),
+        "variation_30d_pct": (closes[-1] / base_30d - 1) * 100,
+        "daily_volatility_pct": volatility * 100,
+    }
+
+
+def _sample_history(history: list, points: int) -> list:
+    """Amostra uniforme do histórico preservando sempre o último pregão."""
+    if points <= 0 or len(history) <= points:
+        return list(history)
+    step = math.ceil(len(history) / points)
+    return list(reversed(history[::-1][::step]))
+
+
+def build_analysis_user_prompt(
+    symbol: str,
+    currentPrice: float,
+    sector: str,
+    fundamentals: dict,
+    history: list,
+    encoding: Optional[str] = None,
+) -> str:
+    """
+    User prompt com os dados do ativo. `compact` (padrão) envia só o que o system
+    prompt usa; `verbose` mantém o JSON indentado completo.
+    """
+    encoding = (encoding or AI_PROMPT_ENCODING).lower()
+    history = history[-90:]
+
+    if encoding == "verbose":
+        return f"""Analise esta ação da B3:
+
+**AÇÃO:** {symbol}
+**SETOR:** {sector}
+**PREÇO ATUAL:** R$ {currentPrice:.2f}
+
+**DADOS FUNDAMENTALISTAS:**
+```json
+{json.dumps(fundamentals, indent=2, ensure_ascii=False)}
+```
+
+**HISTÓRICO DE PREÇOS (últimos 90 dias):**
+```json
+{json.dumps(history, indent=2, ensure_ascii=False)}
+```
+
+Analise estes dados e retorne o JSON conforme especificado."""
+
+    fundamentals = fundamentals or {}
+    fundamentals_line = "; ".join(
+        f"{field}={_format_number(fundamentals[field])}"
+        for field in AI_PROMPT_FUNDAMENTAL_FIELDS
+        if field not in ("min_52_weeks", "max_52_weeks") and fundamentals.get(field) not in (None, "")
+    ) or "N/D"
+
+    # mín/máx do resumo técnico são da janela de 90 dias enviada; a faixa de 52
+    # semanas vem dos fundamentos (min_52_weeks/max_52_weeks), citada pelo Viper
+    stats = summarize_history(history)
+    stats_line = (
+        f"MM20={stats['ma20']:.2f}; MM50={stats['ma50']:.2f}; mín90d={stats['min']:.2f}; máx90d={stats['max']:.2f}; "
+        f"var30d={stats['variation_30d_pct']:+.1f}%; volatilidade diária={stats['daily_volatility_pct']:.2f}%"
+        if stats
+        else "N/D"
+    )
+
+    low_52w, high_52w = fundamentals.get("min_52_weeks"), fundamentals.get("max_52_weeks")
+    range_52w = (
+        f"R$ {_format_number(low_52w)}–{_format_number(high_52w)}"
+        if low_52w not in (None, "") and high_52w not in (None, "")
+        else "N/D"
+    )
+
+    sampled = _sample_history(history, AI_PROMPT_HISTORY_POINTS)
+    closes_csv = ",".join(
+        f"{float(item.get('value', item.get('close', 0))):.2f}" for item in sampled if isinstance(item, dict)
+    )
+    period = f"{sampled[0].get('date', '?')}→{sampled[-1].get('date', '?')}" if sampled else "N/D"
+    step_days = math.ceil(len(history) / len(sampled)) if sampled else 1
+
+    return f"""Analise esta ação da B3:
+
+**AÇÃO:** {symbol} | **SETOR:** {sector} | **PREÇO ATUAL:** R$ {currentPrice:.2f}
+**FUNDAMENTOS:** {fundamentals_line}
+**RESUMO TÉCNICO (90d):** {stats_line}
+**FAIXA 52 SEMANAS (fundamentos):** {range_52w}
+**FECHAMENTOS ({period}, 1 a cada {step_days} pregão(ões), R$):** {closes_csv or "N/D"}
+
+Analise estes dados e retorne o JSON conforme especificado."""
+
+
+async def generate_real_ai_analysis(
+    client: "LLMClient",
+    symbol: str,
+    currentPrice: float,
+    sector: str,
+    fundamentals: dict,
+    history: list,
+    predictive_signals: Optional[dict] = None,
+) -> dict:
+    """
+    Gera análise de IA REAL usando OpenAI GPT-4o
+    
+    Utiliza TRÊS perfis de analistas:
+    1. Fundamentalista (Warren) - Buy & Hold
+    2. Técnico (Trader) - Swing Trade
+    3. Volatilidade (Viper) - Day Trade
+    
+    Retorna JSON estruturado com scores e recomendações.
+    `client` é o LLMClient do processo chamador (API ou job noturno).
+    """
+    system_prompt = build_analysis_system_prompt(predictive_signals)
+    user_prompt = build_analysis_user_prompt(symbol, currentPrice, sector, fundamentals, history)
+
+    try:
+        print(f"[AI] Gerando análise REAL para {symbol} usando GPT-4o...")
+        
+        # Chamar OpenAI GPT-4o
+        response = await client.chat_completion(
+            model="gpt-4o",
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            response_format={"type": "json_object"},  # Força resposta JSON
+            temperature=0.7,  # Criatividade moderada
+            max_tokens=1200   # Limite de tokens
+        )
+        
+        # Extrair JSON da resposta
+        ai_response = json.loads(response.choices[0].message.content)
+        
+        print(f"[AI] Análise gerada com sucesso para {symbol}")
+        print(f"[AI] Scores: Buy&Hold={ai_response.get('buy_and_hold_score')}, SwingTrade={ai_response.get('swing_trade_score')}, DayTrade={ai_response.get('day_trade_score')}")
+        
+        # Validar campos obrigatórios
+        required_fields = [
+            "buy_and_hold_score", 
+            "buy_and_hold_summary",
+            "swing_trade_score",
+            "swing_trade_summary",
+            "day_trade_score",
+            "day_trade_summary",
+            "recommendation"
+        ]
+        
+        for field in required_fields:
+            if field not in ai_response:
+                raise ValueError(f"Campo obrigatório ausente: {field}")
+        
+        # Retornar resposta estruturada
+        return {
+            "symbol": symbol,
+            "buyAndHoldScore": float(ai_response["buy_and_hold_score"]),
+            "buyAndHoldSummary": ai_response["buy_and_hold_summary"],
+            "swingTradeScore": float(ai_response["swing_trade_score"]),
+            "swingTradeSummary": ai_response["swing_trade_summary"],
+            "dayTradeScore": float(ai_response["day_trade_score"]),
+            "dayTradeSummary": ai_response["day_trade_summary"],
+            "recommendation": ai_response["recommendation"],
+            "generatedAt": datetime.now().isoformat()
+        }
+        
+    except Exception as e:
+        print(f"[AI ERROR] Erro ao gerar análise: {e}")
+        # Fallback: retornar análise básica
+        return {
+            "symbol": symbol,
+            "buyAndHoldScore": 5.0,
+            "buyAndHoldSummary": f"Erro ao gerar análise fundamentalista. Tente novamente. Erro: {str(e)[:100]}",
+            "swingTradeScore": 5.0,
+            "swingTradeSummary": f"Erro ao gerar análise técnica. Tente novamente. Erro: {str(e)[:100]}",
+            "dayTradeScore": 5.0,
+            "dayTradeSummary": f"Erro ao gerar análise de volatilidade. Tente novamente. Erro: {str(e)[:100]}",
+            "recommendation": "MANTER",
+            "generatedAt": datetime.now().isoformat(),
+            "error": True
+        }
@@ -0,0 +1,273 @@
+"""
+Job noturno de análises de IA.
+
+Roda depois do `ml.inference`: gera a análise TRIPLA (Warren/Trader/Viper) de
+todos os ativos de `settings.tickers`, grava no cache com as mesmas chaves de
+`/api/ai/analyze` e no campo `aiAnalysis` da tabela Signal. Durante o dia as
+leituras viram cache hit puro: como as entradas ao vivo (Brapi/Tradebox) geram
+outro fingerprint, `/api/ai/analyze` cai no ponteiro `latest` marcado com
+`source: batch` enquanto o preço ao vivo não se afastar mais que
+AI_ANALYSIS_CHANGE_THRESHOLD do preço usado à noite. Exige Redis (REDIS_URL): sem ele só a tabela Signal é gravada.
+
+Uso (a partir da raiz do repositório):
+    python backend/batch_analysis.py [--tickers PETR4 VALE3] [--concurrency 3] [--restart] [--strict]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Optional
+
+# Raiz do repositório no path antes dos módulos locais (ml.*, llm_client)
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.append(str(ROOT_DIR))
+
+from ai_analysis import (
+    AI_ANALYSIS_CACHE_TTL,
+    AI_ANALYSIS_REUSE_TTL,
+    analysis_cache_key,
+    analysis_fingerprint,
+    generate_real_ai_analysis,
+    latest_analysis_cache_key,
+)
+from cache_manager import CacheManager
+from llm_client import LLMClient
+from ml.config import settings
+from ml.inference import analyze_market, classify_risk
+
+AI_BATCH_CONCURRENCY = int(os.getenv("AI_BATCH_CONCURRENCY", "3"))
+AI_BATCH_RETRIES = int(os.getenv("AI_BATCH_RETRIES", "3"))
+AI_BATCH_BACKOFF_SECONDS = float(os.getenv("AI_BATCH_BACKOFF_SECONDS", "2"))
+
+# Clientes próprios do job: importar main subiria a API inteira (e o modelo)
+cache = CacheManager()
+openai_client = LLMClient(api_key=os.getenv("OPENAI_API_KEY"))
+
+
+def current_iso_timestamp() -> str:
+    return datetime.now().isoformat()
+
+
+class BatchCheckpoint:
+    """
+    Progresso do dia em JSON (gold/ai_batch/AAAA-MM-DD.json). Uma execução
+    interrompida retoma dos ativos que ainda não foram concluídos.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.state: dict[str, Any] = {"done": {}, "failed": {}}
+        if path.exists():
+            try:
+                self.state = json.loads(path.read_text(encoding="utf-8"))
+            except (OSError, ValueError) as exc:
+                print(f"[AI BATCH] Checkpoint ilegível ({exc}). Recomeçando do zero.")
+        self.state.setdefault("done", {})
+        self.state.setdefault("failed", {})
+
+    def is_done(self, symbol: str) -> bool:
+        return symbol in self.state["done"]
+
+    def mark_done(self, symbol: str, fingerprint: str) -> None:
+        self.state["done"][symbol] = {"fingerprint": fingerprint, "at": current_iso_timestamp()}
+        self.state["failed"].pop(symbol, None)
+        self.save()
+
+    def mark_failed(self, symbol: str, error: str) -> None:
+        self.state["failed"][symbol] = {"error": error, "at": current_iso_timestamp()}
+        self.save()
+
+    def save(self) -> None:
+        # Escrita atômica: um kill no meio não corrompe o checkpoint
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(self.state, indent=2, ensure_ascii=False), encoding="utf-8")
+        tmp_path.replace(self.path)
+
+
+def format_analysis_text(analysis: dict[str, Any]) -> str:
+    """Texto curto para a coluna aiAnalysis (exibido no /admin)."""
+    return (
+        f"{analysis.get('recommendation', 'MANTER')} | "
+        f"Warren {analysis.get('buyAndHoldScore', 0):.1f}: {analysis.get('buyAndHoldSummary', '')} | "
+        f"Trader {analysis.get('swingTradeScore', 0):.1f}: {analysis.get('swingTradeSummary', '')} | "
+        f"Viper {analysis.get('dayTradeScore', 0):.1f}: {analysis.get('dayTradeSummary', '')}"
+    )
+
+
+async def generate_with_retries(signal: dict[str, Any], predictive_signals: dict[str, Any], retries: int) -> Optional[dict]:
+    symbol = signal["symbol"]
+    fundamentals = signal.get("fundamentals") or {}
+    sector = (signal.get("stock_metadata") or {}).get("sector") or fundamentals.get("sector") or "N/A"
+
+    for attempt in range(1, retries + 1):
+        analysis = await generate_real_ai_analysis(
+            openai_client,
+            symbol=symbol,
+            currentPrice=float(signal.get("current_price") or 0.0),
+            sector=sector,
+            fundamentals=fundamentals,
+            history=signal.get("history") or [],
+            predictive_signals=predictive_signals,
+        )
+        if not analysis.get("error"):
+            return analysis
+        if attempt < retries:
+            delay = AI_BATCH_BACKOFF_SECONDS * (2 ** (attempt - 1)) * random.uniform(0.8, 1.2)
+            print(f"[AI BATCH] {symbol}: tentativa {attempt}/{retries} falhou. Nova tentativa em {delay:.1f}s.")
+            await asyncio.sleep(delay)
+    return None
+
+
+def persist_signal(signal: dict[str, Any], ai_text: str) -> None:
+    from ml.db_client import save_signals, update_signal_ai_analysis
+
+    if not update_signal_ai_analysis(signal["symbol"], signal.get("analysis_date"), ai_text):
+        # Sem o Signal do ml.inference (ex.: inferência rodou sem banco): insere um novo
+        save_signals([{**signal, "ai_analysis": ai_text}])
+
+
+async def process_signal(
+    signal: dict[str, Any],
+    checkpoint: BatchCheckpoint,
+    semaphore: asyncio.Semaphore,
+    retries: int,
+    skip_db: bool,
+) -> bool:
+    symbol = signal["symbol"]
+    if checkpoint.is_done(symbol):
+        print(f"[AI BATCH] {symbol}: já concluído neste checkpoint.")
+        return True
+
+    async with semaphore:
+        volatility = float(signal.get("volatility") or 0.02)
+        predictive_signals = {
+            "score": signal.get("score"),
+            "riskLevel": classify_risk(volatility),
+            "riskValue": volatility,
+        }
+        fingerprint = analysis_fingerprint(
+            symbol,
+            float(signal.get("current_price") or 0.0),
+            signal.get("history") or [],
+            signal.get("fundamentals"),
+            predictive_signals,
+        )
+        cache_key = analysis_cache_key(symbol, fingerprint)
+        current_price = float(signal.get("current_price") or 0.0)
+
+        entry = await cache.get(cache_key)
+        if entry and entry.get("analysis"):
+            print(f"[AI BATCH] {symbol}: entradas sem mudança material, reaproveitando {cache_key}.")
+            entry = {**entry, "source": "batch", "price": current_price}
+        else:
+            analysis = await generate_with_retries(signal, predictive_signals, retries)
+            if analysis is None:
+                checkpoint.mark_failed(symbol, "GPT-4o falhou em todas as tentativas")
+                return False
+            entry = {
+                "analysis": analysis,
+                "timestamp": current_iso_timestamp(),
+                "fingerprint": fingerprint,
+                # /api/ai/analyze reaproveita pelo ponteiro latest (fingerprints do dia diferem)
+                # enquanto o preço ao vivo ficar dentro do limiar deste
+                "source": "batch",
+                "price": current_price,
+            }
+            await cache.set(cache_key, entry, AI_ANALYSIS_REUSE_TTL)
+        await cache.set(latest_analysis_cache_key(symbol), entry, AI_ANALYSIS_CACHE_TTL)
+
+        if not skip_db:
+            try:
+                await asyncio.to_thread(persist_signal, signal, format_analysis_text(entry["analysis"]))
+            except Exception as exc:
+                print(f"[AI BATCH] {symbol}: falha ao gravar Signal ({exc}).")
+                checkpoint.mark_failed(symbol, f"db: {exc}")
+                return False
+
+        checkpoint.mark_done(symbol, fingerprint)
+        print(f"[AI BATCH] {symbol}: análise pronta ({entry['analysis'].get('recommendation')}).")
+        return True
+
+
+async def run_batch(
+    signals: list[dict[str, Any]],
+    checkpoint: BatchCheckpoint,
+    concurrency: int,
+    retries: int,
+    skip_db: bool,
+) -> tuple[int, int]:
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    try:
+        if not await cache.ping():
+            # Sem Redis, cache.set grava na memória deste processo e se perde no exit
+            if skip_db:
+                print("[AI BATCH] Redis indisponível (REDIS_URL ausente ou fora do ar) e --skip-db: nada seria persistido.")
+                raise SystemExit(2)
+            print("[AI BATCH] AVISO: Redis indisponível. As análises vão só para a tabela Signal; a API não as verá no cache.")
+        results = await asyncio.gather(
+            *(process_signal(signal, checkpoint, semaphore, retries, skip_db) for signal in signals),
+            return_exceptions=True,
+        )
+    finally:
+        await openai_client.close()
+        await cache.close()
+
+    for signal, result in zip(signals, results):
+        if isinstance(result, Exception):
+            print(f"[AI BATCH] {signal['symbol']}: erro inesperado ({result}).")
+            checkpoint.mark_failed(signal["symbol"], str(result))
+    succeeded = sum(1 for result in results if result is True)
+    return succeeded, len(signals) - succeeded
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Gera as análises de IA de toda a watchlist (job noturno)")
+    parser.add_argument("--tickers", nargs="*", help="Ativos (default: settings.tickers).")
+    parser.add_argument("--concurrency", type=int, default=AI_BATCH_CONCURRENCY, help="Análises simultâneas.")
+    parser.add_argument("--retries", type=int, default=AI_BATCH_RETRIES, help="Tentativas por ativo.")
+    parser.add_argument("--restart", action="store_true", help="Ignora o checkpoint do dia.")
+    parser.add_argument("--skip-db", action="store_true", help="Grava só no cache (sem tabela Signal).")
+    parser.add_argument(
+        "--strict",
+        action="store_true",
+        help="Sai com código 1 se algum ativo falhar (por padrão a falha parcial só é reportada).",
+    )
+    args = parser.parse_args()
+
+    tickers = [ticker.upper() for ticker in args.tickers] if args.tickers else settings.tickers
+    checkpoint_path = settings.gold_dir / "ai_batch" / f"{datetime.now().strftime('%Y-%m-%d')}.json"
+    if args.restart and checkpoint_path.exists():
+        checkpoint_path.unlink()
+    checkpoint = BatchCheckpoint(checkpoint_path)
+
+    pending = [ticker for ticker in tickers if not checkpoint.is_done(ticker)]
+    print(f"[AI BATCH] {len(tickers) - len(pending)} ativos já concluídos, {len(pending)} pendentes.")
+    if not pending:
+        return
+
+    signals = analyze_market(pending)
+    missing = sorted(set(pending) - {signal["symbol"] for signal in signals})
+    if missing:
+        print(f"[AI BATCH] Sem dados silver para: {', '.join(missing)}")
+
+    succeeded, failed = asyncio.run(
+        run_batch(signals, checkpoint, args.concurrency, args.retries, args.skip_db)
+    )
+    print(f"[AI BATCH] Concluído: {succeeded} ok, {failed} com falha. Checkpoint em {checkpoint_path}")
+    if failed:
+        # Execução parcial é esperada: os pendentes entram na próxima rodada pelo checkpoint
+        for symbol, info in sorted(checkpoint.state["failed"].items()):
+            print(f"[AI BATCH] Falhou: {symbol} ({info.get('error')})")
+        if args.strict:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Benchmark dos modos de prompt de generate_real_ai_analysis (verbose x compact).
+
+Monta os dois prompts para os ativos informados (entradas do ml.inference,
+as mesmas do job noturno) e reporta tokens de entrada. Com --live, chama o
+GPT-4o nos dois modos e reporta latência e tokens cobrados (usage).
+
+Uso (a partir da raiz do repositório):
+    python backend/benchmark_prompt.py --tickers PETR4 VALE3 [--live]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable
+
+# Raiz do repositório no path antes dos módulos locais (ml.*, llm_client)
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+    sys.path.append(str(ROOT_DIR))
+
+from ai_analysis import build_analysis_system_prompt, build_analysis_user_prompt
+from llm_client import LLMClient
+from ml.inference import analyze_market, classify_risk
+
+ENCODINGS = ("verbose", "compact")
+
+openai_client = LLMClient(api_key=os.getenv("OPENAI_API_KEY"))
+
+
+def get_token_counter() -> tuple[Callable[[str], int], str]:
+    try:
+        import tiktoken  # type: ignore
+
+        encoder = tiktoken.get_encoding("o200k_base")  # tokenizer do gpt-4o
+        return (lambda text: len(encoder.encode(text))), "tiktoken/o200k_base"
+    except Exception:
+        # Aproximação sem tiktoken: ~4 caracteres por token
+        return (lambda text: max(1, len(text) // 4)), "estimativa (caracteres/4)"
+
+
+def build_prompts(signal: dict[str, Any], encoding: str) -> tuple[str, str]:
+    volatility = float(signal.get("volatility") or 0.02)
+    predictive_signals = {"score": signal.get("score"), "riskLevel": classify_risk(volatility)}
+    fundamentals = signal.get("fundamentals") or {}
+    sector = (signal.get("stock_metadata") or {}).get("sector") or "N/A"
+    system_prompt = build_analysis_system_prompt(predictive_signals)
+    user_prompt = build_analysis_user_prompt(
+        signal["symbol"],
+        float(signal.get("current_price") or 0.0),
+        sector,
+        fundamentals,
+        signal.get("history") or [],
+        encoding=encoding,
+    )
+    return system_prompt, user_prompt
+
+
+async def measure_live(system_prompt: str, user_prompt: str) -> dict[str, Any]:
+    started = time.perf_counter()
+    response = await openai_client.chat_completion(
+        model="gpt-4o",
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt},
+        ],
+        response_format={"type": "json_object"},
+        temperature=0.7,
+        max_tokens=1200,
+    )
+    latency = time.perf_counter() - started
+    usage = response.usage
+    return {
+        "latency_s": round(latency, 2),
+        "prompt_tokens": usage.prompt_tokens if usage else None,
+        "completion_tokens": usage.completion_tokens if usage else None,
+    }
+
+
+async def run_benchmark(signals: list[dict[str, Any]], live: bool) -> list[dict[str, Any]]:
+    count_tokens, counter_name = get_token_counter()
+    print(f"[BENCH] Contagem de tokens: {counter_name}")
+
+    rows: list[dict[str, Any]] = []
+    try:
+        for signal in signals:
+            for encoding in ENCODINGS:
+                system_prompt, user_prompt = build_prompts(signal, encoding)
+                row: dict[str, Any] = {
+                    "symbol": signal["symbol"],
+                    "encoding": encoding,
+                    "user_tokens": count_tokens(user_prompt),
+                    "total_tokens": count_tokens(system_prompt) + count_tokens(user_prompt),
+                }
+                if live:
+                    row.update(await measure_live(system_prompt, user_prompt))
+                rows.append(row)
+    finally:
+        await openai_client.close()
+    return rows
+
+
+def print_report(rows: list[dict[str, Any]], live: bool) -> None:
+    header = f"{'ATIVO':<8}{'MODO':<10}{'TOKENS USER':>12}{'TOKENS TOTAL':>14}"
+    if live:
+        header += f"{'LATÊNCIA (s)':>14}{'PROMPT (API)':>14}"
+    print(header)
+    for row in rows:
+        line = f"{row['symbol']:<8}{row['encoding']:<10}{row['user_tokens']:>12}{row['total_tokens']:>14}"
+        if live:
+            line += f"{row['latency_s']:>14.2f}{str(row['prompt_tokens']):>14}"
+        print(line)
+
+    for encoding in ENCODINGS:
+        subset = [row for row in rows if row["encoding"] == encoding]
+        if not subset:
+            continue
+        avg_tokens = sum(row["total_tokens"] for row in subset) / len(subset)
+        summary = f"[BENCH] {encoding}: média {avg_tokens:.0f} tokens de entrada"
+        if live:
+            avg_latency = sum(row["latency_s"] for row in subset) / len(subset)
+            summary += f", latência média {avg_latency:.2f}s"
+        print(summary)
+
+    verbose_total = sum(row["total_tokens"] for row in rows if row["encoding"] == "verbose")
+    compact_total = sum(row["total_tokens"] for row in rows if row["encoding"] == "compact")
+    if verbose_total:
+        print(f"[BENCH] Redução de tokens (compact x verbose): {(1 - compact_total / verbose_total) * 100:.1f}%")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark de tokens/latência dos prompts de análise")
+    parser.add_argument("--tickers", nargs="*", default=["PETR4", "VALE3", "BBAS3"], help="Ativos avaliados.")
+    parser.add_argument("--live", action="store_true", help="Chama o GPT-4o e mede latência (gera custo).")
+    parser.add_argument("--json", action="store_true", help="Imprime o resultado em JSON.")
+    args = parser.parse_args()
+
+    signals = analyze_market([ticker.upper() for ticker in args.tickers])
+    if not signals:
+        print("[BENCH] Nenhum ativo com dados silver. Rode `python -m ml.ingest` antes.")
+        return
+
+    rows = asyncio.run(run_benchmark(signals, args.live))
+    if args.json:
+        print(json.dumps(rows, indent=2, ensure_ascii=False))
+    else:
+        print_report(rows, args.live)
+
+
+if __name__ == "__main__":
+    main()
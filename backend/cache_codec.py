@@ -0,0 +1,157 @@
+import json
+import os
+import zlib
+from typing import Any, Callable
+
+# Cabeçalho das entradas versionadas: MAGIC + id do serializer + id da compressão.
+# Entradas sem o cabeçalho são JSON texto puro (formato anterior) e continuam legíveis.
+MAGIC = b"TZ1"
+
+SERIALIZER_IDS = {"json": 1, "orjson": 2, "msgpack": 3}
+COMPRESSION_IDS = {"none": 0, "zlib": 1, "zstd": 2, "lz4": 3}
+SERIALIZER_NAMES = {value: name for name, value in SERIALIZER_IDS.items()}
+COMPRESSION_NAMES = {value: name for name, value in COMPRESSION_IDS.items()}
+
+
+def _json_dumps(value: Any) -> bytes:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _json_loads(raw: bytes) -> Any:
+    return json.loads(raw)
+
+
+def _load_serializer(name: str) -> tuple[Callable[[Any], bytes], Callable[[bytes], Any]]:
+    if name == "orjson":
+        import orjson  # type: ignore
+
+        # Chaves não-str (ex.: int) viram string, como no json da stdlib
+        return (lambda value: orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)), orjson.loads
+    if name == "msgpack":
+        import msgpack  # type: ignore
+
+        return (
+            lambda value: msgpack.packb(value, use_bin_type=True),
+            lambda raw: msgpack.unpackb(raw, raw=False),
+        )
+    return _json_dumps, _json_loads
+
+
+def _load_compression(name: str) -> tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]:
+    if name == "zstd":
+        import zstandard  # type: ignore
+
+        compressor = zstandard.ZstdCompressor(level=3)
+        decompressor = zstandard.ZstdDecompressor()
+        return compressor.compress, decompressor.decompress
+    if name == "lz4":
+        import lz4.frame  # type: ignore
+
+        return lz4.frame.compress, lz4.frame.decompress
+    if name == "zlib":
+        return (lambda raw: zlib.compress(raw, 6)), zlib.decompress
+    return (lambda raw: raw), (lambda raw: raw)
+
+
+class CacheCodec:
+    """
+    Serialização dos valores gravados no Redis.
+
+    O serializer (`CACHE_SERIALIZER`: json | orjson | msgpack) e a compressão
+    (`CACHE_COMPRESSION`: none | zlib | zstd | lz4, aplicada acima de
+    `CACHE_COMPRESS_MIN_BYTES`) são escolhidos por env. Cada entrada carrega um
+    cabeçalho com os ids usados, então mudar a configuração não invalida o que
+    já está no cache. Bibliotecas opcionais ausentes caem para json / sem compressão.
+    """
+
+    def __init__(
+        self,
+        serializer: str | None = None,
+        compression: str | None = None,
+        compress_min_bytes: int | None = None,
+    ) -> None:
+        serializer = (serializer or os.getenv("CACHE_SERIALIZER", "json")).lower()
+        compression = (compression or os.getenv("CACHE_COMPRESSION", "none")).lower()
+        self.compress_min_bytes = (
+            compress_min_bytes
+            if compress_min_bytes is not None
+            else int(os.getenv("CACHE_COMPRESS_MIN_BYTES", "4096"))
+        )
+
+        if serializer not in SERIALIZER_IDS:
+            print(f"[CACHE] Serializer desconhecido '{serializer}'. Usando json.")
+            serializer = "json"
+        if compression not in COMPRESSION_IDS:
+            print(f"[CACHE] Compressão desconhecida '{compression}'. Usando none.")
+            compression = "none"
+
+        try:
+            self._dumps, _ = _load_serializer(serializer)
+        except ImportError:
+            print(f"[CACHE] Serializer '{serializer}' não instalado. Usando json.")
+            serializer = "json"
+            self._dumps, _ = _load_serializer(serializer)
+        try:
+            self._compress, _ = _load_compression(compression)
+        except ImportError:
+            print(f"[CACHE] Compressão '{compression}' não instalada. Gravando sem compressão.")
+            compression = "none"
+            self._compress, _ = _load_compression(compression)
+
+        self.serializer = serializer
+        self.compression = compression
+        # Decoders carregados sob demanda: {id: função}
+        self._loads_by_id: dict[int, Callable[[bytes], Any]] = {}
+        self._decompress_by_id: dict[int, Callable[[bytes], bytes]] = {}
+
+    def encode(self, value: Any) -> bytes:
+        serializer = self.serializer
+        try:
+            payload = self._dumps(value)
+        except (TypeError, ValueError, OverflowError):
+            if serializer == "json":
+                raise
+            # orjson/msgpack recusam o que o json aceita (ex.: inteiros acima de 64 bits):
+            # a entrada vai em json, e o cabeçalho registra isso para a leitura.
+            serializer = "json"
+            payload = _json_dumps(value)
+        compression = "none"
+        if self.compression != "none" and len(payload) >= self.compress_min_bytes:
+            payload = self._compress(payload)
+            compression = self.compression
+        header = MAGIC + bytes((SERIALIZER_IDS[serializer], COMPRESSION_IDS[compression]))
+        return header + payload
+
+    def decode(self, raw: bytes | str) -> Any:
+        if isinstance(raw, str):
+            raw = raw.encode("utf-8")
+        if not raw.startswith(MAGIC) or len(raw) < len(MAGIC) + 2:
+            # Formato legado: JSON texto sem cabeçalho
+            return json.loads(raw)
+
+        serializer_id = raw[len(MAGIC)]
+        compression_id = raw[len(MAGIC) + 1]
+        payload = raw[len(MAGIC) + 2:]
+        if compression_id:
+            payload = self._decompressor(compression_id)(payload)
+        return self._loader(serializer_id)(payload)
+
+    def _loader(self, serializer_id: int) -> Callable[[bytes], Any]:
+        loads = self._loads_by_id.get(serializer_id)
+        if loads is None:
+            name = SERIALIZER_NAMES.get(serializer_id)
+            if name is None:
+                raise ValueError(f"Serializer desconhecido no cabeçalho: {serializer_id}")
+            _, loads = _load_serializer(name)
+            self._loads_by_id[serializer_id] = loads
+        return loads
+
+    def _decompressor(self, compression_id: int) -> Callable[[bytes], bytes]:
+        decompress = self._decompress_by_id.get(compression_id)
+        if decompress is None:
+            name = COMPRESSION_NAMES.get(compression_id)
+            if name is None:
+                raise ValueError(f"Compressão desconhecida no cabeçalho: {compression_id}")
+            _, decompress = _load_compression(name)
+            self._decompress_by_id[compression_id] = decompress
+        return decompress
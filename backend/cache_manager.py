@@ -1,7 +1,14 @@
-import json
+import asyncio
 import os
+import random
+import sys
+import time
+import uuid
+from collections import OrderedDict, deque
 from datetime import datetime, timedelta
-from typing import Any, Optional
+from typing import Any, Awaitable, Callable, Optional
+
+from cache_codec import CacheCodec
 
 try:
     import redis.asyncio as redis  # type: ignore
@@ -9,6 +16,263 @@ except ImportError:  # pragma: no cover - Redis opcional no ambiente local
     redis = None
 
 
+# Libera o lease apenas se ele ainda pertence a quem o criou
+_RELEASE_LEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+# Adquire o lease se estiver livre ou renova se já pertence ao mesmo dono
+_HOLD_LEASE_SCRIPT = """
+local current = redis.call('get', KEYS[1])
+if current == ARGV[1] then
+    redis.call('expire', KEYS[1], ARGV[2])
+    return 1
+end
+if not current then
+    redis.call('set', KEYS[1], ARGV[1], 'EX', ARGV[2])
+    return 1
+end
+return 0
+"""
+
+# Envelope das entradas com stale-while-revalidate: {SWR_FIELD: epoch_fresco_ate, "value": valor}
+SWR_FIELD = "__fresh_until__"
+
+
+def _unwrap(stored: Any) -> tuple[Any, bool]:
+    """Retorna (valor, está_stale) para entradas com ou sem envelope SWR."""
+    if isinstance(stored, dict) and SWR_FIELD in stored and "value" in stored:
+        return stored["value"], time.time() >= float(stored[SWR_FIELD])
+    return stored, False
+
+
+def _wrap_for_ttl(
+    value: Any,
+    ttl_seconds: Optional[int],
+    stale_ttl_seconds: Optional[int],
+) -> tuple[Any, Optional[int]]:
+    """Aplica o envelope SWR quando há TTL stale. Retorna (valor, TTL hard)."""
+    if stale_ttl_seconds and ttl_seconds:
+        return {SWR_FIELD: time.time() + ttl_seconds, "value": value}, ttl_seconds + stale_ttl_seconds
+    return value, ttl_seconds
+
+
+class MemoryStore:
+    """
+    Fallback em memória com LRU limitado por número de entradas e bytes.
+    Entradas expiradas são removidas na leitura e em varreduras periódicas,
+    para que uma queda do Redis não faça o RSS dos workers crescer sem limite.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        max_bytes: int = 64 * 1024 * 1024,
+        sweep_interval_seconds: float = 60.0,
+    ) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sweep_interval_seconds = sweep_interval_seconds
+        # Estrutura: {chave: {"value": Any, "expires_at": datetime | None, "size": int}}
+        self._entries: "OrderedDict[str, dict[str, Any]]" = OrderedDict()
+        self._bytes = 0
+        self._last_sweep = time.monotonic()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def _estimate_size(value: Any) -> int:
+        # Estimativa rasa e barata; o CacheManager grava bytes já codificados e informa `size`
+        return sys.getsizeof(value)
+
+    def get(self, key: str) -> Optional[Any]:
+        self._maybe_sweep()
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at: Optional[datetime] = entry.get("expires_at")
+        if expires_at and expires_at < datetime.now():
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry.get("value")
+
+    def set(self, key: str, value: Any, expires_at: Optional[datetime], size: Optional[int] = None) -> None:
+        self._maybe_sweep()
+        size = size if size is not None else self._estimate_size(value)
+        self._remove(key)
+        if size > self.max_bytes:
+            print(f"[CACHE] Valor de {key} ({size} bytes) excede o limite da memória local. Ignorado.")
+            return
+
+        self._entries[key] = {"value": value, "expires_at": expires_at, "size": size}
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            oldest_key = next(iter(self._entries))
+            self._remove(oldest_key)
+            self.evictions += 1
+
+    def pop(self, key: str) -> None:
+        self._remove(key)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._bytes = 0
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry["size"]
+
+    def _maybe_sweep(self) -> None:
+        if time.monotonic() - self._last_sweep >= self.sweep_interval_seconds:
+            self.sweep()
+
+    def sweep(self) -> int:
+        """Remove todas as entradas expiradas. Retorna quantas foram removidas."""
+        now = datetime.now()
+        expired = [
+            key for key, entry in self._entries.items()
+            if entry.get("expires_at") and entry["expires_at"] < now
+        ]
+        for key in expired:
+            self._remove(key)
+        self.expirations += len(expired)
+        self._last_sweep = time.monotonic()
+        return len(expired)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class CircuitBreaker:
+    """
+    Estado de saúde do Redis: closed (usa Redis), open (vai direto para a memória)
+    e half_open (um probe em background testando a volta). Quem está no caminho
+    da requisição só consulta o estado; nunca espera por um ping.
+
+    Abre com `failure_threshold` falhas seguidas (Redis fora) ou quando, numa
+    janela deslizante de `window_seconds` com ao menos `min_requests`
+    operações, a fração de falhas chega a `failure_ratio` (Redis instável:
+    sucessos esporádicos não zeram a contagem).
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        failure_threshold: int,
+        base_delay: float,
+        max_delay: float,
+        failure_ratio: float = 0.5,
+        window_seconds: float = 30.0,
+        min_requests: int = 10,
+    ) -> None:
+        self.failure_threshold = max(1, failure_threshold)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.failure_ratio = failure_ratio
+        self.window_seconds = window_seconds
+        self.min_requests = max(1, min_requests)
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.next_delay = base_delay
+        self.opened_at: Optional[float] = None
+        self.trips = 0
+        self.probes = 0
+        # Resultados recentes: (instante, falhou)
+        self._window: "deque[tuple[float, bool]]" = deque()
+        self._window_failures = 0
+
+    def allow(self) -> bool:
+        return self.state == self.CLOSED
+
+    def _record_outcome(self, failed: bool) -> None:
+        now = time.monotonic()
+        self._window.append((now, failed))
+        self._window_failures += failed
+        cutoff = now - self.window_seconds
+        while self._window and self._window[0][0] < cutoff:
+            _, old_failed = self._window.popleft()
+            self._window_failures -= old_failed
+
+    def _reset_window(self) -> None:
+        self._window.clear()
+        self._window_failures = 0
+
+    def failure_rate(self) -> float:
+        return self._window_failures / len(self._window) if self._window else 0.0
+
+    def record_success(self) -> None:
+        self.consecutive_failures = 0
+        if self.state != self.CLOSED:
+            self.state = self.CLOSED
+            self.opened_at = None
+            self.next_delay = self.base_delay
+            self._reset_window()
+            return
+        self._record_outcome(False)
+
+    def record_failure(self) -> bool:
+        """Registra uma falha; retorna True se o circuito acabou de abrir."""
+        self.consecutive_failures += 1
+        if self.state == self.CLOSED:
+            self._record_outcome(True)
+            ratio_tripped = (
+                len(self._window) >= self.min_requests
+                and self.failure_rate() >= self.failure_ratio
+            )
+            if self.consecutive_failures < self.failure_threshold and not ratio_tripped:
+                return False
+        tripped = self.state == self.CLOSED
+        if tripped:
+            self.trips += 1
+            self.next_delay = self.base_delay
+            self._reset_window()
+        self.state = self.OPEN
+        self.opened_at = time.monotonic()
+        return tripped
+
+    def probe_delay(self) -> float:
+        """Próximo intervalo de probe (backoff exponencial com jitter)."""
+        delay = self.next_delay
+        self.next_delay = min(self.next_delay * 2, self.max_delay)
+        return delay * random.uniform(0.8, 1.2)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "window_requests": len(self._window),
+            "window_failure_rate": round(self.failure_rate(), 3),
+            "trips": self.trips,
+            "probes": self.probes,
+            "open_for_seconds": round(time.monotonic() - self.opened_at, 1) if self.opened_at else 0.0,
+        }
+
+
 class CacheManager:
     """
     Fornece cache distribuído opcional com Redis e fallback automático em memória.
@@ -19,96 +283,320 @@ class CacheManager:
         self.namespace = namespace
         self.redis_url = os.getenv("REDIS_URL")
         self._redis_client = None
-        self._redis_available = False
+        # Timeouts curtos: com o Redis fora, a falha precisa ser rápida para abrir o circuito
+        self.connect_timeout = float(os.getenv("CACHE_REDIS_CONNECT_TIMEOUT", "0.5"))
+        self.socket_timeout = float(os.getenv("CACHE_REDIS_SOCKET_TIMEOUT", "1.0"))
+        self._breaker = CircuitBreaker(
+            failure_threshold=int(os.getenv("CACHE_BREAKER_FAILURES", "3")),
+            base_delay=float(os.getenv("CACHE_BREAKER_BASE_DELAY", "1")),
+            max_delay=float(os.getenv("CACHE_BREAKER_MAX_DELAY", "60")),
+            failure_ratio=float(os.getenv("CACHE_BREAKER_FAILURE_RATIO", "0.5")),
+            window_seconds=float(os.getenv("CACHE_BREAKER_WINDOW_SECONDS", "30")),
+            min_requests=int(os.getenv("CACHE_BREAKER_MIN_REQUESTS", "10")),
+        )
+        self._probe_task: Optional[asyncio.Task] = None
 
         if self.redis_url and redis is not None:
             try:
+                # Respostas em bytes: os valores passam pelo CacheCodec (pode haver compressão)
                 self._redis_client = redis.from_url(
                     self.redis_url,
-                    encoding="utf-8",
-                    decode_responses=True,
+                    decode_responses=False,
+                    socket_connect_timeout=self.connect_timeout,
+                    socket_timeout=self.socket_timeout,
                 )
             except Exception as exc:  # pragma: no cover
                 print(f"[CACHE] Erro ao configurar Redis: {exc}. Usando apenas memória local.")
                 self._redis_client = None
 
-        # Estrutura do fallback: {chave: {"value": Any, "expires_at": datetime | None}}
-        self._memory_store: dict[str, dict[str, Any]] = {}
+        self.codec = CacheCodec()
+
+        # Fallback em memória limitado (LRU por entradas e bytes)
+        self._memory_store = MemoryStore(
+            max_entries=int(os.getenv("CACHE_MEMORY_MAX_ENTRIES", "1024")),
+            max_bytes=int(os.getenv("CACHE_MEMORY_MAX_BYTES", str(64 * 1024 * 1024))),
+            sweep_interval_seconds=float(os.getenv("CACHE_MEMORY_SWEEP_SECONDS", "60")),
+        )
+        # L1 (near-cache) na frente do Redis: TTL curto, coerente via pub/sub de invalidação.
+        # Só é usado enquanto o listener de invalidação está conectado.
+        self.l1_ttl_seconds = float(os.getenv("CACHE_L1_TTL", "5"))
+        self._l1 = MemoryStore(
+            max_entries=int(os.getenv("CACHE_L1_MAX_ENTRIES", "256")),
+            max_bytes=int(os.getenv("CACHE_L1_MAX_BYTES", str(16 * 1024 * 1024))),
+            sweep_interval_seconds=30.0,
+        )
+        self._instance_id = uuid.uuid4().hex
+        self._invalidation_channel = f"{namespace}:invalidate"
+        self._invalidation_task: Optional[asyncio.Task] = None
+        self._l1_coherent = False
+        # Carregamentos em andamento neste processo: {chave: Task do loader}
+        self._inflight: dict[str, asyncio.Task] = {}
+        # Referências às revalidações em background (evita coleta pelo GC)
+        self._background_tasks: set[asyncio.Task] = set()
 
     async def _is_redis_ready(self) -> bool:
+        """
+        Consulta o circuit breaker sem fazer I/O. Com o circuito aberto, garante
+        que o probe em background esteja rodando e segue pelo fallback em memória.
+        """
         if not self._redis_client:
             return False
 
-        if self._redis_available:
+        if self._breaker.allow():
             return True
 
+        self._ensure_probe()
+        return False
+
+    def _record_redis_failure(self, exc: Exception) -> None:
+        if self._breaker.record_failure():
+            print(
+                f"[CACHE] Circuito do Redis aberto ({self._breaker.consecutive_failures} falhas seguidas, "
+                f"taxa de falha na janela acima de {self._breaker.failure_ratio:.0%} ou ambos; {exc}). "
+                "Usando fallback em memória."
+            )
+            self._ensure_probe()
+
+    def _ensure_probe(self) -> None:
+        if self._probe_task and not self._probe_task.done():
+            return
         try:
-            await self._redis_client.ping()
-            self._redis_available = True
-            print("[CACHE] Redis detectado. Cache distribuído habilitado.")
-            return True
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._probe_task = loop.create_task(self._probe_redis())
+
+    async def _probe_redis(self) -> None:
+        """Pinga o Redis com backoff exponencial até o circuito fechar."""
+        while not self._breaker.allow():
+            await asyncio.sleep(self._breaker.probe_delay())
+            self._breaker.state = CircuitBreaker.HALF_OPEN
+            self._breaker.probes += 1
+            try:
+                await asyncio.wait_for(
+                    self._redis_client.ping(),  # type: ignore[union-attr]
+                    timeout=self.connect_timeout + self.socket_timeout,
+                )
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                self._breaker.record_failure()
+                print(f"[CACHE] Probe do Redis falhou ({exc}). Próxima tentativa em até {self._breaker.next_delay:.0f}s.")
+                continue
+            self._breaker.record_success()
+            print("[CACHE] Redis respondeu ao probe. Circuito fechado, cache distribuído habilitado.")
+            self.start_invalidation_listener()
+
+    async def ping(self) -> bool:
+        """
+        Verifica ativamente se o Redis responde (útil em jobs fora da API).
+        False sem REDIS_URL ou com o Redis fora: os writes cairiam no fallback
+        em memória, que morre com o processo.
+        """
+        if not self._redis_client:
+            return False
+        try:
+            await asyncio.wait_for(self._redis_client.ping(), timeout=self.connect_timeout + self.socket_timeout)
+        except asyncio.CancelledError:
+            raise
         except Exception as exc:
-            print(f"[CACHE] Redis indisponível ({exc}). Mantendo fallback em memória.")
-            self._redis_available = False
+            self._record_redis_failure(exc)
             return False
+        self._breaker.record_success()
+        return True
+
+    async def close(self) -> None:
+        """Encerra probe e listener (shutdown do app)."""
+        if self._probe_task:
+            self._probe_task.cancel()
+            await asyncio.gather(self._probe_task, return_exceptions=True)
+            self._probe_task = None
+        await self.stop_invalidation_listener()
+
+    def redis_stats(self) -> dict[str, Any]:
+        """Estado do circuit breaker do Redis."""
+        if not self._redis_client:
+            return {"state": "disabled"}
+        return self._breaker.stats()
 
     def _format_key(self, key: str) -> str:
         return f"{self.namespace}:{key}"
 
+    def _l1_enabled(self) -> bool:
+        return self.l1_ttl_seconds > 0 and self._l1_coherent
+
+    def _l1_store(self, namespaced_key: str, payload: bytes) -> None:
+        # Guarda os bytes do Redis, não o objeto decodificado: cada leitura decodifica
+        # uma cópia, então quem altera o resultado não corrompe o L1 do processo.
+        if self._l1_enabled():
+            self._l1.set(
+                namespaced_key,
+                payload,
+                datetime.now() + timedelta(seconds=self.l1_ttl_seconds),
+                size=len(payload),
+            )
+
+    def _l1_get(self, namespaced_key: str) -> Optional[Any]:
+        """Valor decodificado do L1 (ainda no envelope SWR), ou None."""
+        if not self._l1_enabled():
+            return None
+        payload = self._l1.get(namespaced_key)
+        return self.codec.decode(payload) if payload is not None else None
+
+    def start_invalidation_listener(self) -> None:
+        """Inicia (uma vez) a assinatura do canal de invalidação do L1."""
+        if self.l1_ttl_seconds <= 0 or not self._redis_client:
+            return
+        if self._invalidation_task and not self._invalidation_task.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._invalidation_task = loop.create_task(self._listen_invalidations())
+
+    async def stop_invalidation_listener(self) -> None:
+        if self._invalidation_task:
+            self._invalidation_task.cancel()
+            await asyncio.gather(self._invalidation_task, return_exceptions=True)
+            self._invalidation_task = None
+        self._l1_coherent = False
+        self._l1.clear()
+
+    async def _listen_invalidations(self) -> None:
+        while True:
+            pubsub = self._redis_client.pubsub()  # type: ignore[union-attr]
+            try:
+                await pubsub.subscribe(self._invalidation_channel)
+                self._l1_coherent = True
+                while True:
+                    # Leitura com timeout (menor que o socket_timeout) para não
+                    # confundir canal ocioso com conexão morta.
+                    message = await pubsub.get_message(
+                        ignore_subscribe_messages=True,
+                        timeout=min(1.0, self.socket_timeout / 2),
+                    )
+                    if not message or message.get("type") != "message":
+                        continue
+                    data = message.get("data", b"")
+                    if isinstance(data, bytes):
+                        data = data.decode("utf-8")
+                    origin, _, namespaced_key = str(data).partition("|")
+                    if origin != self._instance_id:
+                        self._l1.pop(namespaced_key)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                print(f"[CACHE] Listener de invalidação caiu ({exc}). L1 desativado até reconectar.")
+            finally:
+                # Sem o canal não há garantia de coerência: descarta o L1.
+                self._l1_coherent = False
+                self._l1.clear()
+                try:
+                    await pubsub.close()
+                except Exception:
+                    pass
+            await asyncio.sleep(5)
+            # Com o circuito aberto, o probe religa o listener quando o Redis voltar.
+            if not self._breaker.allow():
+                return
+
+    async def _publish_invalidation(self, namespaced_key: str) -> None:
+        if self.l1_ttl_seconds <= 0:
+            return
+        try:
+            await self._redis_client.publish(  # type: ignore[union-attr]
+                self._invalidation_channel, f"{self._instance_id}|{namespaced_key}"
+            )
+        except Exception as exc:
+            print(f"[CACHE] Falha ao publicar invalidação de {namespaced_key}: {exc}.")
+
     async def get(self, key: str) -> Optional[Any]:
         """
-        Retorna valor armazenado (ou None).
+        Retorna valor armazenado (ou None). Valores stale (entre o TTL soft e o
+        hard) continuam sendo retornados.
+        """
+        value, _ = await self.get_entry(key)
+        return value
+
+    async def get_entry(self, key: str) -> tuple[Optional[Any], bool]:
+        """
+        Retorna (valor ou None, está_stale).
         """
         namespaced_key = self._format_key(key)
 
         if await self._is_redis_ready():
+            local_value = self._l1_get(namespaced_key)
+            if local_value is not None:
+                return _unwrap(local_value)
             try:
                 raw_value = await self._redis_client.get(namespaced_key)  # type: ignore[union-attr]
+                self._breaker.record_success()
                 if raw_value is not None:
-                    return json.loads(raw_value)
+                    decoded = self.codec.decode(raw_value)
+                    self._l1_store(namespaced_key, raw_value)
+                    return _unwrap(decoded)
             except Exception as exc:
                 print(f"[CACHE] Falha ao obter chave {key} do Redis: {exc}. Usando fallback.")
-                self._redis_available = False
+                self._record_redis_failure(exc)
 
-        entry = self._memory_store.get(namespaced_key)
-        if not entry:
-            return None
+        payload = self._memory_store.get(namespaced_key)
+        if payload is None:
+            return None, False
 
-        expires_at: Optional[datetime] = entry.get("expires_at")
-        if expires_at and expires_at < datetime.now():
-            self._memory_store.pop(namespaced_key, None)
-            return None
+        return _unwrap(self.codec.decode(payload))
 
-        return entry.get("value")
-
-    async def set(self, key: str, value: Any, ttl_seconds: Optional[int] = None) -> None:
+    async def set(
+        self,
+        key: str,
+        value: Any,
+        ttl_seconds: Optional[int] = None,
+        stale_ttl_seconds: Optional[int] = None,
+    ) -> None:
         """
         Salva valor com TTL opcional.
+
+        Com `stale_ttl_seconds`, `ttl_seconds` passa a ser o TTL soft: depois dele o
+        valor ainda é servido (stale) por mais `stale_ttl_seconds` enquanto uma
+        revalidação roda em background (ver `get_or_refresh`).
         """
         namespaced_key = self._format_key(key)
+        value, ttl_seconds = _wrap_for_ttl(value, ttl_seconds, stale_ttl_seconds)
 
         if await self._is_redis_ready():
             try:
-                payload = json.dumps(value, ensure_ascii=False)
+                payload = self.codec.encode(value)
                 await self._redis_client.set(  # type: ignore[union-attr]
                     namespaced_key,
                     payload,
                     ex=ttl_seconds,
                 )
+                self._breaker.record_success()
+                self._l1_store(namespaced_key, payload)
+                await self._publish_invalidation(namespaced_key)
                 return
             except Exception as exc:
                 print(f"[CACHE] Falha ao salvar chave {key} no Redis: {exc}. Usando fallback.")
-                self._redis_available = False
+                self._record_redis_failure(exc)
 
         expires_at = (
             datetime.now() + timedelta(seconds=ttl_seconds)
             if ttl_seconds
             else None
         )
-        self._memory_store[namespaced_key] = {
-            "value": value,
-            "expires_at": expires_at,
-        }
+        self._memory_set(namespaced_key, value, expires_at)
+
+    def _memory_set(self, namespaced_key: str, value: Any, expires_at: Optional[datetime]) -> None:
+        """
+        Grava no fallback em memória o payload do CacheCodec: o tamanho sai de
+        graça (len dos bytes) e cada leitura decodifica uma cópia independente.
+        """
+        try:
+            payload = self.codec.encode(value)
+        except (TypeError, ValueError) as exc:
+            print(f"[CACHE] Valor de {namespaced_key} não serializável ({exc}). Não armazenado.")
+            return
+        self._memory_store.set(namespaced_key, payload, expires_at, size=len(payload))
 
     async def delete(self, key: str) -> None:
         """
@@ -119,7 +607,298 @@ class CacheManager:
         if await self._is_redis_ready():
             try:
                 await self._redis_client.delete(namespaced_key)  # type: ignore[union-attr]
+                await self._publish_invalidation(namespaced_key)
             except Exception as exc:
                 print(f"[CACHE] Falha ao remover chave {key} no Redis: {exc}.")
+                self._record_redis_failure(exc)
+
+        self._l1.pop(namespaced_key)
+        self._memory_store.pop(namespaced_key)
+
+    async def get_many(self, keys: list[str]) -> dict[str, Optional[Any]]:
+        """
+        Busca várias chaves de uma vez (Redis MGET, após consultar o L1).
+        Retorna {chave: valor ou None} na mesma ordem de `keys`.
+        """
+        results: dict[str, Optional[Any]] = {key: None for key in keys}
+        if not keys:
+            return results
+        namespaced = {key: self._format_key(key) for key in keys}
+
+        if await self._is_redis_ready():
+            pending: list[str] = []
+            for key in keys:
+                local_value = self._l1_get(namespaced[key])
+                if local_value is not None:
+                    results[key] = _unwrap(local_value)[0]
+                else:
+                    pending.append(key)
+            if not pending:
+                return results
+
+            try:
+                raw_values = await self._redis_client.mget(  # type: ignore[union-attr]
+                    [namespaced[key] for key in pending]
+                )
+                self._breaker.record_success()
+                for key, raw_value in zip(pending, raw_values):
+                    if raw_value is None:
+                        continue
+                    decoded = self.codec.decode(raw_value)
+                    self._l1_store(namespaced[key], raw_value)
+                    results[key] = _unwrap(decoded)[0]
+                return results
+            except Exception as exc:
+                print(f"[CACHE] Falha no MGET de {len(pending)} chaves: {exc}. Usando fallback.")
+                self._record_redis_failure(exc)
+
+        for key in keys:
+            payload = self._memory_store.get(namespaced[key])
+            if payload is not None:
+                results[key] = _unwrap(self.codec.decode(payload))[0]
+        return results
+
+    async def set_many(
+        self,
+        items: dict[str, Any],
+        ttl_seconds: Optional[int] = None,
+        stale_ttl_seconds: Optional[int] = None,
+        atomic: bool = False,
+    ) -> None:
+        """
+        Salva várias chaves com o mesmo TTL em um único pipeline Redis.
+        Com `atomic`, o pipeline roda em MULTI/EXEC: nenhum leitor vê parte
+        das chaves novas junto com o restante ainda antigo.
+        """
+        if not items:
+            return
+        wrapped: dict[str, Any] = {}
+        hard_ttl = ttl_seconds
+        for key, value in items.items():
+            wrapped[self._format_key(key)], hard_ttl = _wrap_for_ttl(value, ttl_seconds, stale_ttl_seconds)
+
+        if await self._is_redis_ready():
+            try:
+                payloads = {namespaced_key: self.codec.encode(value) for namespaced_key, value in wrapped.items()}
+                pipe = self._redis_client.pipeline(transaction=atomic)  # type: ignore[union-attr]
+                for namespaced_key, payload in payloads.items():
+                    pipe.set(namespaced_key, payload, ex=hard_ttl)
+                    if self.l1_ttl_seconds > 0:
+                        pipe.publish(self._invalidation_channel, f"{self._instance_id}|{namespaced_key}")
+                await pipe.execute()
+                self._breaker.record_success()
+                for namespaced_key, payload in payloads.items():
+                    self._l1_store(namespaced_key, payload)
+                return
+            except Exception as exc:
+                print(f"[CACHE] Falha no pipeline de {len(items)} chaves: {exc}. Usando fallback.")
+                self._record_redis_failure(exc)
+
+        expires_at = datetime.now() + timedelta(seconds=hard_ttl) if hard_ttl else None
+        for namespaced_key, value in wrapped.items():
+            self._memory_set(namespaced_key, value, expires_at)
+
+    async def delete_many(self, keys: list[str]) -> None:
+        """
+        Remove várias chaves com um único DEL.
+        """
+        if not keys:
+            return
+        namespaced_keys = [self._format_key(key) for key in keys]
+
+        if await self._is_redis_ready():
+            try:
+                pipe = self._redis_client.pipeline(transaction=False)  # type: ignore[union-attr]
+                pipe.delete(*namespaced_keys)
+                if self.l1_ttl_seconds > 0:
+                    for namespaced_key in namespaced_keys:
+                        pipe.publish(self._invalidation_channel, f"{self._instance_id}|{namespaced_key}")
+                await pipe.execute()
+            except Exception as exc:
+                print(f"[CACHE] Falha ao remover {len(keys)} chaves no Redis: {exc}.")
+                self._record_redis_failure(exc)
+
+        for namespaced_key in namespaced_keys:
+            self._l1.pop(namespaced_key)
+            self._memory_store.pop(namespaced_key)
+
+    def memory_stats(self) -> dict[str, Any]:
+        """Contadores do fallback em memória (hits, misses, evictions, bytes)."""
+        return self._memory_store.stats()
 
-        self._memory_store.pop(namespaced_key, None)
+    def l1_stats(self) -> dict[str, Any]:
+        """Contadores do near-cache L1 na frente do Redis."""
+        return {**self._l1.stats(), "enabled": self._l1_enabled(), "ttl_seconds": self.l1_ttl_seconds}
+
+    async def single_flight(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        lease_seconds: int = 30,
+        poll_interval: float = 0.2,
+    ) -> Any:
+        """
+        Garante um único loader em andamento por chave.
+
+        No processo, o loader roda numa Task própria e todas as chamadas
+        concorrentes (inclusive a primeira) a aguardam via `asyncio.shield`:
+        recebem o mesmo resultado (ou a mesma exceção), e o cancelamento de um
+        chamador (ex.: cliente desconectou) não cancela o carregamento dos
+        demais. Entre réplicas, um lease Redis (`SET NX`) elege quem carrega;
+        as demais aguardam um valor novo aparecer no cache em `key`. O loader
+        deve gravar o cache e retornar o mesmo valor que grava, para que os
+        dois caminhos devolvam o mesmo formato.
+        """
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._load_with_lease(key, loader, lease_seconds, poll_interval))
+            self._inflight[key] = task
+
+            def _done(finished: asyncio.Task) -> None:
+                if self._inflight.get(key) is finished:
+                    self._inflight.pop(key, None)
+                if not finished.cancelled():
+                    finished.exception()  # marca como consumida caso todos os chamadores tenham desistido
+
+            task.add_done_callback(_done)
+        return await asyncio.shield(task)
+
+    async def _load_with_lease(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        lease_seconds: int,
+        poll_interval: float,
+    ) -> Any:
+        if not await self._is_redis_ready():
+            return await loader()
+
+        lease_key = self._format_key(f"lease:{key}")
+        token = uuid.uuid4().hex
+        try:
+            acquired = await self._redis_client.set(  # type: ignore[union-attr]
+                lease_key, token, nx=True, ex=lease_seconds
+            )
+        except Exception as exc:
+            print(f"[CACHE] Falha ao obter lease de {key}: {exc}. Carregando localmente.")
+            self._record_redis_failure(exc)
+            return await loader()
+
+        if acquired:
+            try:
+                return await loader()
+            finally:
+                try:
+                    await self._redis_client.eval(  # type: ignore[union-attr]
+                        _RELEASE_LEASE_SCRIPT, 1, lease_key, token
+                    )
+                except Exception as exc:
+                    print(f"[CACHE] Falha ao liberar lease de {key}: {exc}.")
+
+        # Outra réplica está carregando: aguarda o resultado dela no cache. O valor
+        # que já estava lá (antigo ou stale) é justamente o que está sendo
+        # recarregado, então só vale uma gravação posterior ao início da espera.
+        namespaced_key = self._format_key(key)
+        previous = await self._read_raw(namespaced_key)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + lease_seconds
+        while loop.time() < deadline:
+            await asyncio.sleep(poll_interval)
+            raw_value = await self._read_raw(namespaced_key)
+            if raw_value is not None and raw_value != previous:
+                return _unwrap(self.codec.decode(raw_value))[0]
+            try:
+                if not await self._redis_client.exists(lease_key):  # type: ignore[union-attr]
+                    break
+            except Exception:
+                break
+
+        # Gravação entre a última leitura e a liberação do lease
+        raw_value = await self._read_raw(namespaced_key)
+        if raw_value is not None and raw_value != previous:
+            return _unwrap(self.codec.decode(raw_value))[0]
+
+        # O loader remoto falhou ou expirou sem gravar: carrega localmente.
+        return await loader()
+
+    async def _read_raw(self, namespaced_key: str) -> Optional[bytes]:
+        """Bytes gravados no Redis (sem L1), ou None se ausente/indisponível."""
+        try:
+            return await self._redis_client.get(namespaced_key)  # type: ignore[union-attr]
+        except Exception:
+            return None
+
+    async def get_or_refresh(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        lease_seconds: int = 30,
+    ) -> tuple[Any, bool]:
+        """
+        Stale-while-revalidate: retorna (valor, veio_do_cache).
+
+        Valor fresco é retornado direto; valor stale é retornado imediatamente e
+        dispara uma única revalidação em background. Só o primeiro warm-up (chave
+        ausente ou além do TTL hard) aguarda o loader.
+        """
+        value, is_stale = await self.get_entry(key)
+        if value is None:
+            return await self.single_flight(key, loader, lease_seconds), False
+
+        if is_stale:
+            self.refresh_in_background(key, loader, lease_seconds)
+        return value, True
+
+    def refresh_in_background(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        lease_seconds: int = 30,
+    ) -> None:
+        """Agenda uma revalidação da chave, a menos que já exista uma em andamento."""
+        if key in self._inflight:
+            return
+
+        task = asyncio.create_task(self.single_flight(key, loader, lease_seconds))
+        self._background_tasks.add(task)
+
+        def _done(finished: asyncio.Task) -> None:
+            self._background_tasks.discard(finished)
+            if not finished.cancelled() and finished.exception() is not None:
+                print(f"[CACHE] Revalidação em background de {key} falhou: {finished.exception()}")
+
+        task.add_done_callback(_done)
+
+    async def hold_lease(self, name: str, owner: str, ttl_seconds: int) -> bool:
+        """
+        Adquire ou renova um lease nomeado (ex.: liderança do scheduler).
+        Sem REDIS_URL (instância única), o processo atual é sempre o dono. Com
+        o Redis configurado mas indisponível, o lease não pode ser verificado:
+        retorna False para que as réplicas não virem todas donas ao mesmo tempo.
+        """
+        if not self._redis_client:
+            return True
+        if not await self._is_redis_ready():
+            return False
+
+    async def release_lease(self, name: str, owner: str) -> None:
+        """Libera um lease nomeado se ainda pertence a `owner` (shutdown do líder)."""
+        if not self._redis_client or not await self._is_redis_ready():
+            return
+        try:
+            await self._redis_client.eval(  # type: ignore[union-attr]
+                _RELEASE_LEASE_SCRIPT, 1, self._format_key(f"lease:{name}"), owner
+            )
+        except Exception as exc:
+            print(f"[CACHE] Falha ao liberar lease {name}: {exc}.")
+            self._record_redis_failure(exc)
+
+        try:
+            result = await self._redis_client.eval(  # type: ignore[union-attr]
+                _HOLD_LEASE_SCRIPT, 1, self._format_key(f"lease:{name}"), owner, ttl_seconds
+            )
+            return bool(result)
+        except Exception as exc:
+            print(f"[CACHE] Falha ao renovar lease {name}: {exc}.")
+            self._record_redis_failure(exc)
+            return False
@@ -0,0 +1,84 @@
+import asyncio
+import os
+from typing import Any, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+
+class HttpClientPool:
+    """
+    Cliente httpx.AsyncClient único por processo, com keep-alive, HTTP/2 opcional
+    e limite de requisições simultâneas por host.
+    Criado no startup do FastAPI e fechado no shutdown; todas as chamadas externas
+    (refresh da Tradebox, chat, etc.) compartilham o mesmo pool de conexões.
+    """
+
+    def __init__(self) -> None:
+        self.max_connections = int(os.getenv("HTTP_MAX_CONNECTIONS", "50"))
+        self.max_keepalive = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+        self.keepalive_expiry = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+        self.per_host_limit = int(os.getenv("HTTP_PER_HOST_CONCURRENCY", "10"))
+        self.timeout = float(os.getenv("HTTP_TIMEOUT", "30"))
+        self.http2 = os.getenv("HTTP_HTTP2", "1").lower() not in ("0", "false", "no")
+
+        self._client: Optional[httpx.AsyncClient] = None
+        self._http2_enabled = False
+        # Estrutura: {host: asyncio.Semaphore}
+        self._host_semaphores: dict[str, asyncio.Semaphore] = {}
+
+    def _build_client(self) -> httpx.AsyncClient:
+        http2 = self.http2
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                print("[HTTP] Pacote 'h2' ausente. Usando HTTP/1.1 com keep-alive.")
+                http2 = False
+        self._http2_enabled = http2
+
+        return httpx.AsyncClient(
+            timeout=httpx.Timeout(self.timeout),
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive,
+                keepalive_expiry=self.keepalive_expiry,
+            ),
+            http2=http2,
+        )
+
+    async def start(self) -> None:
+        if self._client is None:
+            self._client = self._build_client()
+            print(
+                f"[HTTP] Pool iniciado (max={self.max_connections}, keepalive={self.max_keepalive}, "
+                f"por host={self.per_host_limit}, http2={self._http2_enabled})"
+            )
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            print("[HTTP] Pool encerrado.")
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # Criação preguiçosa para chamadas fora do ciclo de vida do app (scripts, testes).
+        if self._client is None:
+            self._client = self._build_client()
+        return self._client
+
+    def _semaphore_for(self, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).netloc
+        semaphore = self._host_semaphores.get(host)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.per_host_limit)
+            self._host_semaphores[host] = semaphore
+        return semaphore
+
+    async def request(self, method: str, url: str, **kwargs: Any) -> httpx.Response:
+        async with self._semaphore_for(url):
+            return await self.client.request(method, url, **kwargs)
+
+    async def get(self, url: str, **kwargs: Any) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
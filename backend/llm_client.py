@@ -0,0 +1,141 @@
+import asyncio
+import os
+import time
+from typing import Any, AsyncIterator, Optional
+
+from openai import AsyncOpenAI
+
+from ml.rate_limit import AsyncTokenBucket
+
+
+class LLMClient:
+    """
+    Cliente AsyncOpenAI compartilhado pelo processo.
+
+    Toda chamada passa por um token bucket (`OPENAI_REQUESTS_PER_MINUTE`) e por um
+    semáforo global (`OPENAI_MAX_CONCURRENCY`), com timeout por requisição
+    (`OPENAI_TIMEOUT`). Nada roda no event loop de forma síncrona: uma análise
+    lenta só ocupa uma vaga do semáforo, não o worker inteiro.
+    """
+
+    def __init__(self, api_key: Optional[str] = None) -> None:
+        self.api_key = api_key or os.getenv("OPENAI_API_KEY")
+        self.max_concurrency = int(os.getenv("OPENAI_MAX_CONCURRENCY", "4"))
+        self.requests_per_minute = float(os.getenv("OPENAI_REQUESTS_PER_MINUTE", "60"))
+        self.timeout = float(os.getenv("OPENAI_TIMEOUT", "60"))
+        self.max_retries = int(os.getenv("OPENAI_MAX_RETRIES", "2"))
+
+        self._client: Optional[AsyncOpenAI] = None
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._bucket = AsyncTokenBucket.per_minute(
+            self.requests_per_minute,
+            float(os.getenv("OPENAI_BURST", str(self.max_concurrency))),
+        )
+
+        # Métricas de fila e latência
+        self.queued = 0
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.timeouts = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.total_latency_seconds = 0.0
+
+    @property
+    def client(self) -> AsyncOpenAI:
+        # Criação preguiçosa: o app sobe mesmo sem OPENAI_API_KEY configurada.
+        if self._client is None:
+            self._client = AsyncOpenAI(
+                api_key=self.api_key,
+                timeout=self.timeout,
+                max_retries=self.max_retries,
+            )
+        return self._client
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+    async def _acquire_slot(self) -> float:
+        """Aguarda token e vaga no semáforo; retorna o instante de início."""
+        queued_at = time.monotonic()
+        self.queued += 1
+        try:
+            await self._bucket.acquire()
+            await self._semaphore.acquire()
+        finally:
+            self.queued -= 1
+
+        wait = time.monotonic() - queued_at
+        self.total_wait_seconds += wait
+        self.max_wait_seconds = max(self.max_wait_seconds, wait)
+        if wait > 1:
+            print(f"[AI] Requisição aguardou {wait:.1f}s na fila da OpenAI.")
+
+        self.in_flight += 1
+        return time.monotonic()
+
+    def _release_slot(self, started_at: float, exc: Optional[BaseException] = None) -> None:
+        self.in_flight -= 1
+        self._semaphore.release()
+        self.total_latency_seconds += time.monotonic() - started_at
+        if exc is None:
+            self.completed += 1
+            return
+        self.failed += 1
+        if "timeout" in type(exc).__name__.lower():
+            self.timeouts += 1
+
+    async def chat_completion(self, timeout: Optional[float] = None, **kwargs: Any) -> Any:
+        """
+        `chat.completions.create` com rate limit, limite de concorrência e timeout.
+        Aceita os mesmos argumentos do SDK.
+        """
+        started_at = await self._acquire_slot()
+        try:
+            response = await self.client.chat.completions.create(
+                timeout=timeout or self.timeout,
+                **kwargs,
+            )
+        except BaseException as exc:
+            self._release_slot(started_at, exc)
+            raise
+        self._release_slot(started_at)
+        return response
+
+    async def stream_chat_completion(self, timeout: Optional[float] = None, **kwargs: Any) -> AsyncIterator[Any]:
+        """
+        Versão streaming de `chat_completion`: produz os chunks à medida que chegam.
+        A vaga do semáforo fica ocupada até o stream terminar (ou o cliente desistir).
+        """
+        started_at = await self._acquire_slot()
+        try:
+            stream = await self.client.chat.completions.create(
+                timeout=timeout or self.timeout,
+                stream=True,
+                **kwargs,
+            )
+            async with stream:
+                async for chunk in stream:
+                    yield chunk
+        except BaseException as exc:
+            self._release_slot(started_at, exc)
+            raise
+        self._release_slot(started_at)
+
+    def stats(self) -> dict[str, Any]:
+        finished = self.completed + self.failed
+        return {
+            "max_concurrency": self.max_concurrency,
+            "requests_per_minute": self.requests_per_minute,
+            "queued": self.queued,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "failed": self.failed,
+            "timeouts": self.timeouts,
+            "avg_wait_seconds": round(self.total_wait_seconds / finished, 3) if finished else 0.0,
+            "max_wait_seconds": round(self.max_wait_seconds, 3),
+            "avg_latency_seconds": round(self.total_latency_seconds / finished, 3) if finished else 0.0,
+        }
@@ -1,37 +1,56 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 from typing import Any, Optional, Tuple
 from pathlib import Path
+from contextlib import asynccontextmanager
+from functools import lru_cache
 import random
 import uvicorn
 import os
 import sys
-from openai import OpenAI
-import requests
 from bs4 import BeautifulSoup
 import re
 import httpx
 import asyncio
+import json
+import math
 
-from cache_manager import CacheManager
-
+# Raiz do repositório no path antes dos módulos locais: llm_client e
+# ml.inference dependem do pacote ml
 ROOT_DIR = Path(__file__).resolve().parents[1]
 if str(ROOT_DIR) not in sys.path:
     sys.path.append(str(ROOT_DIR))
 
+from ai_analysis import (
+    AI_ANALYSIS_CACHE_TTL,
+    AI_ANALYSIS_REUSE_TTL,
+    analysis_cache_key,
+    analysis_fingerprint,
+    generate_real_ai_analysis,
+    latest_analysis_cache_key,
+    price_within_change_threshold,
+)
+from cache_manager import CacheManager
+from http_client import HttpClientPool
+from llm_client import LLMClient
+from scheduler import CacheWarmer
+
 try:
     from ml.inference import PredictiveService
-except Exception:
+except Exception as exc:
+    print(f"[PREDICTIVE] ml.inference indisponível ({exc}). predictiveSignals desativado.")
     PredictiveService = None  # type: ignore
 
 # Carregar variáveis de ambiente
 load_dotenv()
 
 # Instanciar cliente OpenAI
-openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# Assíncrono, com semáforo global, rate limit e timeout por requisição
+openai_client = LLMClient(api_key=os.getenv("OPENAI_API_KEY"))
 
 # Configurar Tradebox API (API Interna)
 TRADEBOX_API_USER = os.getenv("TRADEBOX_API_USER", "TradeBox")
@@ -41,11 +60,36 @@ TRADEBOX_BASE_URL = "https://api.tradebox.com.br/v1"
 # Configurar Brapi (API Brasileira para B3 - Backup)
 BRAPI_TOKEN = os.getenv("BRAPI_TOKEN", "")
 BRAPI_BASE_URL = "https://brapi.dev/api"
+BRAPI_TIMEOUT = float(os.getenv("BRAPI_TIMEOUT", "5"))
+# Requisições simultâneas à Brapi no fallback (todas as ações de uma vez)
+BRAPI_CONCURRENCY = int(os.getenv("BRAPI_CONCURRENCY", "5"))
+
+# Pool HTTP compartilhado (Tradebox, chat etc.) durante toda a vida da aplicação
+http_pool = HttpClientPool()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await http_pool.start()
+    cache.start_invalidation_listener()
+    if CACHE_WARMER_ENABLED:
+        cache_warmer.add_job("stocks", STOCKS_CACHE_KEY, load_stocks_cache_entry, STOCKS_CACHE_TTL)
+        cache_warmer.add_job("news", NEWS_CACHE_KEY, scrape_news_cache_entry, NEWS_CACHE_TTL)
+        cache_warmer.start()
+    try:
+        yield
+    finally:
+        await cache_warmer.stop()
+        await cache.close()
+        await openai_client.close()
+        await http_pool.close()
+
 
 app = FastAPI(
     title="Taze AI API",
     description="API inteligente para análise de investimentos da B3",
-    version="2.0.0"  # Atualizado para v2.0 com dados reais
+    version="2.0.0",  # Atualizado para v2.0 com dados reais
+    lifespan=lifespan,
 )
 
 # Configurar CORS para permitir requisições do frontend
@@ -61,10 +105,17 @@ app.add_middleware(
 cache = CacheManager()
 
 STOCKS_CACHE_KEY = "stocks:aggregated"
+# Chave pequena com a versão (stored_at) do payload agregado, lida a cada /api/stocks
+STOCKS_VERSION_KEY = "stocks:aggregated:version"
 STOCKS_CACHE_TTL = int(os.getenv("CACHE_STOCKS_TTL", "300"))
+# Janela extra em que o valor expirado (stale) ainda é servido enquanto revalida em background
+STOCKS_STALE_TTL = int(os.getenv("CACHE_STOCKS_STALE_TTL", "1800"))
 NEWS_CACHE_KEY = "news:latest"
 NEWS_CACHE_TTL = int(os.getenv("CACHE_NEWS_TTL", "900"))
-AI_ANALYSIS_CACHE_TTL = int(os.getenv("CACHE_AI_TTL", str(60 * 60 * 24)))
+NEWS_STALE_TTL = int(os.getenv("CACHE_NEWS_STALE_TTL", "3600"))
+# Pré-aquecimento de stocks/news antes do TTL (só a réplica líder executa)
+CACHE_WARMER_ENABLED = os.getenv("CACHE_WARMER_ENABLED", "1").lower() not in ("0", "false", "no")
+cache_warmer = CacheWarmer(cache)
 
 if PredictiveService:
     try:
@@ -90,20 +141,88 @@ def cache_age_seconds(stored_at: Optional[str]) -> Optional[float]:
         return None
 
 
-def enrich_with_predictive_signals(stocks_data: list[dict[str, Any]]) -> list[dict[str, Any]]:
+# Corpo JSON de /api/stocks já serializado, mantido em memória por versão (stored_at).
+# Formato: {"version": str, "stocks_json": str, "count": int, "source": str}
+_stocks_hot_body: dict[str, Any] = {}
+
+
+def remember_stocks_body(stocks_data: list[dict[str, Any]], stored_at: Optional[str], source: str) -> dict[str, Any]:
+    """Serializa a lista de ações uma única vez por versão do cache."""
+    _stocks_hot_body.clear()
+    _stocks_hot_body.update({
+        "version": stored_at,
+        "stocks_json": json.dumps(stocks_data, ensure_ascii=False, separators=(",", ":")),
+        "count": len(stocks_data),
+        "source": source,
+    })
+    return _stocks_hot_body
+
+
+def heuristic_predictive_signals(snapshot: dict[str, Any]) -> Optional[dict[str, Any]]:
+    """
+    Score de reserva quando o modelo falha: o retorno de 30 dias do histórico
+    entra no lugar da previsão, com a mesma escala (-15%..+15% -> 0..10) e a
+    mesma penalidade/faixas de risco do ml.inference.
+    """
+    closes = []
+    for item in snapshot.get("history") or []:
+        value = item.get("value", item.get("close")) if isinstance(item, dict) else None
+        if isinstance(value, (int, float)) and value > 0:
+            closes.append(float(value))
+    if len(closes) < 2:
+        return None
+
+    returns = [current / previous - 1 for previous, current in zip(closes, closes[1:])]
+    mean_return = sum(returns) / len(returns)
+    risk_value = (
+        math.sqrt(sum((r - mean_return) ** 2 for r in returns) / (len(returns) - 1))
+        if len(returns) > 1
+        else 0.02
+    )
+    base = closes[-30] if len(closes) >= 30 else closes[0]
+    momentum = max(-0.15, min(0.15, closes[-1] / base - 1))
+
+    if risk_value < 0.015:
+        risk_level, penalty = "BAIXO", 0.0
+    elif risk_value < 0.035:
+        risk_level, penalty = "MODERADO", 0.4
+    else:
+        risk_level, penalty = "ALTO", 0.8
+    score = max(0.0, min(10.0, (momentum + 0.15) / 0.30 * 10 - penalty))
+
+    return {
+        "score": round(score, 1),
+        "horizon_days": 30,
+        "source": "heuristic",
+        "riskLevel": risk_level,
+        "riskValue": risk_value,
+    }
+
+
+async def predict_signals(symbol: str, snapshot: dict[str, Any]) -> Optional[dict[str, Any]]:
+    """
+    `predict_score` fora do event loop (pandas + XGBoost são síncronos). Erro
+    do modelo cai no score heurístico em vez de derrubar o ativo inteiro.
+    """
+    if predictive_service is None:
+        return None
+    try:
+        return await asyncio.to_thread(predictive_service.predict_score, symbol, snapshot)
+    except Exception as exc:
+        print(f"[PREDICTIVE] Erro no modelo para {symbol}: {exc}. Usando score heurístico.")
+        return heuristic_predictive_signals(snapshot)
+
+
+async def enrich_with_predictive_signals(stocks_data: list[dict[str, Any]]) -> list[dict[str, Any]]:
     if not stocks_data or predictive_service is None:
         return stocks_data
 
-    for stock in stocks_data:
-        if stock.get("predictiveSignals") is not None:
-            continue
-
-        symbol = stock.get("symbol", "")
-        try:
-            stock["predictiveSignals"] = predictive_service.predict_score(symbol, stock)
-        except Exception as exc:
-            print(f"[PREDICTIVE] Erro ao enriquecer {symbol}: {exc}")
-            stock["predictiveSignals"] = None
+    pending = [stock for stock in stocks_data if stock.get("predictiveSignals") is None]
+    signals = await asyncio.gather(
+        *(predict_signals(stock.get("symbol", ""), stock) for stock in pending)
+    )
+    for stock, stock_signals in zip(pending, signals):
+        stock["predictiveSignals"] = stock_signals
 
     return stocks_data
 
@@ -112,6 +231,12 @@ def enrich_with_predictive_signals(stocks_data: list[dict[str, Any]]) -> list[di
 # Lista de ações da B3 que vamos monitorar
 B3_STOCKS = ["PETR4", "BBAS3", "VALE3", "MGLU3", "WEGE3"]
 
+@lru_cache(maxsize=8)
+def get_basic_auth(user: str, password: str) -> httpx.BasicAuth:
+    """Reaproveita o objeto BasicAuth entre chamadas (antes eram 4 por ação)."""
+    return httpx.BasicAuth(user, password)
+
+
 # Função para buscar dados agregados da API Tradebox
 async def get_aggregated_stock_data(symbol: str, auth: tuple) -> dict:
     """
@@ -137,227 +262,237 @@ async def get_aggregated_stock_data(symbol: str, auth: tuple) -> dict:
         "fundamentals": f"{base_url}/assetFundamentals/{symbol}"
     }
     
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        # Fazer 4 requisições em paralelo
-        tasks = [
-            client.get(urls["info"], auth=httpx.BasicAuth(*auth)),
-            client.get(urls["intraday"], auth=httpx.BasicAuth(*auth)),
-            client.get(urls["histories"], auth=httpx.BasicAuth(*auth)),
-            client.get(urls["fundamentals"], auth=httpx.BasicAuth(*auth))
-        ]
+    basic_auth = get_basic_auth(*auth)
+
+    # Fazer 4 requisições em paralelo pelo pool compartilhado (keep-alive entre chamadas)
+    tasks = [
+        http_pool.get(urls["info"], auth=basic_auth),
+        http_pool.get(urls["intraday"], auth=basic_auth),
+        http_pool.get(urls["histories"], auth=basic_auth),
+        http_pool.get(urls["fundamentals"], auth=basic_auth)
+    ]
+
+    responses = await asyncio.gather(*tasks, return_exceptions=True)
+
+    # Processar respostas
+    info_data = responses[0].json() if not isinstance(responses[0], Exception) else None
+    intraday_data = responses[1].json() if not isinstance(responses[1], Exception) else None
+    histories_data = responses[2].json() if not isinstance(responses[2], Exception) else None
+    fundamentals_data = responses[3].json() if not isinstance(responses[3], Exception) else None
+    
+    # Extrair dados de cada resposta
+    try:
+        # Info básica
+        asset_info = info_data["data"][0] if info_data and "data" in info_data else {}
         
-        responses = await asyncio.gather(*tasks, return_exceptions=True)
+        # Intraday (primeiro item é o mais recente)
+        intraday_latest = intraday_data["data"][0] if intraday_data and "data" in intraday_data and len(intraday_data["data"]) > 0 else {}
         
-        # Processar respostas
-        info_data = responses[0].json() if not isinstance(responses[0], Exception) else None
-        intraday_data = responses[1].json() if not isinstance(responses[1], Exception) else None
-        histories_data = responses[2].json() if not isinstance(responses[2], Exception) else None
-        fundamentals_data = responses[3].json() if not isinstance(responses[3], Exception) else None
+        # Verificar se intraday está vazio (API retorna erro)
+        if not intraday_latest:
+            print(f"[TRADEBOX] ⚠️ Intraday vazio para {symbol}, usando fallback")
         
-        # Extrair dados de cada resposta
-        try:
-            # Info básica
-            asset_info = info_data["data"][0] if info_data and "data" in info_data else {}
-            
-            # Intraday (primeiro item é o mais recente)
-            intraday_latest = intraday_data["data"][0] if intraday_data and "data" in intraday_data and len(intraday_data["data"]) > 0 else {}
-            
-            # Verificar se intraday está vazio (API retorna erro)
-            if not intraday_latest:
-                print(f"[TRADEBOX] ⚠️ Intraday vazio para {symbol}, usando fallback")
-            
-            # Histórico (mapear para formato esperado)
-            history = []
-            if histories_data and "data" in histories_data:
-                # FALLBACK: Se API retornar mais de 90 dias, fazer slice aqui
-                history_raw = histories_data["data"]
-                # Limitar aos últimos 90 dias no backend (otimização de rede)
-                history_limited = history_raw[-90:] if len(history_raw) > 90 else history_raw
-                
-                for item in history_limited:
-                    history.append({
-                        "date": item.get("price_date", ""),
-                        "value": round(float(item.get("close", 0)), 2)
-                    })
-                
-                print(f"[TRADEBOX] Histórico limitado: {len(history)} dias (de {len(history_raw)} totais)")
-            
-            # Fundamentais (objeto inteiro)
-            fundamentals = fundamentals_data["data"][0] if fundamentals_data and "data" in fundamentals_data else {}
-            
-            # Verificar fundamentals
-            if fundamentals:
-                print(f"[TRADEBOX] ✅ Fundamentals: {len(fundamentals)} indicadores (P/L: {fundamentals.get('indicators_pl')}, DY: {fundamentals.get('indicators_div_yield')}%)")
-            else:
-                print(f"[TRADEBOX] ⚠️ Fundamentals vazios para {symbol}")
-            
-            # Calcular variação de 30 dias
-            month_variation = 0
-            if len(history) >= 30:
-                current_price = history[-1]["value"]
-                price_30_days_ago = history[-30]["value"]
-                if price_30_days_ago > 0:
-                    month_variation = ((current_price - price_30_days_ago) / price_30_days_ago) * 100
+        # Histórico (mapear para formato esperado)
+        history = []
+        if histories_data and "data" in histories_data:
+            # FALLBACK: Se API retornar mais de 90 dias, fazer slice aqui
+            history_raw = histories_data["data"]
+            # Limitar aos últimos 90 dias no backend (otimização de rede)
+            history_limited = history_raw[-90:] if len(history_raw) > 90 else history_raw
             
-            # CORREÇÃO: Se intraday estiver vazio, usar dados do histórico e fundamentals
-            if not intraday_latest or not intraday_latest.get("price"):
-                print(f"[TRADEBOX] ⚠️ Intraday vazio para {symbol}, usando fallback (histórico + fundamentals)")
-                # Preço atual = último valor do histórico
-                current_price_value = history[-1]["value"] if history else 0
-                # Variação diária = oscillations_day dos fundamentals
-                daily_variation_value = fundamentals.get("oscillations_day", 0) if fundamentals else 0
-            else:
-                # Usar dados do intraday normalmente
-                current_price_value = float(intraday_latest.get("price", 0))
-                daily_variation_value = float(intraday_latest.get("percent", 0))
+            for item in history_limited:
+                history.append({
+                    "date": item.get("price_date", ""),
+                    "value": round(float(item.get("close", 0)), 2)
+                })
             
-            # Montar resultado agregado
-            result = {
-                "symbol": asset_info.get("asset_code", symbol),
-                "name": asset_info.get("company", symbol),
-                "sector": asset_info.get("sector", "N/A"),
-                "currentPrice": round(current_price_value, 2),
-                "dailyVariation": round(daily_variation_value, 2),
-                "monthVariation": round(month_variation, 2),
-                "history": history,
-                "fundamentals": fundamentals
-            }
+            print(f"[TRADEBOX] Histórico limitado: {len(history)} dias (de {len(history_raw)} totais)")
+        
+        # Fundamentais (objeto inteiro)
+        fundamentals = fundamentals_data["data"][0] if fundamentals_data and "data" in fundamentals_data else {}
+        
+        # Verificar fundamentals
+        if fundamentals:
+            print(f"[TRADEBOX] ✅ Fundamentals: {len(fundamentals)} indicadores (P/L: {fundamentals.get('indicators_pl')}, DY: {fundamentals.get('indicators_div_yield')}%)")
+        else:
+            print(f"[TRADEBOX] ⚠️ Fundamentals vazios para {symbol}")
+        
+        # Calcular variação de 30 dias
+        month_variation = 0
+        if len(history) >= 30:
+            current_price = history[-1]["value"]
+            price_30_days_ago = history[-30]["value"]
+            if price_30_days_ago > 0:
+                month_variation = ((current_price - price_30_days_ago) / price_30_days_ago) * 100
+        
+        # CORREÇÃO: Se intraday estiver vazio, usar dados do histórico e fundamentals
+        if not intraday_latest or not intraday_latest.get("price"):
+            print(f"[TRADEBOX] ⚠️ Intraday vazio para {symbol}, usando fallback (histórico + fundamentals)")
+            # Preço atual = último valor do histórico
+            current_price_value = history[-1]["value"] if history else 0
+            # Variação diária = oscillations_day dos fundamentals
+            daily_variation_value = fundamentals.get("oscillations_day", 0) if fundamentals else 0
+        else:
+            # Usar dados do intraday normalmente
+            current_price_value = float(intraday_latest.get("price", 0))
+            daily_variation_value = float(intraday_latest.get("percent", 0))
+        
+        # Montar resultado agregado
+        result = {
+            "symbol": asset_info.get("asset_code", symbol),
+            "name": asset_info.get("company", symbol),
+            "sector": asset_info.get("sector", "N/A"),
+            "currentPrice": round(current_price_value, 2),
+            "dailyVariation": round(daily_variation_value, 2),
+            "monthVariation": round(month_variation, 2),
+            "history": history,
+            "fundamentals": fundamentals
+        }
 
-            if predictive_service:
-                result["predictiveSignals"] = predictive_service.predict_score(symbol, result)
-            else:
-                result["predictiveSignals"] = None
-            
-            print(f"[TRADEBOX] ✅ Dados finais: {symbol} - R$ {result['currentPrice']:.2f} ({result['dailyVariation']:+.2f}%) | Fundamentals: {len(fundamentals)} indicadores")
-            return result
-            
-        except Exception as e:
-            print(f"[TRADEBOX ERROR] Erro ao processar {symbol}: {str(e)}")
-            return None
+        result["predictiveSignals"] = await predict_signals(symbol, result)
+        
+        print(f"[TRADEBOX] ✅ Dados finais: {symbol} - R$ {result['currentPrice']:.2f} ({result['dailyVariation']:+.2f}%) | Fundamentals: {len(fundamentals)} indicadores")
+        return result
+        
+    except Exception as e:
+        print(f"[TRADEBOX ERROR] Erro ao processar {symbol}: {str(e)}")
+        return None
 
-def fetch_real_stock_data():
+async def fetch_brapi_quote(symbol: str) -> Optional[dict]:
     """
-    Busca dados reais das ações usando Brapi.dev (API Brasileira B3)
-    Se falhar, usa fallback mockado
+    Busca a cotação de um ativo na Brapi.dev (3 meses, diário) pelo pool HTTP
+    compartilhado. Retorna o primeiro item de `results` ou None.
     """
-    stocks_data = []
+    # Endpoint: /quote/{ticker}?range=3mo&interval=1d&token=YOUR_TOKEN
+    url = f"{BRAPI_BASE_URL}/quote/{symbol}"
+    params = {
+        "range": "3mo",  # 3 meses (máximo no plano gratuito)
+        "interval": "1d",  # Diário
+        "token": BRAPI_TOKEN
+    }
+
+    response = await http_pool.get(url, params=params, timeout=BRAPI_TIMEOUT)
+
+    if response.status_code != 200:
+        print(f"[AVISO] Brapi retornou {response.status_code} para {symbol}")
+        return None
+
+    data = response.json()
+
+    # Verificar se há resultados
+    if not data.get("results") or len(data["results"]) == 0:
+        print(f"[AVISO] Sem dados para {symbol}")
+        return None
+
+    return data["results"][0]
+
+def build_brapi_stock(symbol: str, stock_data: dict) -> dict:
+    """
+    Converte o retorno da Brapi no formato usado pelo dashboard.
+    """
+    # Extrair informações
+    current_price = stock_data.get("regularMarketPrice", 0)
+    previous_close = stock_data.get("regularMarketPreviousClose", current_price)
     
-    print("[BRAPI] Buscando dados reais da B3 via Brapi.dev...")
+    # Calcular variação diária
+    if previous_close > 0:
+        daily_variation = ((current_price - previous_close) / previous_close) * 100
+    else:
+        daily_variation = 0
     
-    for symbol in B3_STOCKS:
-        try:
-            # Construir URL da Brapi
-            # Endpoint: /quote/{ticker}?range=3mo&interval=1d&token=YOUR_TOKEN
-            url = f"{BRAPI_BASE_URL}/quote/{symbol}"
-            params = {
-                "range": "3mo",  # 3 meses (máximo no plano gratuito)
-                "interval": "1d",  # Diário
-                "token": BRAPI_TOKEN
-            }
-            
-            # Fazer requisição
-            response = requests.get(url, params=params, timeout=5)
-            
-            if response.status_code != 200:
-                print(f"[AVISO] Brapi retornou {response.status_code} para {symbol}")
-                continue
-            
-            data = response.json()
-            
-            # Verificar se há resultados
-            if not data.get("results") or len(data["results"]) == 0:
-                print(f"[AVISO] Sem dados para {symbol}")
-                continue
-            
-            stock_data = data["results"][0]
-            
-            # Extrair informações
-            current_price = stock_data.get("regularMarketPrice", 0)
-            previous_close = stock_data.get("regularMarketPreviousClose", current_price)
-            
-            # Calcular variação diária
-            if previous_close > 0:
-                daily_variation = ((current_price - previous_close) / previous_close) * 100
-            else:
-                daily_variation = 0
-            
-            # Histórico
-            history = []
-            historical_data = stock_data.get("historicalDataPrice", [])
-            
-            # Variação mensal (30 dias)
-            month_variation = 0
-            
-            if historical_data:
-                # Pegar TODOS os dados históricos (até 3 meses)
-                for item in historical_data:
-                    history.append({
-                        "date": datetime.fromtimestamp(item["date"]).strftime("%Y-%m-%d"),
-                        "value": round(float(item["close"]), 2)
-                    })
-                
-                # IMPORTANTE: Usar o último valor do histórico como currentPrice
-                # Isso garante consistência entre lista e gráfico
-                if len(history) > 0:
-                    current_price = history[-1]["value"]
-                    
-                    # Recalcular variação diária com base no histórico
-                    if len(history) >= 2:
-                        prev_price = history[-2]["value"]
-                        daily_variation = ((current_price - prev_price) / prev_price) * 100
-                    
-                    # Calcular variação de 30 dias corretamente
-                    if len(history) >= 30:
-                        price_30_days_ago = history[-30]["value"]
-                        month_variation = ((current_price - price_30_days_ago) / price_30_days_ago) * 100
-                    elif len(history) >= 7:  # Fallback para 7 dias se não tiver 30
-                        price_7_days_ago = history[-7]["value"]
-                        month_variation = ((current_price - price_7_days_ago) / price_7_days_ago) * 100
-                    else:
-                        month_variation = daily_variation  # Se tiver menos, usar daily
-            
-            # Nome e setor
-            long_name = stock_data.get("longName", stock_data.get("shortName", symbol))
-            sector = stock_data.get("sector", "N/A")
-            
-            # Fallback para setores conhecidos se N/A
-            if sector == "N/A":
-                sector_map = {
-                    "PETR4": "Energia",
-                    "VALE3": "Mineração",
-                    "ITUB4": "Financeiro",
-                    "WEGE3": "Indústria",
-                    "BBAS3": "Financeiro"
-                }
-                sector = sector_map.get(symbol, "N/A")
-            
-            stocks_data.append({
-                "symbol": symbol,
-                "name": long_name,
-                "sector": sector,
-                "currentPrice": round(float(current_price), 2),
-                "dailyVariation": round(float(daily_variation), 2),
-                "monthVariation": round(float(month_variation), 2),
-                "history": history
+    # Histórico
+    history = []
+    historical_data = stock_data.get("historicalDataPrice", [])
+    
+    # Variação mensal (30 dias)
+    month_variation = 0
+    
+    if historical_data:
+        # Pegar TODOS os dados históricos (até 3 meses)
+        for item in historical_data:
+            history.append({
+                "date": datetime.fromtimestamp(item["date"]).strftime("%Y-%m-%d"),
+                "value": round(float(item["close"]), 2)
             })
+        
+        # IMPORTANTE: Usar o último valor do histórico como currentPrice
+        # Isso garante consistência entre lista e gráfico
+        if len(history) > 0:
+            current_price = history[-1]["value"]
             
-            print(f"[OK] Dados carregados: {symbol} - R$ {current_price:.2f}")
+            # Recalcular variação diária com base no histórico
+            if len(history) >= 2:
+                prev_price = history[-2]["value"]
+                daily_variation = ((current_price - prev_price) / prev_price) * 100
             
-        except requests.Timeout:
-            print(f"[TIMEOUT] Brapi demorou muito para {symbol}")
-            continue
-        except Exception as e:
-            print(f"[ERRO] Erro ao buscar {symbol}: {str(e)}")
-            continue
+            # Calcular variação de 30 dias corretamente
+            if len(history) >= 30:
+                price_30_days_ago = history[-30]["value"]
+                month_variation = ((current_price - price_30_days_ago) / price_30_days_ago) * 100
+            elif len(history) >= 7:  # Fallback para 7 dias se não tiver 30
+                price_7_days_ago = history[-7]["value"]
+                month_variation = ((current_price - price_7_days_ago) / price_7_days_ago) * 100
+            else:
+                month_variation = daily_variation  # Se tiver menos, usar daily
+    
+    # Nome e setor
+    long_name = stock_data.get("longName", stock_data.get("shortName", symbol))
+    sector = stock_data.get("sector", "N/A")
     
-    # Se conseguiu pelo menos 1 ação real, retornar
+    # Fallback para setores conhecidos se N/A
+    if sector == "N/A":
+        sector_map = {
+            "PETR4": "Energia",
+            "VALE3": "Mineração",
+            "ITUB4": "Financeiro",
+            "WEGE3": "Indústria",
+            "BBAS3": "Financeiro"
+        }
+        sector = sector_map.get(symbol, "N/A")
+    
+    return {
+        "symbol": symbol,
+        "name": long_name,
+        "sector": sector,
+        "currentPrice": round(float(current_price), 2),
+        "dailyVariation": round(float(daily_variation), 2),
+        "monthVariation": round(float(month_variation), 2),
+        "history": history
+    }
+
+async def fetch_real_stock_data() -> list[dict[str, Any]]:
+    """
+    Busca dados reais das ações usando Brapi.dev (API Brasileira B3).
+    Todas as ações são buscadas em paralelo (limitado por BRAPI_CONCURRENCY);
+    uma resposta lenta não segura as demais nem o event loop.
+    Retorna lista vazia se nenhuma ação puder ser carregada.
+    """
+    print("[BRAPI] Buscando dados reais da B3 via Brapi.dev...")
+    semaphore = asyncio.Semaphore(BRAPI_CONCURRENCY)
+
+    async def fetch_one(symbol: str) -> Optional[dict]:
+        async with semaphore:
+            try:
+                stock_data = await fetch_brapi_quote(symbol)
+                if stock_data is None:
+                    return None
+                stock = build_brapi_stock(symbol, stock_data)
+                print(f"[OK] Dados carregados: {symbol} - R$ {stock['currentPrice']:.2f}")
+                return stock
+            except httpx.TimeoutException:
+                print(f"[TIMEOUT] Brapi demorou muito para {symbol}")
+            except Exception as e:
+                print(f"[ERRO] Erro ao buscar {symbol}: {str(e)}")
+            return None
+
+    results = await asyncio.gather(*(fetch_one(symbol) for symbol in B3_STOCKS))
+    stocks_data = [stock for stock in results if stock is not None]
+
     if len(stocks_data) > 0:
         print(f"[SUCESSO] {len(stocks_data)} acoes carregadas da Brapi")
-        return stocks_data
-    
-    # Se não conseguiu nenhuma, usar fallback
-    print("[FALLBACK] Nenhuma acao encontrada na Brapi, usando dados mockados")
-    return generate_mock_stock_data()
+    else:
+        print("[BRAPI] Nenhuma acao encontrada na Brapi")
+    return stocks_data
 
 async def refresh_stocks_cache() -> Tuple[list[dict[str, Any]], str, str]:
     """
@@ -377,48 +512,66 @@ async def refresh_stocks_cache() -> Tuple[list[dict[str, Any]], str, str]:
         ]
 
         if len(stocks_data) == 0:
-            print("[TRADEBOX] Nenhuma acao valida recebida, usando fallback mockado.")
+            print("[TRADEBOX] Nenhuma acao valida recebida, tentando Brapi.")
+            source = "brapi"
+            stocks_data = await fetch_real_stock_data()
+        if len(stocks_data) == 0:
+            print("[FALLBACK] Sem dados da Tradebox nem da Brapi, usando fallback mockado.")
             source = "fallback"
             stocks_data = generate_mock_stock_data()
-        else:
+        elif source == "tradebox_api":
             print(f"[TRADEBOX] OK {len(stocks_data)} acoes carregadas com sucesso")
     except Exception as exc:
         print(f"[TRADEBOX ERROR] {exc}")
         source = "fallback"
         stocks_data = generate_mock_stock_data()
 
-    stocks_data = enrich_with_predictive_signals(stocks_data)
+    stocks_data = await enrich_with_predictive_signals(stocks_data)
     stored_at = current_iso_timestamp()
-    await cache.set(
-        STOCKS_CACHE_KEY,
+    # Dados e versão no mesmo MULTI: um leitor nunca vê a versão nova com o payload antigo
+    await cache.set_many(
         {
-            "data": stocks_data,
-            "stored_at": stored_at,
-            "source": source,
+            STOCKS_CACHE_KEY: {
+                "data": stocks_data,
+                "stored_at": stored_at,
+                "source": source,
+            },
+            STOCKS_VERSION_KEY: {"stored_at": stored_at, "source": source},
         },
         STOCKS_CACHE_TTL,
+        stale_ttl_seconds=STOCKS_STALE_TTL,
+        atomic=True,
     )
+    remember_stocks_body(stocks_data, stored_at, source)
     return stocks_data, stored_at, source
 
 
+async def load_stocks_cache_entry() -> dict[str, Any]:
+    """Loader do single-flight: retorna a entrada no mesmo formato gravado no cache."""
+    data, stored_at, source = await refresh_stocks_cache()
+    return {"data": data, "stored_at": stored_at, "source": source}
+
+
 async def get_cached_stocks_data(force_refresh: bool = False) -> Tuple[list[dict[str, Any]], Optional[str], bool, str]:
     """
     Recupera dados do cache compartilhado ou atualiza se necessario.
     Retorna (dados, timestamp_iso, veio_do_cache, fonte_original)
     """
     if not force_refresh:
-        cached_entry = await cache.get(STOCKS_CACHE_KEY)
+        # Stale-while-revalidate: valor stale volta na hora e o refresh roda em background.
+        # predictiveSignals já foram calculados em refresh_stocks_cache.
+        cached_entry, from_cache = await cache.get_or_refresh(STOCKS_CACHE_KEY, load_stocks_cache_entry)
         if cached_entry and isinstance(cached_entry, dict) and cached_entry.get("data"):
-            cached_entry["data"] = enrich_with_predictive_signals(cached_entry["data"])
             return (
                 cached_entry["data"],
                 cached_entry.get("stored_at"),
-                True,
+                from_cache,
                 cached_entry.get("source", "tradebox_api")
             )
 
-    data, stored_at, source = await refresh_stocks_cache()
-    return data, stored_at, False, source
+    # Um único refresh por processo (e por cluster, via lease Redis); os demais aguardam o resultado.
+    entry = await cache.single_flight(STOCKS_CACHE_KEY, load_stocks_cache_entry)
+    return entry["data"], entry.get("stored_at"), False, entry.get("source", "tradebox_api")
 
 
 @app.get("/")
@@ -434,7 +587,7 @@ async def root():
 @app.get("/health")
 async def health_check():
     """Endpoint de health check"""
-    cache_entry = await cache.get(STOCKS_CACHE_KEY)
+    cache_entry = await cache.get(STOCKS_VERSION_KEY)
     cache_status = "warm" if cache_entry else "cold"
     cache_age = cache_age_seconds(cache_entry.get("stored_at")) if cache_entry else None
     return {
@@ -443,193 +596,207 @@ async def health_check():
         "cache_status": cache_status,
         "cache_age_seconds": cache_age,
         "data_source": "tradebox",
-        "brapi_configured": bool(BRAPI_TOKEN)
+        "brapi_configured": bool(BRAPI_TOKEN),
+        "scheduler": cache_warmer.stats(),
+        "redis": cache.redis_stats(),
+        "memory_cache": cache.memory_stats(),
+        "openai": openai_client.stats(),
+        "l1_cache": cache.l1_stats()
     }
 
-@app.get("/api/news")
-async def get_news():
+async def scrape_news_cache_entry() -> dict[str, Any]:
     """
-    Faz scraping de notícias do site Análise de Ações
-    Cache de 15 minutos para não sobrecarregar o servidor
-    Fonte: https://www.analisedeacoes.com/noticias/
+    Faz o scraping do Análise de Ações e grava o resultado no cache.
+    Loader do single-flight: retorna a entrada no mesmo formato gravado no cache.
     """
-    # Verificar cache
-    cached_news = await cache.get(NEWS_CACHE_KEY)
-    if cached_news and cached_news.get("data"):
-        age = cache_age_seconds(cached_news.get("stored_at"))
-        print("[NEWS CACHE] Retornando noticias do cache compartilhado")
-        return {
-            "news": cached_news["data"],
-            "cached": True,
-            "cache_age_seconds": age,
-            "source": cached_news.get("source", "Analise de Acoes (cache)")
-        }
+    print("[NEWS] Fazendo scraping de notícias do Análise de Ações...")
+
+    news_url = "https://www.analisedeacoes.com/noticias/"
+    headers = {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+    }
     
+    # Assíncrono para que requisições concorrentes possam aguardar o mesmo scraping
+    response = await http_pool.get(news_url, headers=headers, timeout=15)
     
-    # Buscar notícias via scraping
-    print("[NEWS] Fazendo scraping de notícias do Análise de Ações...")
+    if response.status_code != 200:
+        print(f"[NEWS ERROR] Site retornou {response.status_code}")
+        # Não é gravado no cache: réplicas aguardando o lease tentam novamente.
+        return {"data": [], "error": f"Erro HTTP {response.status_code}"}
     
-    try:
-        news_url = "https://www.analisedeacoes.com/noticias/"
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        
-        response = requests.get(news_url, headers=headers, timeout=15)
-        
-        if response.status_code != 200:
-            print(f"[NEWS ERROR] Site retornou {response.status_code}")
-            return {"news": [], "error": f"Erro HTTP {response.status_code}"}
-        
-        # Parsear HTML
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        news_items = []
-        
-        # Estratégia de scraping: buscar elementos que contenham notícias
-        # Analisar a estrutura HTML da página
-        
-        # Tentar encontrar notícias (pode estar em <article>, <div>, etc)
-        # A página parece ter notícias em formato de cards/artigos
-        
-        # Buscar por links de notícias (títulos geralmente são links)
-        news_links = []
-        
-        # Tentar diferentes seletores comuns
-        possible_selectors = [
-            'article',  # Elementos article
-            'div[class*="post"]',  # Divs com "post" no nome da classe
-            'div[class*="news"]',  # Divs com "news" no nome da classe
-            'div[class*="noticia"]',  # Divs com "noticia" no nome da classe
-        ]
-        
-        for selector in possible_selectors:
-            articles = soup.select(selector)
-            if articles:
-                print(f"[NEWS] Encontrados {len(articles)} artigos com seletor '{selector}'")
-                break
+    # Parsear HTML
+    soup = BeautifulSoup(response.content, 'html.parser')
+    
+    news_items = []
+    
+    # Estratégia de scraping: buscar elementos que contenham notícias
+    # Analisar a estrutura HTML da página
+    
+    # Tentar encontrar notícias (pode estar em <article>, <div>, etc)
+    # A página parece ter notícias em formato de cards/artigos
+    
+    # Buscar por links de notícias (títulos geralmente são links)
+    news_links = []
+    
+    # Tentar diferentes seletores comuns
+    possible_selectors = [
+        'article',  # Elementos article
+        'div[class*="post"]',  # Divs com "post" no nome da classe
+        'div[class*="news"]',  # Divs com "news" no nome da classe
+        'div[class*="noticia"]',  # Divs com "noticia" no nome da classe
+    ]
+    
+    for selector in possible_selectors:
+        articles = soup.select(selector)
+        if articles:
+            print(f"[NEWS] Encontrados {len(articles)} artigos com seletor '{selector}'")
+            break
+    
+    # Se não encontrou por seletores, buscar todas as tags <a> com href
+    if not articles or len(articles) == 0:
+        print("[NEWS] Tentando extrair por links de notícias...")
+        all_links = soup.find_all('a', href=True)
         
-        # Se não encontrou por seletores, buscar todas as tags <a> com href
-        if not articles or len(articles) == 0:
-            print("[NEWS] Tentando extrair por links de notícias...")
-            all_links = soup.find_all('a', href=True)
+        # Filtrar links que parecem ser de notícias
+        for link in all_links:
+            href = link.get('href', '')
+            text = link.get_text(strip=True)
             
-            # Filtrar links que parecem ser de notícias
-            for link in all_links:
-                href = link.get('href', '')
-                text = link.get_text(strip=True)
+            # Filtrar links que parecem ser notícias (texto longo, não é menu)
+            if (text and len(text) > 30 and 
+                'analisedeacoes.com' in href or href.startswith('/') and
+                not any(skip in href.lower() for skip in ['login', 'cadastro', 'premium', 'contato'])):
+                
+                # Garantir URL absoluta
+                if href.startswith('/'):
+                    href = f"https://www.analisedeacoes.com{href}"
                 
-                # Filtrar links que parecem ser notícias (texto longo, não é menu)
-                if (text and len(text) > 30 and 
-                    'analisedeacoes.com' in href or href.startswith('/') and
-                    not any(skip in href.lower() for skip in ['login', 'cadastro', 'premium', 'contato'])):
-                    
+                news_items.append({
+                    "title": text,
+                    "link": href,
+                    "author": "Análise de Ações",
+                    "time_ago": "Recente",
+                    "source": "Análise de Ações"
+                })
+                
+                if len(news_items) >= 10:
+                    break
+    else:
+        # Processar artigos encontrados
+        for article in articles[:10]:
+            try:
+                # Tentar encontrar o título (geralmente em <h2>, <h3> ou <a>)
+                title_elem = article.find(['h2', 'h3', 'h4', 'a'])
+                if not title_elem:
+                    continue
+                
+                title = title_elem.get_text(strip=True)
+                
+                # Tentar encontrar o link
+                link_elem = article.find('a', href=True)
+                if link_elem:
+                    link = link_elem.get('href', '#')
                     # Garantir URL absoluta
-                    if href.startswith('/'):
-                        href = f"https://www.analisedeacoes.com{href}"
-                    
+                    if link.startswith('/'):
+                        link = f"https://www.analisedeacoes.com{link}"
+                else:
+                    link = news_url
+                
+                # Extrair descrição se houver
+                desc_elem = article.find('p')
+                description = desc_elem.get_text(strip=True) if desc_elem else ""
+                
+                if title and len(title) > 10:
                     news_items.append({
-                        "title": text,
-                        "link": href,
+                        "title": title,
+                        "link": link,
                         "author": "Análise de Ações",
                         "time_ago": "Recente",
-                        "source": "Análise de Ações"
+                        "source": "Análise de Ações",
+                        "description": description[:100] if description else None
                     })
-                    
-                    if len(news_items) >= 10:
-                        break
-        else:
-            # Processar artigos encontrados
-            for article in articles[:10]:
-                try:
-                    # Tentar encontrar o título (geralmente em <h2>, <h3> ou <a>)
-                    title_elem = article.find(['h2', 'h3', 'h4', 'a'])
-                    if not title_elem:
-                        continue
-                    
-                    title = title_elem.get_text(strip=True)
-                    
-                    # Tentar encontrar o link
-                    link_elem = article.find('a', href=True)
-                    if link_elem:
-                        link = link_elem.get('href', '#')
-                        # Garantir URL absoluta
-                        if link.startswith('/'):
-                            link = f"https://www.analisedeacoes.com{link}"
-                    else:
-                        link = news_url
-                    
-                    # Extrair descrição se houver
-                    desc_elem = article.find('p')
-                    description = desc_elem.get_text(strip=True) if desc_elem else ""
-                    
-                    if title and len(title) > 10:
-                        news_items.append({
-                            "title": title,
-                            "link": link,
-                            "author": "Análise de Ações",
-                            "time_ago": "Recente",
-                            "source": "Análise de Ações",
-                            "description": description[:100] if description else None
-                        })
-                except Exception as e:
-                    print(f"[NEWS] Erro ao processar artigo: {str(e)}")
-                    continue
-        
-        # Se não conseguiu nenhuma notícia, usar fallback
-        if len(news_items) == 0:
-            print("[NEWS] Nenhuma notícia encontrada, usando fallback...")
-            news_items = [
-                {
-                    "title": "Vale (VALE3) estima provisão de US$ 500 milhões por rompimento em Mariana",
-                    "link": "https://www.analisedeacoes.com/noticias/",
-                    "author": "Análise de Ações",
-                    "time_ago": "Recente",
-                    "source": "Análise de Ações"
-                },
-                {
-                    "title": "Petrobras (PETR4) anuncia pagamento de R$ 12,16 bilhões em dividendos",
-                    "link": "https://www.analisedeacoes.com/noticias/",
-                    "author": "Análise de Ações",
-                    "time_ago": "Recente",
-                    "source": "Análise de Ações"
-                },
-                {
-                    "title": "Bradespar (BRAP4) propõe pagamento de R$ 310 milhões em JCP",
-                    "link": "https://www.analisedeacoes.com/noticias/",
-                    "author": "Análise de Ações",
-                    "time_ago": "Recente",
-                    "source": "Análise de Ações"
-                },
-                {
-                    "title": "Oi (OIBR3) tem falência suspensa por decisão judicial",
-                    "link": "https://www.analisedeacoes.com/noticias/",
-                    "author": "Análise de Ações",
-                    "time_ago": "Recente",
-                    "source": "Análise de Ações"
-                },
-                {
-                    "title": "IRB (IRBR3) reporta lucro líquido de R$ 99 milhões no 3º trimestre",
-                    "link": "https://www.analisedeacoes.com/noticias/",
-                    "author": "Análise de Ações",
-                    "time_ago": "Recente",
-                    "source": "Análise de Ações"
-                }
-            ]
-        
-        # Atualizar cache distribu��do
-        await cache.set(
-            NEWS_CACHE_KEY,
+            except Exception as e:
+                print(f"[NEWS] Erro ao processar artigo: {str(e)}")
+                continue
+    
+    # Se não conseguiu nenhuma notícia, usar fallback
+    if len(news_items) == 0:
+        print("[NEWS] Nenhuma notícia encontrada, usando fallback...")
+        news_items = [
             {
-                "data": news_items,
-                "stored_at": current_iso_timestamp(),
-                "source": "Anǭlise de A����es (Web Scraping)"
+                "title": "Vale (VALE3) estima provisão de US$ 500 milhões por rompimento em Mariana",
+                "link": "https://www.analisedeacoes.com/noticias/",
+                "author": "Análise de Ações",
+                "time_ago": "Recente",
+                "source": "Análise de Ações"
             },
-            NEWS_CACHE_TTL
-        )
-        
-        print(f"[NEWS] ✅ {len(news_items)} notícias carregadas do Análise de Ações")
-        
+            {
+                "title": "Petrobras (PETR4) anuncia pagamento de R$ 12,16 bilhões em dividendos",
+                "link": "https://www.analisedeacoes.com/noticias/",
+                "author": "Análise de Ações",
+                "time_ago": "Recente",
+                "source": "Análise de Ações"
+            },
+            {
+                "title": "Bradespar (BRAP4) propõe pagamento de R$ 310 milhões em JCP",
+                "link": "https://www.analisedeacoes.com/noticias/",
+                "author": "Análise de Ações",
+                "time_ago": "Recente",
+                "source": "Análise de Ações"
+            },
+            {
+                "title": "Oi (OIBR3) tem falência suspensa por decisão judicial",
+                "link": "https://www.analisedeacoes.com/noticias/",
+                "author": "Análise de Ações",
+                "time_ago": "Recente",
+                "source": "Análise de Ações"
+            },
+            {
+                "title": "IRB (IRBR3) reporta lucro líquido de R$ 99 milhões no 3º trimestre",
+                "link": "https://www.analisedeacoes.com/noticias/",
+                "author": "Análise de Ações",
+                "time_ago": "Recente",
+                "source": "Análise de Ações"
+            }
+        ]
+
+    # Atualizar cache distribuído
+    entry = {
+        "data": news_items,
+        "stored_at": current_iso_timestamp(),
+        "source": "Análise de Ações (Web Scraping)"
+    }
+    await cache.set(NEWS_CACHE_KEY, entry, NEWS_CACHE_TTL, stale_ttl_seconds=NEWS_STALE_TTL)
+
+    print(f"[NEWS] ✅ {len(news_items)} notícias carregadas do Análise de Ações")
+    return entry
+
+
+@app.get("/api/news")
+async def get_news():
+    """
+    Faz scraping de notícias do site Análise de Ações
+    Cache de 15 minutos para não sobrecarregar o servidor
+    Fonte: https://www.analisedeacoes.com/noticias/
+    """
+    try:
+        # Stale-while-revalidate: só o primeiro warm-up espera o scraping; depois disso
+        # o valor stale volta na hora e um único scraping roda em background.
+        entry, from_cache = await cache.get_or_refresh(NEWS_CACHE_KEY, scrape_news_cache_entry)
+        if from_cache and entry.get("data"):
+            age = cache_age_seconds(entry.get("stored_at"))
+            print("[NEWS CACHE] Retornando noticias do cache compartilhado")
+            return {
+                "news": entry["data"],
+                "cached": True,
+                "cache_age_seconds": age,
+                "source": entry.get("source", "Analise de Acoes (cache)")
+            }
+
+        if entry.get("error"):
+            return {"news": [], "error": entry["error"]}
+
+        news_items = entry["data"]
         return {
             "news": news_items,
             "cached": False,
@@ -680,21 +847,31 @@ async def get_stocks():
     Retorna lista de acoes com dados REAIS da B3 via Tradebox API
     Implementa cache distribuido para otimizar performance
     """
-    stocks_data, stored_at, from_cache, data_source = await get_cached_stocks_data()
-    age = cache_age_seconds(stored_at)
-
-    response = {
-        "stocks": stocks_data,
+    # Caminho quente: só a chave de versão é lida; a lista de ações já está serializada.
+    version_entry, version_stale = await cache.get_entry(STOCKS_VERSION_KEY)
+    hot_body = _stocks_hot_body
+    if version_entry and hot_body.get("version") == version_entry.get("stored_at"):
+        stored_at = hot_body["version"]
+        from_cache = True
+        if version_stale:
+            cache.refresh_in_background(STOCKS_CACHE_KEY, load_stocks_cache_entry)
+    else:
+        stocks_data, stored_at, from_cache, data_source = await get_cached_stocks_data()
+        hot_body = remember_stocks_body(stocks_data, stored_at, data_source)
+
+    response_meta = {
         "timestamp": stored_at or current_iso_timestamp(),
-        "count": len(stocks_data),
-        "source": "cache" if from_cache else data_source,
+        "count": hot_body["count"],
+        "source": "cache" if from_cache else hot_body["source"],
         "cache_ttl_seconds": STOCKS_CACHE_TTL
     }
 
     if from_cache:
-        response["cache_age_seconds"] = age
+        response_meta["cache_age_seconds"] = cache_age_seconds(stored_at)
 
-    return response
+    meta_json = json.dumps(response_meta, ensure_ascii=False, separators=(",", ":"))
+    body = '{"stocks":' + hot_body["stocks_json"] + "," + meta_json[1:]
+    return Response(content=body, media_type="application/json")
 
 
 @app.get("/api/stocks/{symbol}")
@@ -708,7 +885,7 @@ async def get_stock_detail(symbol: str):
         return {"error": "Ação não encontrada"}, 404
     
     try:
-        # Buscar dados da Brapi
+        # Buscar dados da Brapi (assíncrono, pool compartilhado)
         url = f"{BRAPI_BASE_URL}/quote/{symbol_upper}"
         params = {
             "range": "3mo",
@@ -716,7 +893,7 @@ async def get_stock_detail(symbol: str):
             "token": BRAPI_TOKEN
         }
         
-        response = requests.get(url, params=params, timeout=5)
+        response = await http_pool.get(url, params=params, timeout=BRAPI_TIMEOUT)
         
         if response.status_code != 200:
             return {"error": "Erro ao buscar dados da Brapi"}, 500
@@ -833,181 +1010,53 @@ class AIAnalysisRequest(BaseModel):
     fundamentals: Optional[dict] = None
     predictiveSignals: Optional[dict] = None
 
-async def generate_real_ai_analysis(
-    symbol: str,
-    currentPrice: float,
-    sector: str,
-    fundamentals: dict,
-    history: list,
-    predictive_signals: Optional[dict] = None,
-) -> dict:
+@app.get("/api/ai/analysis")
+async def get_cached_analyses(symbols: Optional[str] = None):
     """
-    Gera análise de IA REAL usando OpenAI GPT-4o
-    
-    Utiliza TRÊS perfis de analistas:
-    1. Fundamentalista (Warren) - Buy & Hold
-    2. Técnico (Trader) - Swing Trade
-    3. Volatilidade (Viper) - Day Trade
-    
-    Retorna JSON estruturado com scores e recomendações
+    Retorna as últimas análises em cache para vários ativos de uma vez
+    (ex.: ?symbols=PETR4,VALE3). Sem parâmetro, usa a lista monitorada.
+    Uma única ida ao cache (MGET) em vez de uma requisição por card.
+
+    O ponteiro `latest` vive 24h e pode trazer a análise de ontem: cada item
+    informa a própria data e `outdated` quando não é de hoje; `count` só
+    conta as análises do dia.
     """
-    import json
-
-    predictive_score = predictive_signals.get("score") if predictive_signals else None
-    risk_level = predictive_signals.get("riskLevel") if predictive_signals else None
-    risk_display = risk_level if risk_level else "N/D"
-    score_display = f"{predictive_score:.1f}" if predictive_score is not None else "N/D"
-
-    predictive_section = f"""
-[DADOS INTERNOS TAZE AI]
-Score Proprietário de Buy & Hold (ML): {score_display}/10.
-Risco Calculado: {risk_display}.
-INSTRUÇÃO: Você deve considerar nosso Score Proprietário na sua análise 'Warren'. Se o score for alto (>7), seja otimista citando "nossos modelos matemáticos". Se for baixo (<4), seja pessimista e mencione que "nossos modelos matemáticos" detectam risco elevado.
-"""
-    
-    # System Prompt Mestre (TRÊS analistas)
-    system_prompt = f"""Você é um comitê de TRÊS analistas financeiros de elite:
-
-1. **Analista Fundamentalista (Warren):** Focado em 'Buy & Hold' (longo prazo, anos).
-   Você ignora volatilidade diária. Sua análise foca EXCLUSIVAMENTE em fundamentalismo (P/L, P/VP, ROE, Dividend Yield e Dívida).
-   
-   **CAMPOS DISPONÍVEIS NOS DADOS:**
-   - indicators_pl (P/L - Preço/Lucro)
-   - indicators_pvp (P/VP - Preço/Valor Patrimonial)
-   - indicators_roe (ROE - Retorno sobre Patrimônio)
-   - indicators_div_yield (Dividend Yield %)
-   - indicators_roic (ROIC %)
-   - indicators_marg_liquida (Margem Líquida %)
-   - indicators_div_br_patrim (Dívida Bruta/Patrimônio)
-   - indicators_cresc_rec (Crescimento de Receita %)
-
-2. **Analista Técnico (Trader):** Focado em 'Swing Trade' (médio prazo, semanas/meses).
-   Você usa o histórico de 90 dias para identificar tendências, médias móveis, suporte e resistência.
-
-3. **Analista de Volatilidade (Viper):** Focado em 'Day Trade' (curto prazo, 1-2 dias).
-   Você analisa a volatilidade, oscillations_day e os min_52_weeks/max_52_weeks para oportunidades rápidas.
-
-{predictive_section}
-
-**REGRA CRÍTICA DE LÓGICA:** Sua análise técnica (suporte/resistência) DEVE ser 100% coerente com o currentPrice (preço atual) fornecido.
-Nunca diga que uma resistência (teto) é MENOR que o preço atual. Use o currentPrice como sua âncora para definir suportes (abaixo) e resistências (acima).
-
-**Sua tarefa:** Analisar os dados fornecidos e retornar um JSON ESTRITO:
-
-{
-  "buy_and_hold_score": 7.5,
-  "buy_and_hold_summary": "Análise fundamentalista (1-2 frases).",
-  "swing_trade_score": 8.0,
-  "swing_trade_summary": "Análise técnica de médio prazo (1-2 frases).",
-  "day_trade_score": 6.5,
-  "day_trade_summary": "Análise de volatilidade de curto prazo (1-2 frases).",
-  "recommendation": "COMPRA FORTE"
-}
-
-**Critérios de Score:**
-- 0-3: Ruim (evitar)
-- 4-5: Fraco (cautela)
-- 6-7: Razoável (considerar)
-- 8-9: Bom (recomendado)
-- 10: Excelente (altamente recomendado)
-
-**Opções de Recommendation:**
-COMPRA FORTE | COMPRA | MANTER | VENDA
-
-RETORNE APENAS O JSON, SEM TEXTO ADICIONAL."""
-    # User Prompt (dados da ação)
-    user_prompt = f"""Analise esta ação da B3:
-
-**AÇÃO:** {symbol}
-**SETOR:** {sector}
-**PREÇO ATUAL:** R$ {currentPrice:.2f}
-
-**DADOS FUNDAMENTALISTAS:**
-```json
-{json.dumps(fundamentals, indent=2, ensure_ascii=False)}
-```
-
-**HISTÓRICO DE PREÇOS (últimos 90 dias):**
-```json
-{json.dumps(history[-90:], indent=2, ensure_ascii=False)}
-```
-
-Analise estes dados e retorne o JSON conforme especificado."""
+    requested = [s.strip().upper() for s in symbols.split(",") if s.strip()] if symbols else list(B3_STOCKS)
+    requested = list(dict.fromkeys(requested))
+    today = datetime.now().strftime("%Y-%m-%d")
+    keys = {symbol: latest_analysis_cache_key(symbol) for symbol in requested}
+
+    cached_entries = await cache.get_many(list(keys.values()))
+
+    analyses = {}
+    for symbol, cache_key in keys.items():
+        cached_entry = cached_entries.get(cache_key)
+        if cached_entry and cached_entry.get("analysis"):
+            generated_at = cached_entry.get("timestamp")
+            generated_date = str(generated_at)[:10] if generated_at else None
+            analyses[symbol] = {
+                "cached": True,
+                "analysis": cached_entry["analysis"],
+                "generated_at": generated_at,
+                "date": generated_date,
+                "outdated": generated_date != today
+            }
+        else:
+            analyses[symbol] = {"cached": False}
 
-    try:
-        print(f"[AI] Gerando análise REAL para {symbol} usando GPT-4o...")
-        
-        # Chamar OpenAI GPT-4o
-        response = openai_client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
-            response_format={"type": "json_object"},  # Força resposta JSON
-            temperature=0.7,  # Criatividade moderada
-            max_tokens=1200   # Limite de tokens
-        )
-        
-        # Extrair JSON da resposta
-        ai_response = json.loads(response.choices[0].message.content)
-        
-        print(f"[AI] Análise gerada com sucesso para {symbol}")
-        print(f"[AI] Scores: Buy&Hold={ai_response.get('buy_and_hold_score')}, SwingTrade={ai_response.get('swing_trade_score')}, DayTrade={ai_response.get('day_trade_score')}")
-        
-        # Validar campos obrigatórios
-        required_fields = [
-            "buy_and_hold_score", 
-            "buy_and_hold_summary",
-            "swing_trade_score",
-            "swing_trade_summary",
-            "day_trade_score",
-            "day_trade_summary",
-            "recommendation"
-        ]
-        
-        for field in required_fields:
-            if field not in ai_response:
-                raise ValueError(f"Campo obrigatório ausente: {field}")
-        
-        # Retornar resposta estruturada
-        return {
-            "symbol": symbol,
-            "buyAndHoldScore": float(ai_response["buy_and_hold_score"]),
-            "buyAndHoldSummary": ai_response["buy_and_hold_summary"],
-            "swingTradeScore": float(ai_response["swing_trade_score"]),
-            "swingTradeSummary": ai_response["swing_trade_summary"],
-            "dayTradeScore": float(ai_response["day_trade_score"]),
-            "dayTradeSummary": ai_response["day_trade_summary"],
-            "recommendation": ai_response["recommendation"],
-            "generatedAt": datetime.now().isoformat()
-        }
-        
-    except Exception as e:
-        print(f"[AI ERROR] Erro ao gerar análise: {e}")
-        # Fallback: retornar análise básica
-        return {
-            "symbol": symbol,
-            "buyAndHoldScore": 5.0,
-            "buyAndHoldSummary": f"Erro ao gerar análise fundamentalista. Tente novamente. Erro: {str(e)[:100]}",
-            "swingTradeScore": 5.0,
-            "swingTradeSummary": f"Erro ao gerar análise técnica. Tente novamente. Erro: {str(e)[:100]}",
-            "dayTradeScore": 5.0,
-            "dayTradeSummary": f"Erro ao gerar análise de volatilidade. Tente novamente. Erro: {str(e)[:100]}",
-            "recommendation": "MANTER",
-            "generatedAt": datetime.now().isoformat()
-        }
+    return {
+        "analyses": analyses,
+        "count": sum(1 for item in analyses.values() if item["cached"] and not item["outdated"]),
+        "date": today
+    }
 
 @app.get("/api/ai/analysis/{symbol}")
 async def get_cached_analysis(symbol: str):
     """
-    Retorna análise em cache do dia (se existir)
+    Retorna a última análise em cache (se existir)
     Economiza tokens ao não gerar análise toda vez
     """
-    today = datetime.now().strftime("%Y-%m-%d")
-    cache_key = f"ai_analysis:{symbol.upper()}_{today}"
-    
-    cached_entry = await cache.get(cache_key)
+    cached_entry = await cache.get(latest_analysis_cache_key(symbol))
     if cached_entry and cached_entry.get("analysis"):
         return {
             "cached": True,
@@ -1017,7 +1066,7 @@ async def get_cached_analysis(symbol: str):
     
     return {
         "cached": False,
-        "message": "Nenhuma análise do dia encontrada. Clique em 'Gerar Análise'."
+        "message": "Nenhuma análise recente encontrada. Clique em 'Gerar Análise'."
     }
 
 @app.post("/api/ai/analyze")
@@ -1040,34 +1089,67 @@ async def analyze_stock(request: AIAnalysisRequest):
             "history": request.history,
             "fundamentals": request.fundamentals or {},
         }
-        predictive_signals = predictive_service.predict_score(request.symbol, snapshot)
-    
-    # Gerar análise REAL (não mock!)
-    analysis = await generate_real_ai_analysis(
-        symbol=request.symbol,
-        currentPrice=request.currentPrice,
-        sector=request.fundamentals.get("sector", "N/A") if request.fundamentals else "N/A",
-        fundamentals=request.fundamentals or {},
-        history=request.history,
-        predictive_signals=predictive_signals
+        predictive_signals = await predict_signals(request.symbol, snapshot)
+
+    # Chave endereçada pelo conteúdo: mesmas entradas (a menos do limiar) = mesma análise
+    fingerprint = analysis_fingerprint(
+        request.symbol,
+        request.currentPrice,
+        request.history,
+        request.fundamentals,
+        predictive_signals,
     )
-    
-    # Salvar em cache (por dia) - ESSENCIAL para economizar tokens!
-    today = datetime.now().strftime("%Y-%m-%d")
-    today = datetime.now().strftime("%Y-%m-%d")
-    cache_key = f"ai_analysis:{request.symbol.upper()}_{today}"
-    await cache.set(
-        cache_key,
-        {
+    cache_key = analysis_cache_key(request.symbol, fingerprint)
+
+    cached_entry = await cache.get(cache_key)
+    if cached_entry and cached_entry.get("analysis"):
+        print(f"[AI CACHE] Entradas sem mudança material, reaproveitando: {cache_key}")
+        await cache.set(latest_analysis_cache_key(request.symbol), cached_entry, AI_ANALYSIS_CACHE_TTL)
+        return cached_entry["analysis"]
+
+    # O job noturno monta as entradas a partir do silver (ml.inference) e o dashboard
+    # a partir de Brapi/Tradebox ao vivo: os fingerprints não coincidem. A análise do
+    # batch (ponteiro latest) vale enquanto o preço ao vivo ficar dentro do limiar
+    # de mudança em relação ao preço usado à noite, como no fingerprint.
+    latest_entry = await cache.get(latest_analysis_cache_key(request.symbol))
+    if (
+        latest_entry
+        and latest_entry.get("analysis")
+        and latest_entry.get("source") == "batch"
+        and price_within_change_threshold(latest_entry.get("price"), request.currentPrice)
+    ):
+        print(f"[AI CACHE] Reaproveitando a análise do job noturno de {request.symbol}")
+        return latest_entry["analysis"]
+
+    async def generate_and_store() -> dict[str, Any]:
+        # Gerar análise REAL (não mock!)
+        analysis = await generate_real_ai_analysis(
+            openai_client,
+            symbol=request.symbol,
+            currentPrice=request.currentPrice,
+            sector=request.fundamentals.get("sector", "N/A") if request.fundamentals else "N/A",
+            fundamentals=request.fundamentals or {},
+            history=request.history,
+            predictive_signals=predictive_signals
+        )
+
+        # Salvar em cache (pelo fingerprint) - ESSENCIAL para economizar tokens!
+        entry = {
             "analysis": analysis,
-            "timestamp": current_iso_timestamp()
-        },
-        AI_ANALYSIS_CACHE_TTL
-    )
-    
-    print(f"[AI CACHE] Analise TRIPLA gerada e armazenada: {cache_key}")
-    
-    return analysis
+            "timestamp": current_iso_timestamp(),
+            "fingerprint": fingerprint
+        }
+        if analysis.get("error"):
+            # Fallback de erro não é reaproveitado: a próxima requisição tenta de novo
+            return entry
+        await cache.set(cache_key, entry, AI_ANALYSIS_REUSE_TTL)
+        await cache.set(latest_analysis_cache_key(request.symbol), entry, AI_ANALYSIS_CACHE_TTL)
+        print(f"[AI CACHE] Analise TRIPLA gerada e armazenada: {cache_key}")
+        return entry
+
+    # Cliques simultâneos no mesmo ativo disparam uma única chamada ao GPT-4o
+    entry = await cache.single_flight(cache_key, generate_and_store, lease_seconds=120)
+    return entry["analysis"]
 
 # ==================== CHAT ASSISTANT ENDPOINTS ====================
 
@@ -1075,15 +1157,8 @@ class ChatMessage(BaseModel):
     message: str
     context: dict | None = None
 
-@app.post("/api/ai/chat")
-async def chat_with_assistant(request: ChatMessage):
-    """
-    Chat em tempo real com o Taze AI Assistant (OpenAI GPT-4)
-    Usa Function Calling para buscar dados de ações quando necessário
-    """
-    try:
-        # System prompt poderoso para o assistente financeiro
-        system_prompt = """Você é o Taze AI, um analista financeiro sênior especialista em ações da B3 (Bolsa de Valores brasileira).
+# System prompt poderoso para o assistente financeiro
+CHAT_SYSTEM_PROMPT = """Você é o Taze AI, um analista financeiro sênior especialista em ações da B3 (Bolsa de Valores brasileira).
 
 **Ações Disponíveis:** PETR4, BBAS3, VALE3, MGLU3, WEGE3
 
@@ -1100,36 +1175,94 @@ async def chat_with_assistant(request: ChatMessage):
 - Seja objetivo: máximo 200 palavras por resposta
 """
 
-        # Definir tools (functions) disponíveis para a IA
-        tools = [
-            {
-                "type": "function",
-                "function": {
-                    "name": "get_stock_data",
-                    "description": "Busca dados em tempo real de uma ação da B3 (preço atual, variação, setor, fundamentais)",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "symbol": {
-                                "type": "string",
-                                "description": "Símbolo da ação (ex: PETR4, VALE3, BBAS3, MGLU3, WEGE3)",
-                                "enum": ["PETR4", "BBAS3", "VALE3", "MGLU3", "WEGE3"]
-                            }
-                        },
-                        "required": ["symbol"]
+# Tools (functions) disponíveis para a IA
+CHAT_TOOLS = [
+    {
+        "type": "function",
+        "function": {
+            "name": "get_stock_data",
+            "description": "Busca dados em tempo real de uma ação da B3 (preço atual, variação, setor, fundamentais)",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "symbol": {
+                        "type": "string",
+                        "description": "Símbolo da ação (ex: PETR4, VALE3, BBAS3, MGLU3, WEGE3)",
+                        "enum": ["PETR4", "BBAS3", "VALE3", "MGLU3", "WEGE3"]
                     }
-                }
+                },
+                "required": ["symbol"]
             }
+        }
+    }
+]
+
+def parse_tool_arguments(arguments: Optional[str]) -> Optional[dict[str, Any]]:
+    """Decodifica os argumentos de uma tool call; None se o JSON vier malformado."""
+    try:
+        parsed = json.loads(arguments or "{}")
+    except (TypeError, ValueError):
+        return None
+    return parsed if isinstance(parsed, dict) else None
+
+async def resolve_chat_tool_call(function_name: str, arguments: str) -> str:
+    """
+    Executa a tool pedida pela IA e retorna o conteúdo (JSON) da mensagem 'tool'.
+    get_stock_data lê o agregado já em cache de /api/stocks; só busca na
+    Tradebox se o ativo não estiver lá.
+    """
+    if function_name != "get_stock_data":
+        return json.dumps({"error": f"Função desconhecida: {function_name}"})
+
+    parsed_arguments = parse_tool_arguments(arguments)
+    if parsed_arguments is None:
+        # Argumentos malformados voltam como erro da tool para a IA corrigir
+        return json.dumps({"error": f"Argumentos inválidos para {function_name}: {arguments!r}"}, ensure_ascii=False)
+
+    symbol = str(parsed_arguments.get("symbol") or "").upper()
+    print(f"[CHAT] IA solicitou dados de {symbol}")
+
+    stocks_data, _, _, _ = await get_cached_stocks_data()
+    stock_data = next((stock for stock in stocks_data if stock.get("symbol") == symbol), None)
+    if stock_data is None and symbol in B3_STOCKS:
+        auth = (TRADEBOX_API_USER, TRADEBOX_API_PASS)
+        stock_data = await get_aggregated_stock_data(symbol, auth)
+
+    if not stock_data:
+        return json.dumps({"error": "Dados não disponíveis no momento"})
+
+    fundamentals = stock_data.get("fundamentals") or {}
+    return json.dumps({
+        "symbol": stock_data.get("symbol"),
+        "name": stock_data.get("name"),
+        "currentPrice": stock_data.get("currentPrice"),
+        "dailyVariation": stock_data.get("dailyVariation"),
+        "sector": stock_data.get("sector"),
+        "fundamentals": {
+            "pl": fundamentals.get("indicators_pl"),
+            "pvp": fundamentals.get("indicators_pvp"),
+            "dividend_yield": fundamentals.get("indicators_div_yield"),
+            "roe": fundamentals.get("indicators_roe")
+        }
+    }, ensure_ascii=False)
+
+@app.post("/api/ai/chat")
+async def chat_with_assistant(request: ChatMessage):
+    """
+    Chat em tempo real com o Taze AI Assistant (OpenAI GPT-4)
+    Usa Function Calling para buscar dados de ações quando necessário
+    """
+    try:
+        messages = [
+            {"role": "system", "content": CHAT_SYSTEM_PROMPT},
+            {"role": "user", "content": request.message}
         ]
-        
+
         # Primeira chamada à IA
-        response = openai_client.chat.completions.create(
+        response = await openai_client.chat_completion(
             model="gpt-4o",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": request.message}
-            ],
-            tools=tools,
+            messages=messages,
+            tools=CHAT_TOOLS,
             tool_choice="auto",  # IA decide se precisa chamar função
             max_tokens=500,
             temperature=0.7,
@@ -1139,56 +1272,24 @@ async def chat_with_assistant(request: ChatMessage):
         
         # Verificar se a IA quer chamar uma função
         if response_message.tool_calls:
-            # Executar a função solicitada
-            tool_call = response_message.tool_calls[0]
-            function_name = tool_call.function.name
+            tool_messages = [
+                {
+                    "role": "tool",
+                    "tool_call_id": tool_call.id,
+                    "content": await resolve_chat_tool_call(tool_call.function.name, tool_call.function.arguments)
+                }
+                for tool_call in response_message.tool_calls
+            ]
+
+            # Segunda chamada com o resultado da função
+            second_response = await openai_client.chat_completion(
+                model="gpt-4o",
+                messages=[*messages, response_message, *tool_messages],
+                max_tokens=500,
+                temperature=0.7,
+            )
             
-            if function_name == "get_stock_data":
-                import json
-                function_args = json.loads(tool_call.function.arguments)
-                symbol = function_args.get("symbol")
-                
-                print(f"[CHAT] IA solicitou dados de {symbol}")
-                
-                # Buscar dados da ação
-                auth = (TRADEBOX_API_USER, TRADEBOX_API_PASS)
-                stock_data = await get_aggregated_stock_data(symbol, auth)
-                
-                if stock_data:
-                    function_response = json.dumps({
-                        "symbol": stock_data.get("symbol"),
-                        "name": stock_data.get("name"),
-                        "currentPrice": stock_data.get("currentPrice"),
-                        "dailyVariation": stock_data.get("dailyVariation"),
-                        "sector": stock_data.get("sector"),
-                        "fundamentals": {
-                            "pl": stock_data.get("fundamentals", {}).get("indicators_pl"),
-                            "pvp": stock_data.get("fundamentals", {}).get("indicators_pvp"),
-                            "dividend_yield": stock_data.get("fundamentals", {}).get("indicators_div_yield"),
-                            "roe": stock_data.get("fundamentals", {}).get("indicators_roe")
-                        }
-                    }, ensure_ascii=False)
-                else:
-                    function_response = json.dumps({"error": "Dados não disponíveis no momento"})
-                
-                # Segunda chamada com o resultado da função
-                second_response = openai_client.chat.completions.create(
-                    model="gpt-4o",
-                    messages=[
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": request.message},
-                        response_message,
-                        {
-                            "role": "tool",
-                            "tool_call_id": tool_call.id,
-                            "content": function_response
-                        }
-                    ],
-                    max_tokens=500,
-                    temperature=0.7,
-                )
-                
-                assistant_reply = second_response.choices[0].message.content
+            assistant_reply = second_response.choices[0].message.content
         else:
             # Resposta direta sem função
             assistant_reply = response_message.content
@@ -1211,5 +1312,90 @@ async def chat_with_assistant(request: ChatMessage):
             "timestamp": datetime.now().isoformat()
         }
 
+def sse_event(payload: dict[str, Any]) -> str:
+    return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+@app.post("/api/ai/chat/stream")
+async def chat_with_assistant_stream(request: ChatMessage):
+    """
+    Variante streaming do chat (Server-Sent Events).
+    Eventos: {"type": "token", "content"}, {"type": "tool", "name", "symbol"},
+    {"type": "done", "model", "timestamp"} e {"type": "error", "message"}.
+    Tool calls são montadas a partir dos deltas e resolvidas no meio do stream
+    com os dados já em cache.
+    """
+    async def event_stream():
+        messages: list[dict[str, Any]] = [
+            {"role": "system", "content": CHAT_SYSTEM_PROMPT},
+            {"role": "user", "content": request.message}
+        ]
+        try:
+            # Até 2 rodadas: a primeira pode terminar em tool_calls
+            for round_number in range(2):
+                # Estrutura: {index: {"id", "name", "arguments"}}
+                pending_calls: dict[int, dict[str, str]] = {}
+                finish_reason = None
+                options: dict[str, Any] = {"tools": CHAT_TOOLS, "tool_choice": "auto"} if round_number == 0 else {}
+
+                async for chunk in openai_client.stream_chat_completion(
+                    model="gpt-4o",
+                    messages=messages,
+                    max_tokens=500,
+                    temperature=0.7,
+                    **options,
+                ):
+                    if not chunk.choices:
+                        continue
+                    choice = chunk.choices[0]
+                    delta = choice.delta
+                    if delta.content:
+                        yield sse_event({"type": "token", "content": delta.content})
+                    for tool_delta in delta.tool_calls or []:
+                        call = pending_calls.setdefault(tool_delta.index, {"id": "", "name": "", "arguments": ""})
+                        if tool_delta.id:
+                            call["id"] = tool_delta.id
+                        if tool_delta.function and tool_delta.function.name:
+                            call["name"] += tool_delta.function.name
+                        if tool_delta.function and tool_delta.function.arguments:
+                            call["arguments"] += tool_delta.function.arguments
+                    if choice.finish_reason:
+                        finish_reason = choice.finish_reason
+
+                if finish_reason != "tool_calls" or not pending_calls:
+                    break
+
+                calls = [pending_calls[index] for index in sorted(pending_calls)]
+                messages.append({
+                    "role": "assistant",
+                    "content": None,
+                    "tool_calls": [
+                        {
+                            "id": call["id"],
+                            "type": "function",
+                            "function": {"name": call["name"], "arguments": call["arguments"]}
+                        }
+                        for call in calls
+                    ]
+                })
+                for call in calls:
+                    symbol = (parse_tool_arguments(call["arguments"]) or {}).get("symbol")
+                    yield sse_event({"type": "tool", "name": call["name"], "symbol": symbol})
+                    messages.append({
+                        "role": "tool",
+                        "tool_call_id": call["id"],
+                        "content": await resolve_chat_tool_call(call["name"], call["arguments"])
+                    })
+
+            yield sse_event({"type": "done", "model": "gpt-4o", "timestamp": datetime.now().isoformat()})
+        except Exception as e:
+            print(f"[CHAT ERROR] {str(e)}")
+            yield sse_event({"type": "error", "message": f"Desculpe, ocorreu um erro: {str(e)}"})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 if __name__ == "__main__":
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
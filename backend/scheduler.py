@@ -0,0 +1,124 @@
+import asyncio
+import os
+import random
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Optional
+
+from cache_manager import CacheManager
+
+
+@dataclass
+class WarmJob:
+    """Chave de cache que deve ser recarregada antes de expirar."""
+
+    name: str
+    key: str
+    loader: Callable[[], Awaitable[Any]]
+    ttl_seconds: int
+    runs: int = 0
+    failures: int = 0
+    last_duration_seconds: Optional[float] = None
+    last_success_at: Optional[float] = None
+    last_error: Optional[str] = None
+
+
+class CacheWarmer:
+    """
+    Scheduler asyncio que pré-aquece caches antes do TTL expirar.
+
+    Cada job roda a cada `ttl * lead_ratio` segundos com jitter, para que
+    réplicas e chaves não sincronizem rajadas. Só o líder (lease Redis renovado
+    em heartbeat) executa os refreshes; sem REDIS_URL o processo é sempre líder.
+    Com o Redis fora do ar ninguém é líder (o ciclo é pulado), e o líder libera
+    o lease no shutdown para outra réplica assumir sem esperar o TTL.
+    """
+
+    LEADER_LEASE_NAME = "scheduler:leader"
+
+    def __init__(self, cache: CacheManager, lead_ratio: float = 0.8, jitter_ratio: float = 0.1) -> None:
+        self.cache = cache
+        self.lead_ratio = float(os.getenv("CACHE_WARMER_LEAD_RATIO", str(lead_ratio)))
+        self.jitter_ratio = float(os.getenv("CACHE_WARMER_JITTER_RATIO", str(jitter_ratio)))
+        self.leader_lease_seconds = int(os.getenv("CACHE_WARMER_LEADER_LEASE", "30"))
+        self.owner_id = uuid.uuid4().hex
+        self.is_leader = False
+        self._jobs: list[WarmJob] = []
+        self._tasks: list[asyncio.Task] = []
+
+    def add_job(self, name: str, key: str, loader: Callable[[], Awaitable[Any]], ttl_seconds: int) -> None:
+        self._jobs.append(WarmJob(name=name, key=key, loader=loader, ttl_seconds=ttl_seconds))
+
+    def _interval(self, job: WarmJob) -> float:
+        base = max(1.0, job.ttl_seconds * self.lead_ratio)
+        jitter = base * self.jitter_ratio
+        return max(1.0, base + random.uniform(-jitter, jitter))
+
+    async def _leader_loop(self) -> None:
+        # Renova o lease a cada 1/3 da validade: se o líder cair, outra réplica assume em segundos.
+        while True:
+            self.is_leader = await self.cache.hold_lease(
+                self.LEADER_LEASE_NAME, self.owner_id, self.leader_lease_seconds
+            )
+            await asyncio.sleep(max(1.0, self.leader_lease_seconds / 3))
+
+    async def _run_job(self, job: WarmJob) -> None:
+        # Primeiro ciclo logo após o startup (com jitter curto) para aquecer o cache.
+        delay = random.uniform(1.0, max(1.0, min(5.0, job.ttl_seconds * self.jitter_ratio)))
+        while True:
+            await asyncio.sleep(delay)
+            delay = self._interval(job)
+            if not self.is_leader:
+                continue
+
+            started = time.perf_counter()
+            try:
+                result = await self.cache.single_flight(job.key, job.loader)
+                if isinstance(result, dict) and result.get("error"):
+                    raise RuntimeError(result["error"])
+                job.last_success_at = time.time()
+                job.last_error = None
+            except Exception as exc:
+                job.failures += 1
+                job.last_error = str(exc)[:200]
+                print(f"[SCHEDULER] Falha ao pré-aquecer {job.name}: {exc}")
+            finally:
+                job.runs += 1
+                job.last_duration_seconds = round(time.perf_counter() - started, 3)
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        self._tasks.append(asyncio.create_task(self._leader_loop(), name="warm:leader"))
+        for job in self._jobs:
+            self._tasks.append(asyncio.create_task(self._run_job(job), name=f"warm:{job.name}"))
+        print(f"[SCHEDULER] Pré-aquecimento iniciado para {[job.name for job in self._jobs]}")
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self.is_leader:
+            self.is_leader = False
+            await self.cache.release_lease(self.LEADER_LEASE_NAME, self.owner_id)
+
+    def stats(self) -> dict[str, Any]:
+        now = time.time()
+        return {
+            "running": bool(self._tasks),
+            "leader": self.is_leader,
+            "jobs": {
+                job.name: {
+                    "runs": job.runs,
+                    "failures": job.failures,
+                    "last_duration_seconds": job.last_duration_seconds,
+                    "last_success_age_seconds": (
+                        round(now - job.last_success_at, 1) if job.last_success_at else None
+                    ),
+                    "last_error": job.last_error,
+                }
+                for job in self._jobs
+            },
+        }
@@ -83,23 +83,24 @@ export default function Dashboard() {
       
       const stocksData = await stocksResponse.json()
       
-      // Buscar análises em cache para cada ação
-      const stocksWithAnalysis = await Promise.all(
-        stocksData.stocks.map(async (stock: Stock) => {
-          try {
-            const analysisResponse = await fetch(`http://localhost:8000/api/ai/analysis/${stock.symbol}`)
-            const analysisData = await analysisResponse.json()
-            
-            if (analysisData.cached && analysisData.analysis) {
-              return { ...stock, ai_analysis: analysisData.analysis }
-            }
-            return stock
-          } catch (error) {
-            console.error(`Erro ao buscar análise de ${stock.symbol}:`, error)
-            return stock
-          }
-        })
-      )
+      // Análises em cache de todas as ações numa única requisição (MGET no backend)
+      let analyses: Record<string, { cached: boolean; analysis?: Stock['ai_analysis'] }> = {}
+      try {
+        const symbols = stocksData.stocks.map((stock: Stock) => stock.symbol).join(',')
+        const analysisResponse = await fetch(
+          `http://localhost:8000/api/ai/analysis?symbols=${encodeURIComponent(symbols)}`
+        )
+        if (analysisResponse.ok) {
+          analyses = (await analysisResponse.json()).analyses || {}
+        }
+      } catch (error) {
+        console.error('Erro ao buscar análises em cache:', error)
+      }
+
+      const stocksWithAnalysis = stocksData.stocks.map((stock: Stock) => {
+        const entry = analyses[stock.symbol]
+        return entry?.cached && entry.analysis ? { ...stock, ai_analysis: entry.analysis } : stock
+      })
       
       setStocks(stocksWithAnalysis)
     } catch (error) {
@@ -42,10 +42,13 @@ export default function AIInsights({ stock }: AIInsightsProps) {
 
   const checkCachedAnalysis = async () => {
     try {
-      const response = await fetch(`http://localhost:8000/api/ai/analysis/${stock.symbol}`)
-      const data = await response.json()
+      // Mesmo endpoint em lote do dashboard, resultado indexado pelo símbolo
+      const response = await fetch(
+        `http://localhost:8000/api/ai/analysis?symbols=${encodeURIComponent(stock.symbol)}`
+      )
+      const data = (await response.json()).analyses?.[stock.symbol.toUpperCase()]
       
-      if (data.cached && data.analysis) {
+      if (data?.cached && data.analysis) {
         setAnalysis(data.analysis)
         setCached(true)
       } else {
@@ -62,8 +62,11 @@ export default function ChatWidget({ selectedStock }: ChatWidgetProps) {
     setInput('')
     setIsTyping(true)
 
+    const assistantId = (Date.now() + 1).toString()
+
     try {
-      const response = await fetch('http://localhost:8000/api/ai/chat', {
+      // Streaming (SSE): os tokens aparecem conforme a IA gera
+      const response = await fetch('http://localhost:8000/api/ai/chat/stream', {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
@@ -73,32 +76,62 @@ export default function ChatWidget({ selectedStock }: ChatWidgetProps) {
         })
       })
 
-      if (!response.ok) {
+      if (!response.ok || !response.body) {
         throw new Error(`HTTP ${response.status}`)
       }
 
-      const data = await response.json()
+      const reader = response.body.getReader()
+      const decoder = new TextDecoder()
+      let buffer = ''
+
+      while (true) {
+        const { done, value } = await reader.read()
+        if (done) break
+        buffer += decoder.decode(value, { stream: true })
+
+        const events = buffer.split('\n\n')
+        buffer = events.pop() || ''
+
+        for (const event of events) {
+          if (!event.startsWith('data: ')) continue
+          const payload = JSON.parse(event.slice(6))
 
-      if (data.success && data.message) {
-        const assistantMessage: Message = {
-          id: (Date.now() + 1).toString(),
-          role: 'assistant',
-          content: data.message,
-          timestamp: new Date()
+          if (payload.type === 'token') {
+            // A bolha da resposta nasce com o primeiro token
+            setIsTyping(false)
+            setMessages(prev => prev.some(message => message.id === assistantId)
+              ? prev.map(message =>
+                  message.id === assistantId
+                    ? { ...message, content: message.content + payload.content }
+                    : message
+                )
+              : [...prev, { id: assistantId, role: 'assistant', content: payload.content, timestamp: new Date() }]
+            )
+          } else if (payload.type === 'done') {
+            // Resposta sem nenhum token (só tool call ou completion vazia)
+            setMessages(prev => prev.some(message => message.id === assistantId)
+              ? prev
+              : [...prev, {
+                  id: assistantId,
+                  role: 'assistant',
+                  content: 'Não consegui gerar uma resposta para essa pergunta. Pode reformular?',
+                  timestamp: new Date()
+                }]
+            )
+          } else if (payload.type === 'error') {
+            throw new Error(payload.message)
+          }
         }
-        setMessages(prev => [...prev, assistantMessage])
-      } else {
-        throw new Error(data.error || 'Erro ao processar resposta')
       }
     } catch (error) {
       console.error('Erro ao enviar mensagem:', error)
       const errorMessage: Message = {
-        id: (Date.now() + 1).toString(),
+        id: assistantId,
         role: 'assistant',
         content: `❌ Desculpe, ocorreu um erro ao processar sua mensagem: ${error instanceof Error ? error.message : 'Erro desconhecido'}. Por favor, tente novamente.`,
         timestamp: new Date()
       }
-      setMessages(prev => [...prev, errorMessage])
+      setMessages(prev => [...prev.filter(message => message.id !== assistantId), errorMessage])
     } finally {
       setIsTyping(false)
     }
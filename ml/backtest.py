@@ -1,6 +1,11 @@
 from __future__ import annotations
 
+import argparse
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime, timedelta
+from functools import partial
 from pathlib import Path
 from typing import Dict, List, Tuple, Any
 
@@ -9,11 +14,11 @@ import numpy as np
 import pandas as pd
 
 from .config import settings
+from .feature_store import FeatureStore
 import matplotlib.pyplot as plt
 
 
 BASE_DIR = Path(__file__).resolve().parent
-DATA_DIR = BASE_DIR / "data" / "silver"
 MODEL_PATH = BASE_DIR / "models" / "buyhold_xgb.pkl"
 RESULTS_DIR = BASE_DIR / "results"
 RESULTS_DIR.mkdir(parents=True, exist_ok=True)
@@ -25,18 +30,37 @@ MAX_RET = 0.15
 RISK_LOW = 0.015
 RISK_HIGH = 0.035
 
+
+# Regras como funções de módulo / functools.partial (e não lambdas): os perfis
+# são enviados aos processos do pool (--workers) e precisam ser serializáveis.
+def score_above(threshold: float, score: float, risk_label: str) -> bool:
+    return score > threshold
+
+
+def score_below(threshold: float, score: float, risk_label: str) -> bool:
+    return score < threshold
+
+
+def _conservador_buy(score: float, risk_label: str) -> bool:
+    return score > 8.5 and risk_label == "BAIXO"
+
+
+def _agressivo_buy(score: float, risk_label: str) -> bool:
+    return score > 6.0 or (score > 5.0 and risk_label == "ALTO")
+
+
 PROFILE_RULES = {
     "Conservador": {
-        "buy": lambda score, risk_label: score > 8.5 and risk_label == "BAIXO",
-        "sell": lambda score, risk_label: score < 7.5,
+        "buy": _conservador_buy,
+        "sell": partial(score_below, 7.5),
     },
     "Moderado": {
-        "buy": lambda score, risk_label: score > 7.0,
-        "sell": lambda score, risk_label: score < 5.0,
+        "buy": partial(score_above, 7.0),
+        "sell": partial(score_below, 5.0),
     },
     "Agressivo": {
-        "buy": lambda score, risk_label: score > 6.0 or (score > 5.0 and risk_label == "ALTO"),
-        "sell": lambda score, risk_label: score < 3.5,
+        "buy": _agressivo_buy,
+        "sell": partial(score_below, 3.5),
     },
 }
 
@@ -70,13 +94,15 @@ def load_model() -> Tuple[any, List[str]]:
 
 
 def load_silver_frame(symbol: str) -> pd.DataFrame:
-    files = sorted(DATA_DIR.glob(f"{symbol}_*.parquet"))
-    if not files:
+    store = FeatureStore()
+    latest_date = store.latest_silver_date(symbol)
+    if latest_date is None:
         raise FileNotFoundError(f"Nenhum dataset silver encontrado para {symbol}. Rode ml/ingest.py primeiro.")
 
-    df = pd.read_parquet(files[-1])
+    # Só as partições/row groups da janela do backtest são lidos
+    cutoff = pd.Timestamp(latest_date) - timedelta(days=BACKTEST_DAYS)
+    df = store.query_silver([symbol], start=cutoff)
     df["date"] = pd.to_datetime(df["date"])
-    cutoff = df["date"].max() - timedelta(days=BACKTEST_DAYS)
     df = df[df["date"] >= cutoff].copy()
     df.sort_values("date", inplace=True)
     if df.empty:
@@ -99,13 +125,141 @@ def prediction_to_score(prediction: float, risk_value: float) -> float:
     return float(np.clip(base_score - penalty, 0.0, 10.0))
 
 
+@dataclass
+class ScoredSeries:
+    """Preços, scores e rótulos de risco de um ativo, calculados em lote."""
+
+    dates: List[pd.Timestamp]
+    prices: np.ndarray
+    scores: np.ndarray
+    risk_labels: np.ndarray
+
+
+def prediction_to_score_array(predictions: np.ndarray, risk_values: np.ndarray) -> np.ndarray:
+    """Versão vetorizada de `prediction_to_score` (mesma aritmética, elemento a elemento)."""
+    clamped = np.clip(predictions, MIN_RET, MAX_RET)
+    normalized = (clamped - MIN_RET) / (MAX_RET - MIN_RET)
+    base_score = normalized * 10
+    penalty = np.select([risk_values < RISK_LOW, risk_values < RISK_HIGH], [0.0, 0.4], default=0.8)
+    return np.clip(base_score - penalty, 0.0, 10.0)
+
+
+def classify_risk_array(risk_values: np.ndarray) -> np.ndarray:
+    return np.select(
+        [risk_values < RISK_LOW, risk_values < RISK_HIGH],
+        ["BAIXO", "MODERADO"],
+        default="ALTO",
+    )
+
+
+def score_symbol(df: pd.DataFrame, model, feature_names: List[str]) -> ScoredSeries:
+    """
+    Monta a matriz de features uma única vez e roda `model.predict` em lote
+    para todas as linhas com preço válido.
+    """
+    valid = df[df["close"].astype(float) > 0]
+    if valid.empty:
+        raise ValueError("Nenhum preço válido encontrado para o backtest.")
+
+    features = valid.reindex(columns=feature_names).astype(float).fillna(0.0).to_numpy()
+    raw_preds = np.asarray(model.predict(features), dtype=float)
+    if "volatility_21" in valid.columns:
+        risk_values = valid["volatility_21"].astype(float).to_numpy()
+    else:
+        risk_values = np.zeros(len(valid), dtype=float)
+
+    return ScoredSeries(
+        dates=list(valid["date"]),
+        prices=valid["close"].astype(float).to_numpy(),
+        scores=prediction_to_score_array(raw_preds, risk_values),
+        risk_labels=classify_risk_array(risk_values),
+    )
+
+
+def replay_strategy(
+    scored: ScoredSeries,
+    buy_rule,
+    sell_rule,
+) -> Tuple[List[float], List[float], List[float], List[pd.Timestamp], Dict[str, Any]]:
+    """Executa a máquina de estados caixa/ações sobre scores já calculados."""
+    cash = INITIAL_CAPITAL
+    shares = 0.0
+    equity_curve: List[float] = []
+    trade_returns: List[float] = []
+    trade_durations: List[int] = []
+    total_trades = 0
+    winning_trades = 0
+    entry_date = None
+    entry_price = 0.0
+
+    prices = scored.prices.tolist()
+    scores = scored.scores.tolist()
+    risk_labels = scored.risk_labels.tolist()
+    bh_shares = INITIAL_CAPITAL / prices[0]
+    bh_curve = [bh_shares * price for price in prices]
+
+    for date, price, score, risk_label in zip(scored.dates, prices, scores, risk_labels):
+        if buy_rule(score, risk_label) and cash > 0:
+            shares = cash / price
+            cash = 0.0
+            entry_price = price
+            entry_date = date
+            total_trades += 1
+        elif sell_rule(score, risk_label) and shares > 0:
+            exit_value = shares * price
+            cost = shares * entry_price
+            cash += exit_value
+            trade_return = (exit_value - cost) / cost if cost > 0 else 0
+            trade_returns.append(trade_return)
+            if trade_return > 0:
+                winning_trades += 1
+            if entry_date is not None:
+                duration = (date - entry_date).days
+                trade_durations.append(max(duration, 1))
+            shares = 0.0
+            entry_date = None
+            entry_price = 0.0
+
+        equity_curve.append(cash + shares * price)
+
+    # Soma sequencial (igual ao loop original) para manter resultados idênticos.
+    score_sum = 0.0
+    for score in scores:
+        score_sum += score
+
+    stats = {
+        "total_trades": total_trades,
+        "winning_trades": winning_trades,
+        "trade_returns": trade_returns,
+        "trade_durations": trade_durations,
+        "max_score": max(scores) if scores else 0.0,
+        "avg_score": (score_sum / len(scores)) if scores else 0.0,
+    }
+
+    return equity_curve, bh_curve, scores, list(scored.dates), stats
+
+
 def simulate_strategy(
     df: pd.DataFrame,
     model,
     feature_names: List[str],
     buy_rule,
     sell_rule,
+    vectorized: bool = True,
 ) -> Tuple[List[float], List[float], List[float], List[pd.Timestamp], Dict[str, Any]]:
+    if vectorized:
+        return replay_strategy(score_symbol(df, model, feature_names), buy_rule, sell_rule)
+    return simulate_strategy_loop(df, model, feature_names, buy_rule, sell_rule)
+
+
+def simulate_strategy_loop(
+    df: pd.DataFrame,
+    model,
+    feature_names: List[str],
+    buy_rule,
+    sell_rule,
+) -> Tuple[List[float], List[float], List[float], List[pd.Timestamp], Dict[str, Any]]:
+    """Implementação original linha a linha (um `model.predict` por dia). Mantida para conferência."""
     cash = INITIAL_CAPITAL
     shares = 0.0
     equity_curve: List[float] = []
@@ -178,9 +332,11 @@ def simulate_strategy(
     return equity_curve, bh_curve, scores, dates, stats
 
 
-def maybe_plot(symbol: str, dates: List[pd.Timestamp], strategy_curve: List[float], bh_curve: List[float]) -> None:
+def maybe_plot(
+    symbol: str, dates: List[pd.Timestamp], strategy_curve: List[float], bh_curve: List[float]
+) -> Path | None:
     if plt is None:
-        return
+        return None
     fig, ax = plt.subplots(figsize=(10, 4))
     ax.plot(dates, strategy_curve, label="Taze AI", linewidth=2.2)
     ax.plot(dates, bh_curve, label="Buy & Hold", linestyle="--", linewidth=1.6)
@@ -192,63 +348,175 @@ def maybe_plot(symbol: str, dates: List[pd.Timestamp], strategy_curve: List[floa
     output_path = RESULTS_DIR / f"{symbol}_backtest.png"
     fig.savefig(output_path, bbox_inches="tight")
     plt.close(fig)
-    print(f"[BACKTEST] Gráfico salvo em {output_path}")
+    return output_path
+
+
+def register_profile(name: str, buy_rule, sell_rule) -> None:
+    """
+    Adiciona (ou substitui) um perfil avaliado em `run_backtest`. Com
+    `workers > 1` as regras precisam ser serializáveis (funções de módulo ou
+    functools.partial, não lambdas): o conjunto de perfis vai para cada worker.
+    """
+    PROFILE_RULES[name] = {"buy": buy_rule, "sell": sell_rule}
+
+
+def buy_threshold_grid(
+    thresholds: List[float],
+    sell_threshold: float = 5.0,
+    prefix: str = "Grid",
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Um perfil por limiar de compra (ex.: 5.0 a 9.0), todos com o mesmo limiar
+    de venda. Não altera PROFILE_RULES: o resultado vale só para a execução que
+    o recebe (`run_backtest(buy_grid=...)`). Como os scores são calculados uma
+    vez por ativo, a grade inteira é avaliada sem rodar o modelo novamente.
+    """
+    return {
+        f"{prefix} buy>{threshold:g} sell<{sell_threshold:g}": {
+            "buy": partial(score_above, threshold),
+            "sell": partial(score_below, sell_threshold),
+        }
+        for threshold in thresholds
+    }
 
 
-def run_backtest() -> None:
-    model, feature_names = load_model()
-    profile_totals: Dict[str, Dict[str, float]] = {
-        name: {"alpha": 0.0, "count": 0.0} for name in PROFILE_RULES
-    }
+def backtest_symbol(
+    symbol: str,
+    model,
+    feature_names: List[str],
+    vectorized: bool = True,
+    profiles: Dict[str, Dict[str, Any]] | None = None,
+) -> Tuple[Dict[str, float], List[str]]:
+    """
+    Roda todos os perfis (default = PROFILE_RULES) para um ativo.
+    Retorna (alpha por perfil, linhas de log) para o chamador imprimir em ordem.
+    """
+    profiles = PROFILE_RULES if profiles is None else profiles
+    df = load_silver_frame(symbol)
+
+    missing_features = [col for col in feature_names if col not in df.columns]
+    if missing_features:
+        for col in missing_features:
+            df[col] = 0.0
+
+    # Inferência uma única vez por ativo; cada perfil só refaz a máquina de estados.
+    scored = score_symbol(df, model, feature_names) if vectorized else None
+
+    alphas: Dict[str, float] = {}
+    lines: List[str] = [f"\n[BACKTEST] --- {symbol} ---"]
+    for profile, rules in profiles.items():
+        if scored is not None:
+            result = replay_strategy(scored, rules["buy"], rules["sell"])
+        else:
+            result = simulate_strategy_loop(df, model, feature_names, rules["buy"], rules["sell"])
+        strategy_curve, bh_curve, _, valid_dates, stats = result
+        if not strategy_curve:
+            lines.append(f"[{profile}] Sem dados válidos para {symbol}.")
+            continue
 
-    for symbol in settings.tickers:
-        df = load_silver_frame(symbol)
+        final_strategy = strategy_curve[-1]
+        final_bh = bh_curve[-1]
 
-        missing_features = [col for col in feature_names if col not in df.columns]
-        if missing_features:
-            for col in missing_features:
-                df[col] = 0.0
+        perf_strategy = (final_strategy / INITIAL_CAPITAL - 1) * 100
+        perf_bh = (final_bh / INITIAL_CAPITAL - 1) * 100
+        alphas[profile] = perf_strategy - perf_bh
 
-        print(f"\n[BACKTEST] --- {symbol} ---")
-        for profile, rules in PROFILE_RULES.items():
-            strategy_curve, bh_curve, _, valid_dates, stats = simulate_strategy(
-                df, model, feature_names, rules["buy"], rules["sell"]
-            )
-            if not strategy_curve:
-                print(f"[{profile}] Sem dados válidos para {symbol}.")
-                continue
+        total_trades = stats["total_trades"]
+        winning_trades = stats["winning_trades"]
+        trade_returns = stats["trade_returns"]
+        trade_durations = stats["trade_durations"]
+        win_rate = (winning_trades / total_trades * 100) if total_trades > 0 else 0.0
+        avg_duration = np.mean(trade_durations) if trade_durations else 0.0
+        avg_trade_return = np.mean(trade_returns) * 100 if trade_returns else 0.0
+        max_score = stats["max_score"]
+        avg_score = stats["avg_score"]
 
-            final_strategy = strategy_curve[-1]
-            final_bh = bh_curve[-1]
+        summary = (
+            f"[{profile}] Carteira: R$ {final_strategy:,.2f} ({perf_strategy:+.2f}%) | "
+            f"Win Rate: {win_rate:.1f}% | Duração Média: {avg_duration:.1f} dias | "
+            f"Lucro Médio por Trade: {avg_trade_return:+.2f}% | "
+            f"Max Score: {max_score:.1f} | Avg Score: {avg_score:.1f}"
+        )
+        lines.append(summary)
 
-            perf_strategy = (final_strategy / INITIAL_CAPITAL - 1) * 100
-            perf_bh = (final_bh / INITIAL_CAPITAL - 1) * 100
-            alpha = perf_strategy - perf_bh
+        if profile == "Moderado":
+            output_path = maybe_plot(f"{symbol}-{profile}", valid_dates, strategy_curve, bh_curve)
+            if output_path is not None:
+                lines.append(f"[BACKTEST] Gráfico salvo em {output_path}")
 
+    return alphas, lines
+
+
+# Estado de cada processo do pool: o modelo é carregado uma vez no initializer,
+# em vez de ser serializado junto com cada tarefa.
+_WORKER_STATE: Dict[str, Any] = {}
+
+
+def _init_worker(vectorized: bool, profiles: Dict[str, Dict[str, Any]]) -> None:
+    model, feature_names = load_model()
+    if hasattr(model, "set_params"):
+        # O paralelismo já vem do pool; evita N processos x N threads do XGBoost.
+        model.set_params(n_jobs=1)
+    # Com spawn/forkserver o worker reimporta o módulo: recebe os perfis da execução
+    # (registrados em tempo de execução e grade) em vez dos defaults.
+    _WORKER_STATE.update(model=model, feature_names=feature_names, vectorized=vectorized, profiles=profiles)
+
+
+def _backtest_symbol_worker(symbol: str) -> Tuple[Dict[str, float], List[str]]:
+    return backtest_symbol(
+        symbol,
+        _WORKER_STATE["model"],
+        _WORKER_STATE["feature_names"],
+        _WORKER_STATE["vectorized"],
+        _WORKER_STATE["profiles"],
+    )
+
+
+def run_backtest(
+    vectorized: bool = True,
+    workers: int = 1,
+    buy_grid: List[float] | None = None,
+    grid_sell: float = 5.0,
+) -> None:
+    # Perfis desta execução: os registrados + a grade, sem tocar em PROFILE_RULES
+    profiles = dict(PROFILE_RULES)
+    if buy_grid:
+        profiles.update(buy_threshold_grid(buy_grid, sell_threshold=grid_sell))
+
+    profile_totals: Dict[str, Dict[str, float]] = {
+        name: {"alpha": 0.0, "count": 0.0} for name in profiles
+    }
+    tickers = list(settings.tickers)
+
+    if workers > 1:
+        try:
+            pickle.dumps(profiles)
+        except (pickle.PicklingError, AttributeError, TypeError) as exc:
+            raise ValueError(
+                "Perfis com regras não serializáveis (ex.: lambdas) não rodam com --workers > 1. "
+                "Use funções de módulo ou functools.partial em register_profile."
+            ) from exc
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(vectorized, profiles),
+        ) as executor:
+            # map preserva a ordem dos tickers, então a soma dos alphas é determinística.
+            results = executor.map(_backtest_symbol_worker, tickers)
+            symbol_results = list(results)
+    else:
+        model, feature_names = load_model()
+        symbol_results = (
+            backtest_symbol(symbol, model, feature_names, vectorized, profiles) for symbol in tickers
+        )
+
+    for alphas, lines in symbol_results:
+        for line in lines:
+            print(line)
+        for profile, alpha in alphas.items():
             profile_totals[profile]["alpha"] += alpha
             profile_totals[profile]["count"] += 1
 
-            total_trades = stats["total_trades"]
-            winning_trades = stats["winning_trades"]
-            trade_returns = stats["trade_returns"]
-            trade_durations = stats["trade_durations"]
-            win_rate = (winning_trades / total_trades * 100) if total_trades > 0 else 0.0
-            avg_duration = np.mean(trade_durations) if trade_durations else 0.0
-            avg_trade_return = np.mean(trade_returns) * 100 if trade_returns else 0.0
-            max_score = stats["max_score"]
-            avg_score = stats["avg_score"]
-
-            summary = (
-                f"[{profile}] Carteira: R$ {final_strategy:,.2f} ({perf_strategy:+.2f}%) | "
-                f"Win Rate: {win_rate:.1f}% | Duração Média: {avg_duration:.1f} dias | "
-                f"Lucro Médio por Trade: {avg_trade_return:+.2f}% | "
-                f"Max Score: {max_score:.1f} | Avg Score: {avg_score:.1f}"
-            )
-            print(summary)
-
-            if profile == "Moderado":
-                maybe_plot(f"{symbol}-{profile}", valid_dates, strategy_curve, bh_curve)
-
     print("\n[BACKTEST] ===== Resumo por Perfil =====")
     for profile, stats in profile_totals.items():
         count = stats["count"] or 1.0
@@ -256,7 +524,48 @@ def run_backtest() -> None:
         print(f"{profile}: Alpha médio = {avg_alpha:+.2f}% (sobre {int(stats['count'])} ativos)")
 
 
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Backtest dos perfis Taze AI sobre o dataset silver")
+    parser.add_argument(
+        "--legacy-loop",
+        action="store_true",
+        help="Usa o loop original linha a linha (um predict por dia) em vez da predição em lote.",
+    )
+    parser.add_argument(
+        "--buy-grid",
+        nargs=3,
+        type=float,
+        metavar=("INICIO", "FIM", "PASSO"),
+        help="Avalia também uma grade de limiares de compra (ex.: 5.0 9.0 0.5) na mesma varredura.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Número de processos para rodar os ativos em paralelo (default = 1, serial)",
+    )
+    parser.add_argument(
+        "--grid-sell",
+        type=float,
+        default=5.0,
+        help="Limiar de venda usado pelos perfis da grade (default = 5.0)",
+    )
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
+    args = parse_args()
     if not MODEL_PATH.exists():
         raise SystemExit(f"Modelo não encontrado em {MODEL_PATH}. Treine primeiro com python ml/train_buyhold.py")
-    run_backtest()
+    thresholds = None
+    if args.buy_grid:
+        start, stop, step = args.buy_grid
+        if step <= 0:
+            raise SystemExit("--buy-grid exige PASSO positivo.")
+        thresholds = np.round(np.arange(start, stop + step / 2, step), 4).tolist()
+    run_backtest(
+        vectorized=not args.legacy_loop,
+        workers=max(1, args.workers),
+        buy_grid=thresholds,
+        grid_sell=args.grid_sell,
+    )
@@ -29,6 +29,11 @@ class Settings:
     )
     history_range_days: int = int(os.getenv("ML_HISTORY_RANGE", "365"))
     concurrent_requests: int = int(os.getenv("ML_CONCURRENCY", "5"))
+    # Cota da Tradebox: requisições por minuto (token bucket compartilhado pela ingestão)
+    tradebox_requests_per_minute: float = float(os.getenv("TRADEBOX_REQUESTS_PER_MINUTE", "120"))
+    tradebox_burst: int = int(os.getenv("TRADEBOX_BURST", "8"))
+    tradebox_max_retries: int = int(os.getenv("TRADEBOX_MAX_RETRIES", "3"))
+    tradebox_backoff_seconds: float = float(os.getenv("TRADEBOX_BACKOFF_SECONDS", "1"))
     data_root: Path = field(
         default_factory=lambda: Path(os.getenv("ML_OUTPUT_DIR", Path(__file__).resolve().parent / "data"))
     )
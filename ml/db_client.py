@@ -171,3 +171,27 @@ def save_signals(signals_data: Sequence[Mapping[str, Any]]) -> None:
 
         conn.commit()
     print("✅ Sinais salvos no Banco de Dados PostgreSQL.")
+
+
+def update_signal_ai_analysis(symbol: str, analysis_date: Any, ai_analysis: str) -> bool:
+    """
+    Grava o texto da análise de IA no Signal mais recente do ativo naquela data.
+    Retorna False se não houver Signal correspondente.
+    """
+    with get_connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                '''
+                UPDATE "Signal" SET "aiAnalysis" = %s
+                WHERE id = (
+                    SELECT id FROM "Signal"
+                    WHERE "stockSymbol" = %s AND "analysisDate" = %s
+                    ORDER BY "createdAt" DESC
+                    LIMIT 1
+                )
+                ''',
+                (ai_analysis, symbol, parse_datetime(analysis_date)),
+            )
+            updated = cur.rowcount > 0
+        conn.commit()
+    return updated
@@ -1,11 +1,25 @@
 from __future__ import annotations
 
+import argparse
 import json
+import operator
+import threading
+import uuid
+from contextlib import contextmanager
 from datetime import datetime
+from functools import reduce
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, ContextManager, Dict, Iterator, List
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem lock entre processos (um único escritor por vez)
+    fcntl = None  # type: ignore
 
 import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
 
 from .config import settings
 
@@ -22,6 +36,19 @@ FUNDAMENTAL_FIELDS = {
 }
 
 
+# close_ma_200 precisa de 200 pregões; a folga estabiliza as EMAs (span <= 26) no recálculo incremental
+INDICATOR_WARMUP_ROWS = 260
+# Janela mais longa dos indicadores: com menos linhas no silver, o recálculo
+# incremental não tem contexto para close_ma_200 e a ingestão volta ao modo completo
+LONGEST_INDICATOR_WINDOW = 200
+# INDICATOR_WARMUP_ROWS pregões em dias corridos (fins de semana + feriados da B3),
+# baixados antes da janela pedida numa carga completa e descartados após os indicadores
+INDICATOR_WARMUP_DAYS = INDICATOR_WARMUP_ROWS * 7 // 5 + 30
+RAW_COLUMNS = ["symbol", "date", "close", "open", "high", "low", "volume"]
+MANIFEST_VERSION = 1
+PARTITION_SCHEMA = pa.schema([("symbol", pa.string()), ("year", pa.string())])
+
+
 def _safe_float(value: Any) -> float | None:
     if value is None:
         return None
@@ -37,6 +64,29 @@ def _safe_float(value: Any) -> float | None:
     return None
 
 
+@contextmanager
+def _file_lock(path: Path) -> Iterator[None]:
+    """
+    Lock exclusivo (flock) sobre `path`, válido entre processos e entre threads
+    (cada chamada abre o próprio descritor). Sem fcntl, não faz nada.
+    """
+    if fcntl is None:
+        yield
+        return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a") as handle:
+        fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+
+
+def _date_key(value: Any, days: int = 0) -> str:
+    """Data normalizada (AAAA-MM-DD) para comparar com a coluna `date` do silver."""
+    return (pd.Timestamp(value) + pd.Timedelta(days=days)).strftime("%Y-%m-%d")
+
+
 def calculate_rsi(series: pd.Series, period: int = 14) -> pd.Series:
     delta = series.diff()
     gain = delta.clip(lower=0)
@@ -54,10 +104,37 @@ class FeatureStore:
     """
     Persistência simples nos formatos bronze/silver/gold.
     Bronze = JSON bruto, Silver = DataFrame com features agregadas.
+
+    O silver é um dataset particionado no estilo Hive
+    (`silver/symbol=PETR4/year=2024/part-*.parquet`) com um arquivo vigente por
+    partição, registrado em `silver/_manifest.json`. Gravações fazem upsert por
+    (symbol, date): a partição afetada é reescrita num arquivo novo, o manifest
+    passa a apontar para ele e o anterior é apagado. Leituras só abrem os
+    arquivos do manifest, então o custo não cresce com o número de ingestões.
+
+    Escritores concorrentes (threads da ingestão, `ml.ingest` e
+    `--compact` em processos diferentes) se coordenam por locks de arquivo em
+    `silver/_locks/`: um por ativo durante a reescrita das partições e um para
+    o manifest/watermarks. Sem fcntl (Windows), rode um único escritor por vez.
     """
 
     def __init__(self) -> None:
         self.settings = settings
+        self.watermarks_path = self.settings.silver_dir / "_watermarks.json"
+        self.manifest_path = self.settings.silver_dir / "_manifest.json"
+        self.locks_dir = self.settings.silver_dir / "_locks"
+        # A ingestão grava em threads paralelas: serializa watermarks e manifest
+        # (os locks de arquivo cobrem os outros processos)
+        self._watermarks_lock = threading.Lock()
+        self._manifest_lock = threading.Lock()
+
+    @contextmanager
+    def _manifest_guard(self) -> Iterator[None]:
+        with self._manifest_lock, _file_lock(self.locks_dir / "_manifest.lock"):
+            yield
+
+    def _symbol_lock(self, symbol: str) -> ContextManager[None]:
+        return _file_lock(self.locks_dir / f"{symbol}.lock")
 
     def save_bronze(self, symbol: str, payload: Dict[str, Any]) -> Path:
         timestamp = datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
@@ -65,59 +142,342 @@ class FeatureStore:
         path.write_text(json.dumps(payload, indent=2, ensure_ascii=False))
         return path
 
-    def save_silver(self, symbol: str, rows: List[Dict[str, Any]]) -> Path:
-        if not rows:
+    # ------------------------------------------------------------------
+    # Manifest
+    # ------------------------------------------------------------------
+    def load_manifest(self) -> Dict[str, Any]:
+        if not self.manifest_path.exists():
+            return {"version": MANIFEST_VERSION, "partitions": {}}
+        try:
+            manifest = json.loads(self.manifest_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as exc:
+            print(f"[SILVER] Manifest ilegível ({exc}). Rode `python -m ml.feature_store --compact`.")
+            return {"version": MANIFEST_VERSION, "partitions": {}}
+        manifest.setdefault("partitions", {})
+        return manifest
+
+    def _write_manifest(self, manifest: Dict[str, Any]) -> None:
+        manifest["version"] = MANIFEST_VERSION
+        manifest["updated_at"] = datetime.utcnow().isoformat(timespec="seconds")
+        tmp_path = self.manifest_path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(manifest, indent=2, ensure_ascii=False), encoding="utf-8")
+        tmp_path.replace(self.manifest_path)
+
+    def silver_symbols(self) -> List[str]:
+        return sorted(self.load_manifest()["partitions"])
+
+    def silver_partitions(self, symbol: str) -> Dict[str, Dict[str, Any]]:
+        """{ano: entrada do manifest} do ativo, em ordem cronológica."""
+        partitions = self.load_manifest()["partitions"].get(symbol) or {}
+        return dict(sorted(partitions.items()))
+
+    def silver_paths(self, symbol: str | None = None) -> List[Path]:
+        """Arquivos vigentes do silver (de um ativo ou de todos), em ordem de ativo/ano."""
+        partitions = self.load_manifest()["partitions"]
+        symbols = [symbol] if symbol else sorted(partitions)
+        return [
+            self.settings.silver_dir / entry["path"]
+            for name in symbols
+            for _, entry in sorted((partitions.get(name) or {}).items())
+        ]
+
+    def _partition_dir(self, symbol: str, year: str) -> Path:
+        return self.settings.silver_dir / f"symbol={symbol}" / f"year={year}"
+
+    def latest_silver_date(self, symbol: str) -> str | None:
+        partitions = self.silver_partitions(symbol)
+        if not partitions:
+            return None
+        return max(str(partition["max_date"]) for partition in partitions.values())
+
+    # ------------------------------------------------------------------
+    # Escrita
+    # ------------------------------------------------------------------
+    def save_silver(
+        self,
+        symbol: str,
+        rows: List[Dict[str, Any]] | pd.DataFrame,
+        replace_from: str | None = None,
+    ) -> Path:
+        """
+        Upsert das linhas no silver do ativo: datas já gravadas ficam com a
+        versão nova, as demais são preservadas. Com `replace_from`
+        (AAAA-MM-DD), as datas gravadas a partir dele passam a ser exatamente
+        as de `rows` (datas removidas na origem somem); o histórico anterior
+        fica intacto. Retorna a pasta do ativo.
+        """
+        df = rows.copy() if isinstance(rows, pd.DataFrame) else pd.DataFrame(rows)
+        if df.empty:
             raise ValueError(f"Nenhum dado calculado para {symbol}")
 
-        df = pd.DataFrame(rows).sort_values("date")
-
-        timestamp = datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
-        path = self.settings.silver_dir / f"{symbol}_{timestamp}.parquet"
-        df.to_parquet(path, index=False)
-        return path
+        df["date"] = df["date"].astype(str)
+        df["year"] = df["date"].str[:4]
+
+        # Lê, mescla e registra sob o lock do ativo: outro escritor do mesmo ativo
+        # não pode trocar a partição entre a leitura e o manifest
+        with self._symbol_lock(symbol):
+            written, emptied = self._write_partitions(symbol, df, self.silver_partitions(symbol), replace_from)
+
+            with self._manifest_guard():
+                manifest = self.load_manifest()
+                partitions = manifest["partitions"].setdefault(symbol, {})
+                replaced = [partitions[year]["path"] for year in [*written, *emptied] if year in partitions]
+                partitions.update(written)
+                for year in emptied:
+                    partitions.pop(year, None)
+                self._write_manifest(manifest)
+
+            # Só apaga os arquivos antigos depois que o manifest aponta para os novos
+            for relative_path in replaced:
+                (self.settings.silver_dir / relative_path).unlink(missing_ok=True)
+        return self.settings.silver_dir / f"symbol={symbol}"
+
+    def _write_partitions(
+        self,
+        symbol: str,
+        df: pd.DataFrame,
+        current: Dict[str, Dict[str, Any]],
+        replace_from: str | None = None,
+    ) -> tuple[Dict[str, Dict[str, Any]], List[str]]:
+        """
+        Grava um arquivo novo por ano afetado (`df` mesclado com `current`).
+        Retorna as entradas novas do manifest e os anos que ficaram vazios.
+        """
+        new_by_year = {str(year): rows for year, rows in df.groupby("year", sort=True)}
+        years = set(new_by_year)
+        if replace_from:
+            years |= {year for year in current if year >= replace_from[:4]}
+
+        written: Dict[str, Dict[str, Any]] = {}
+        emptied: List[str] = []
+        for year in sorted(years):
+            frames = []
+            entry = current.get(year)
+            if entry:
+                existing = pd.read_parquet(self.settings.silver_dir / entry["path"])
+                if replace_from:
+                    existing = existing[existing["date"].astype(str) < replace_from]
+                frames.append(existing)
+            if year in new_by_year:
+                frames.append(new_by_year[year].drop(columns=["symbol", "year"], errors="ignore"))
+            frames = [frame for frame in frames if not frame.empty]
+            if not frames:
+                emptied.append(year)
+                continue
+            merged = (
+                pd.concat(frames, ignore_index=True)
+                .assign(date=lambda frame: frame["date"].astype(str))
+                .drop_duplicates(subset="date", keep="last")
+                .sort_values("date")
+                .reset_index(drop=True)
+            )
+
+            partition_dir = self._partition_dir(symbol, year)
+            partition_dir.mkdir(parents=True, exist_ok=True)
+            timestamp = datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
+            path = partition_dir / f"part-{timestamp}-{uuid.uuid4().hex[:8]}.parquet"
+            merged.to_parquet(path, index=False)
+            written[year] = {
+                "path": path.relative_to(self.settings.silver_dir).as_posix(),
+                "rows": int(len(merged)),
+                "min_date": str(merged["date"].iloc[0]),
+                "max_date": str(merged["date"].iloc[-1]),
+                "updated_at": datetime.utcnow().isoformat(timespec="seconds"),
+            }
+        return written, emptied
+
+    def compact_silver(self) -> Dict[str, int]:
+        """
+        Migra snapshots do formato antigo (`silver/{symbol}_{timestamp}.parquet`)
+        para o dataset particionado e remove arquivos de partição fora do
+        manifest (sobras de gravações interrompidas).
+        """
+        legacy: Dict[str, List[Path]] = {}
+        for path in sorted(self.settings.silver_dir.glob("*.parquet")):
+            legacy.setdefault(path.stem.rsplit("_", 1)[0], []).append(path)
+
+        migrated = 0
+        for symbol, files in legacy.items():
+            # Snapshots em ordem cronológica: o mais recente vence nas datas repetidas
+            frames = [pd.read_parquet(file) for file in files]
+            frames = [frame for frame in frames if not frame.empty]
+            if frames:
+                self.save_silver(symbol, pd.concat(frames, ignore_index=True))
+            for file in files:
+                file.unlink(missing_ok=True)
+            migrated += len(files)
+            print(f"[SILVER] {symbol}: {len(files)} snapshots antigos consolidados.")
+
+        orphans = 0
+        for symbol_dir in sorted(self.settings.silver_dir.glob("symbol=*")):
+            symbol = symbol_dir.name.split("=", 1)[1]
+            # Sob o lock do ativo: um arquivo recém-gravado por outro processo
+            # ainda não está no manifest e não pode ser tratado como sobra
+            with self._symbol_lock(symbol):
+                current = {path.resolve() for path in self.silver_paths(symbol)}
+                for path in symbol_dir.glob("year=*/*.parquet"):
+                    if path.resolve() not in current:
+                        path.unlink(missing_ok=True)
+                        orphans += 1
+        if orphans:
+            print(f"[SILVER] {orphans} arquivos fora do manifest removidos.")
+        return {"legacy_files": migrated, "orphans": orphans}
+
+    # ------------------------------------------------------------------
+    # Leitura
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _silver_schema(paths: List[str]) -> pa.Schema:
+        """
+        União dos schemas das partições (só o rodapé de cada arquivo é lido):
+        colunas fund_* podem existir em um ano e faltar em outro.
+        """
+        try:
+            schema = pa.unify_schemas([pq.read_schema(path) for path in paths])
+        except pa.ArrowInvalid as exc:
+            print(f"[SILVER] Schemas incompatíveis entre partições ({exc}). Usando o mais recente.")
+            schema = pq.read_schema(paths[-1])
+        for field in PARTITION_SCHEMA:
+            if field.name not in schema.names:
+                schema = schema.append(field)
+        return schema
+
+    def silver_columns(self) -> List[str]:
+        """Colunas disponíveis no silver (sem a coluna de partição `year`)."""
+        paths = [str(path) for path in self.silver_paths()]
+        if not paths:
+            return []
+        return [name for name in self._silver_schema(paths).names if name != "year"]
+
+    def query_silver(
+        self,
+        symbols: List[str] | None = None,
+        start: Any = None,
+        end: Any = None,
+        columns: List[str] | None = None,
+        latest_only: bool = False,
+    ) -> pd.DataFrame:
+        """
+        Leitura filtrada do silver com pyarrow.dataset.
+
+        Ativos e intervalo [start, end] podam partições pelo manifest antes de
+        abrir qualquer arquivo; o filtro de data vai para o scan, que pula row
+        groups pelas estatísticas min/max do parquet. `columns` limita as
+        colunas lidas (symbol e date vêm sempre) e `latest_only` traz só a
+        última linha de cada ativo.
+        """
+        start_key = _date_key(start) if start is not None else None
+        # `date` pode trazer horário: o limite superior vira "< dia seguinte"
+        end_key = _date_key(end, days=1) if end is not None else None
+
+        partitions = self.load_manifest()["partitions"]
+        wanted = [symbol.upper() for symbol in symbols] if symbols else sorted(partitions)
+
+        paths: List[str] = []
+        latest_dates: Dict[str, str] = {}
+        for symbol in wanted:
+            entries = [
+                entry
+                for _, entry in sorted((partitions.get(symbol) or {}).items())
+                if (start_key is None or str(entry["max_date"]) >= start_key)
+                and (end_key is None or str(entry["min_date"]) < end_key)
+            ]
+            if not entries:
+                continue
+            if latest_only:
+                entries = entries[-1:]
+                latest_dates[symbol] = str(entries[-1]["max_date"])
+            paths.extend(str(self.settings.silver_dir / entry["path"]) for entry in entries)
+
+        if not paths:
+            return pd.DataFrame(columns=list(dict.fromkeys(["symbol", "date", *(columns or [])])))
+
+        schema = self._silver_schema(paths)
+        dataset = ds.dataset(
+            paths,
+            schema=schema,
+            format="parquet",
+            partitioning=ds.partitioning(PARTITION_SCHEMA, flavor="hive"),
+            partition_base_dir=str(self.settings.silver_dir),
+        )
 
-    def load_silver_dataset(self) -> pd.DataFrame:
-        files = sorted(self.settings.silver_dir.glob("*.parquet"))
-        if not files:
+        filters = []
+        if start_key:
+            filters.append(ds.field("date") >= start_key)
+        if end_key:
+            filters.append(ds.field("date") < end_key)
+        if latest_only and end_key is None:
+            # max_date do manifest: o scan lê só o row group com a última linha
+            filters.append(
+                reduce(
+                    operator.or_,
+                    [
+                        (ds.field("symbol") == symbol) & (ds.field("date") == latest_date)
+                        for symbol, latest_date in latest_dates.items()
+                    ],
+                )
+            )
+        expression = reduce(operator.and_, filters) if filters else None
+
+        requested = columns if columns is not None else schema.names
+        selected = [
+            name
+            for name in dict.fromkeys(["symbol", "date", *requested])
+            if name in schema.names and name != "year"
+        ]
+        df = dataset.to_table(columns=selected, filter=expression).to_pandas()
+
+        df = df.sort_values(["symbol", "date"]).reset_index(drop=True)
+        if latest_only:
+            df = df.groupby("symbol", sort=False).tail(1).reset_index(drop=True)
+        return df
+
+    def load_symbol_silver(self, symbol: str) -> pd.DataFrame | None:
+        df = self.query_silver([symbol])
+        return None if df.empty else df
+
+    def load_watermarks(self) -> Dict[str, Dict[str, Any]]:
+        if not self.watermarks_path.exists():
+            return {}
+        try:
+            return json.loads(self.watermarks_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+
+    def get_watermark(self, symbol: str) -> str | None:
+        """
+        Último `price_date` ingerido do ativo. Sem registro no arquivo de
+        watermarks, usa a última data do silver registrada no manifest.
+        """
+        entry = self.load_watermarks().get(symbol)
+        if entry and entry.get("last_price_date"):
+            return str(entry["last_price_date"])
+        return self.latest_silver_date(symbol)
+
+    def set_watermark(self, symbol: str, last_price_date: str) -> None:
+        with self._watermarks_lock, _file_lock(self.locks_dir / "_watermarks.lock"):
+            watermarks = self.load_watermarks()
+            watermarks[symbol] = {
+                "last_price_date": str(last_price_date),
+                "updated_at": datetime.utcnow().isoformat(timespec="seconds"),
+            }
+            tmp_path = self.watermarks_path.with_suffix(".tmp")
+            tmp_path.write_text(json.dumps(watermarks, indent=2, ensure_ascii=False), encoding="utf-8")
+            tmp_path.replace(self.watermarks_path)
+
+    def load_silver_dataset(self, **filters: Any) -> pd.DataFrame:
+        """`query_silver` com os mesmos filtros, mas exige ao menos uma linha."""
+        df = self.query_silver(**filters)
+        if df.empty:
             raise FileNotFoundError("Nenhum dataset silver encontrado. Rode primeiro python ingest.py")
-
-        frames = [pd.read_parquet(file) for file in files]
-        return pd.concat(frames, ignore_index=True)
+        return df
 
 
-def bundle_to_feature_rows(bundle: Dict[str, Any]) -> List[Dict[str, Any]]:
+def add_technical_indicators(df: pd.DataFrame) -> pd.DataFrame:
     """
-    Converte o bundle vindo da Tradebox em linhas utilizáveis com indicadores técnicos avançados.
+    Calcula os indicadores técnicos sobre um DataFrame ordenado por data com
+    colunas close/volume. Linhas sem janela suficiente ficam com NaN.
     """
-    symbol = bundle.get("symbol")
-    history = (bundle.get("histories") or {}).get("data") or []
-    fundamentals = (bundle.get("fundamentals") or {}).get("data") or [{}]
-    fundamentals_flat = fundamentals[0] if fundamentals else {}
-
-    if not history:
-        return []
-
-    rows: List[Dict[str, Any]] = []
-    for item in history:
-        close = float(item.get("close") or item.get("price_close") or 0)
-        if close <= 0:
-            continue
-        rows.append(
-            {
-                "symbol": symbol,
-                "date": item.get("price_date") or item.get("date"),
-                "close": close,
-                "open": float(item.get("open") or close),
-                "high": float(item.get("high") or close),
-                "low": float(item.get("low") or close),
-                "volume": float(item.get("volume") or 0),
-            }
-        )
-
-    df = pd.DataFrame(rows).sort_values("date")
-    if df.empty:
-        return []
-
     df["close_ma_20"] = df["close"].rolling(window=20).mean()
     df["close_ma_21"] = df["close"].rolling(window=21).mean()
     df["close_ma_50"] = df["close"].rolling(window=50).mean()
@@ -149,11 +509,126 @@ def bundle_to_feature_rows(bundle: Dict[str, Any]) -> List[Dict[str, Any]]:
 
     df["momentum_10"] = df["close"].pct_change(periods=10).fillna(0)
 
+    return df
+
+
+def fundamentals_to_features(fundamentals: Dict[str, Any] | None) -> Dict[str, float]:
+    """Mapeia os campos de fundamentals da Tradebox para as colunas fund_* do modelo."""
+    features: Dict[str, float] = {}
     for source_key, target_key in FUNDAMENTAL_FIELDS.items():
-        numeric_value = _safe_float(fundamentals_flat.get(source_key))
+        numeric_value = _safe_float((fundamentals or {}).get(source_key))
         if numeric_value is not None:
-            df[target_key] = numeric_value
+            features[target_key] = numeric_value
+    return features
+
+
+def history_to_raw_frame(bundle: Dict[str, Any]) -> pd.DataFrame:
+    """Histórico OHLCV do bundle, ordenado por data e sem fechamentos inválidos."""
+    symbol = bundle.get("symbol")
+    history = (bundle.get("histories") or {}).get("data") or []
+
+    rows: List[Dict[str, Any]] = []
+    for item in history:
+        close = float(item.get("close") or item.get("price_close") or 0)
+        if close <= 0:
+            continue
+        rows.append(
+            {
+                "symbol": symbol,
+                "date": item.get("price_date") or item.get("date"),
+                "close": close,
+                "open": float(item.get("open") or close),
+                "high": float(item.get("high") or close),
+                "low": float(item.get("low") or close),
+                "volume": float(item.get("volume") or 0),
+            }
+        )
+
+    if not rows:
+        return pd.DataFrame(columns=RAW_COLUMNS)
+    return pd.DataFrame(rows).sort_values("date")
+
+
+def _bundle_fundamentals(bundle: Dict[str, Any]) -> Dict[str, Any]:
+    fundamentals = (bundle.get("fundamentals") or {}).get("data") or [{}]
+    return fundamentals[0] if fundamentals else {}
+
+
+def bundle_to_feature_rows(bundle: Dict[str, Any], start_date: str | None = None) -> List[Dict[str, Any]]:
+    """
+    Converte o bundle vindo da Tradebox em linhas utilizáveis com indicadores técnicos avançados.
+
+    Com `start_date`, os pregões anteriores servem só de aquecimento dos
+    indicadores e não viram linhas.
+    """
+    df = history_to_raw_frame(bundle)
+    if df.empty:
+        return []
+
+    df = add_technical_indicators(df)
+    if start_date:
+        df = df[df["date"].astype(str) >= start_date].copy()
+
+    for target_key, numeric_value in fundamentals_to_features(_bundle_fundamentals(bundle)).items():
+        df[target_key] = numeric_value
+
+    df = df.dropna().fillna(0)
+
+    return df.to_dict(orient="records")
+
+
+def incremental_feature_rows(bundle: Dict[str, Any], previous: pd.DataFrame, watermark: str) -> List[Dict[str, Any]]:
+    """
+    Linhas silver apenas para os pregões depois de `watermark`.
+
+    Os indicadores são recalculados sobre os últimos INDICATOR_WARMUP_ROWS
+    pregões já no silver + o trecho novo, em vez do histórico inteiro.
+    """
+    new_raw = history_to_raw_frame(bundle)
+    new_raw["date"] = new_raw["date"].astype(str)
+    new_raw = new_raw[new_raw["date"] > watermark]
+    if new_raw.empty:
+        return []
+
+    context = previous.copy()
+    context["date"] = context["date"].astype(str)
+    context = context.sort_values("date").tail(INDICATOR_WARMUP_ROWS)[RAW_COLUMNS]
+
+    df = (
+        pd.concat([context, new_raw], ignore_index=True)
+        .drop_duplicates(subset="date", keep="last")
+        .sort_values("date")
+        .reset_index(drop=True)
+    )
+    df = add_technical_indicators(df)
+    df = df[df["date"] > watermark].copy()
+
+    for target_key, numeric_value in fundamentals_to_features(_bundle_fundamentals(bundle)).items():
+        df[target_key] = numeric_value
 
     df = df.dropna().fillna(0)
 
     return df.to_dict(orient="records")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Manutenção do silver particionado")
+    parser.add_argument(
+        "--compact",
+        action="store_true",
+        help="Consolida snapshots antigos e remove arquivos fora do manifest",
+    )
+    args = parser.parse_args()
+
+    store = FeatureStore()
+    if args.compact:
+        summary = store.compact_silver()
+        print(f"[SILVER] Compactação concluída: {summary}")
+    for symbol in store.silver_symbols():
+        partitions = store.silver_partitions(symbol)
+        rows = sum(int(entry["rows"]) for entry in partitions.values())
+        print(f"[SILVER] {symbol}: {len(partitions)} partições, {rows} linhas")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,8 @@
 from __future__ import annotations
 
 import json
+import threading
+from collections import OrderedDict
 from pathlib import Path
 from typing import Any, Dict, List, Tuple
 
@@ -9,10 +11,9 @@ import numpy as np
 import pandas as pd
 
 from .config import settings
-from .feature_store import FeatureStore
-from .db_client import save_signals
+from .feature_store import FeatureStore, add_technical_indicators, fundamentals_to_features
 
-MODEL_PATH = Path("ml/models/buyhold_xgb.pkl")
+MODEL_PATH = Path(__file__).resolve().parent / "models" / "buyhold_xgb.pkl"
 MIN_RET = -0.15
 MAX_RET = 0.15
 RISK_LOW = 0.015
@@ -40,10 +41,21 @@ def prediction_to_score(prediction: float, risk_value: float) -> float:
     return float(np.clip(base_score - penalty, 0.0, 10.0))
 
 
-def load_model() -> Tuple[object, List[str]]:
-    if not MODEL_PATH.exists():
+def classify_risk(value: float) -> str:
+    if value < RISK_LOW:
+        return "BAIXO"
+    if value < RISK_HIGH:
+        return "MODERADO"
+    return "ALTO"
+
+
+def load_model(model_path: Path = MODEL_PATH) -> Tuple[object, List[str]]:
+    if not model_path.exists():
         raise FileNotFoundError("Modelo não encontrado. Execute `python -m ml.train_buyhold` primeiro.")
-    bundle = joblib.load(MODEL_PATH)
+    return unpack_model_bundle(joblib.load(model_path))
+
+
+def unpack_model_bundle(bundle: Any) -> Tuple[object, List[str]]:
     if isinstance(bundle, dict) and "model" in bundle:
         model = bundle["model"]
         feature_names = bundle.get("feature_names") or getattr(model, "feature_names_in_", [])
@@ -147,17 +159,34 @@ def _format_float(value: Any, suffix: str = "") -> str | None:
 def analyze_market(symbols: List[str]) -> List[Dict[str, object]]:
     model, feature_names = load_model()
     store = FeatureStore()
-    df = store.load_silver_dataset()
-    df["date"] = pd.to_datetime(df["date"])
+    # Só a última linha de cada ativo, com as colunas que o modelo e o sinal usam
+    latest_rows = store.query_silver(
+        symbols,
+        columns=[*feature_names, "close", "volatility_30", "volatility_21", "rsi_14"],
+        latest_only=True,
+    )
+    if latest_rows.empty:
+        return []
+    latest_rows["date"] = pd.to_datetime(latest_rows["date"])
+
+    # Fechamentos recentes para o histórico do prompt (90 pregões cabem em ~140 dias corridos)
+    history_df = store.query_silver(
+        symbols,
+        start=latest_rows["date"].min() - pd.Timedelta(days=140),
+        columns=["close"],
+    )
+    history_df["date"] = pd.to_datetime(history_df["date"])
+    history_by_symbol = {symbol: frame for symbol, frame in history_df.groupby("symbol")}
+    latest_by_symbol = latest_rows.set_index("symbol", drop=False)
 
     results: List[Dict[str, object]] = []
 
     for symbol in symbols:
-        subset = df[df["symbol"] == symbol]
-        if subset.empty:
+        if symbol not in latest_by_symbol.index:
             continue
 
-        latest = subset.sort_values("date").iloc[-1]
+        latest = latest_by_symbol.loc[symbol].copy()
+        subset = history_by_symbol.get(symbol, history_df.iloc[0:0])
         for col in feature_names:
             if col not in latest.index:
                 latest[col] = 0.0
@@ -215,13 +244,188 @@ def analyze_market(symbols: List[str]) -> List[Dict[str, object]]:
                 "intraday": intraday_snapshot,
                 "intraday_series": intraday_series,
                 "fundamentals": fundamentals_payload,
+                # Últimos 90 fechamentos no formato do backend (entrada do prompt da IA)
+                "history": [
+                    {"date": pd.Timestamp(row_date).strftime("%Y-%m-%d"), "value": round(float(close), 2)}
+                    for row_date, close in zip(subset["date"].tail(90), subset["close"].tail(90))
+                    if pd.notna(close)
+                ],
             }
         )
 
     return results
 
 
+class PredictiveService:
+    """
+    Serviço usado pelo backend para gerar `predictiveSignals`.
+
+    Carrega o bundle do modelo uma única vez e calcula as features a partir do
+    snapshot da requisição (histórico + fundamentals) ou, na falta dele, da
+    última linha silver do ativo. Os scores ficam memorizados por
+    (símbolo, última data do histórico, versão do modelo).
+
+    Um snapshot de 90 dias não cobre janelas longas (ex.: close_ma_200): essas
+    features vêm da última linha silver, que pode ser de outra data. O
+    resultado marca isso com source "snapshot+silver" e lista as colunas
+    completadas em `silverFeatures`.
+
+    O backend chama `predict_score` em threads (asyncio.to_thread): os caches
+    internos são protegidos por um lock.
+    """
+
+    def __init__(self, model_path: Path = MODEL_PATH, max_cache_entries: int = 512) -> None:
+        if not model_path.exists():
+            raise FileNotFoundError(f"Modelo não encontrado em {model_path}. Execute `python -m ml.train_buyhold`.")
+
+        bundle = joblib.load(model_path)
+        metadata = bundle if isinstance(bundle, dict) else {}
+        self.model, self.feature_names = unpack_model_bundle(bundle)
+        if not self.feature_names:
+            raise RuntimeError("Não foi possível determinar a lista de features do modelo.")
+
+        self.horizon_days = int(metadata.get("horizon_days") or 90)
+        train_until = metadata.get("train_until") or "n/a"
+        self.model_version = f"{train_until}@{int(model_path.stat().st_mtime)}"
+
+        self.store = FeatureStore()
+        self._max_cache_entries = max_cache_entries
+        self._score_cache: "OrderedDict[Tuple[str, str, str], Dict[str, Any]]" = OrderedDict()
+        # {símbolo: (arquivo silver, última linha)} para não reler o parquet a cada chamada
+        self._silver_rows: Dict[str, Tuple[Path, pd.Series]] = {}
+        self._lock = threading.Lock()
+
+    def _latest_silver_row(self, symbol: str) -> pd.Series | None:
+        # O arquivo vigente do ano mais recente identifica a versão em cache
+        files = self.store.silver_paths(symbol)
+        if not files:
+            return None
+
+        with self._lock:
+            cached = self._silver_rows.get(symbol)
+        if cached and cached[0] == files[-1]:
+            return cached[1]
+
+        df = self.store.query_silver([symbol], latest_only=True)
+        if df.empty:
+            return None
+        df["date"] = pd.to_datetime(df["date"])
+        latest = df.iloc[-1]
+        with self._lock:
+            self._silver_rows[symbol] = (files[-1], latest)
+        return latest
+
+    @staticmethod
+    def _snapshot_features(snapshot: Dict[str, Any]) -> Dict[str, float]:
+        """
+        Indicadores calculados sobre o histórico do snapshot. O histórico do
+        backend ({date, value}) não traz volume: sem ele, volume e volume_ma_20
+        ficam de fora (NaN) e são completados pela linha silver, em vez de 0.
+        """
+        history = snapshot.get("history") or []
+        rows = []
+        for item in history:
+            try:
+                close = float(item.get("value") if item.get("value") is not None else item.get("close"))
+            except (TypeError, ValueError):
+                continue
+            if close <= 0:
+                continue
+            try:
+                volume = float(item["volume"]) if item.get("volume") is not None else np.nan
+            except (TypeError, ValueError):
+                volume = np.nan
+            rows.append({"date": item.get("date"), "close": close, "volume": volume})
+
+        features: Dict[str, float] = {}
+        if rows:
+            df = add_technical_indicators(pd.DataFrame(rows).sort_values("date"))
+            latest = df.iloc[-1]
+            for column, value in latest.items():
+                if column == "date" or pd.isna(value):
+                    continue
+                features[column] = float(value)
+
+        features.update(fundamentals_to_features(snapshot.get("fundamentals")))
+        return features
+
+    def predict_score(self, symbol: str, snapshot: Dict[str, Any] | None = None) -> Dict[str, Any] | None:
+        symbol = (symbol or "").upper()
+        if not symbol:
+            return None
+
+        snapshot = snapshot or {}
+        history = snapshot.get("history") or []
+        silver_row = None
+        if history:
+            # Maior data, não a última posição: o histórico pode chegar fora de ordem
+            as_of = max(str(item.get("date") or "") for item in history)
+        else:
+            silver_row = self._latest_silver_row(symbol)
+            if silver_row is None:
+                return None
+            as_of = pd.Timestamp(silver_row["date"]).strftime("%Y-%m-%d")
+
+        cache_key = (symbol, as_of, self.model_version)
+        with self._lock:
+            cached = self._score_cache.get(cache_key)
+            if cached is not None:
+                self._score_cache.move_to_end(cache_key)
+                return cached
+
+        if history:
+            features = self._snapshot_features(snapshot)
+            source = "snapshot"
+            # Janelas longas (ex.: close_ma_200) não cabem em 90 dias: completa com a linha silver.
+            missing = [name for name in self.feature_names if name not in features]
+            silver_features: List[str] = []
+            if missing:
+                silver_row = self._latest_silver_row(symbol)
+                if silver_row is not None:
+                    for name in missing:
+                        value = silver_row.get(name)
+                        if value is not None and pd.notna(value):
+                            features[name] = float(value)
+                            silver_features.append(name)
+                    if silver_features:
+                        source = "snapshot+silver"
+        else:
+            features = {
+                name: float(value)
+                for name, value in silver_row.items()
+                if name not in ("symbol", "date") and pd.notna(value)
+            }
+            source = "silver"
+
+        vector = np.array([[features.get(name, 0.0) for name in self.feature_names]], dtype=float)
+        raw_pred = float(self.model.predict(vector)[0])
+        risk_value = float(features.get("volatility_30") or features.get("volatility_21") or 0.02)
+        score = prediction_to_score(raw_pred, risk_value)
+
+        result = {
+            "score": round(score, 1),
+            "raw_prediction": raw_pred,
+            "horizon_days": self.horizon_days,
+            "source": source,
+            "riskLevel": classify_risk(risk_value),
+            "riskValue": risk_value,
+            "asOf": as_of,
+            "modelVersion": self.model_version,
+        }
+        if source == "snapshot+silver":
+            result["silverFeatures"] = silver_features
+            result["silverAsOf"] = pd.Timestamp(silver_row["date"]).strftime("%Y-%m-%d")
+
+        with self._lock:
+            self._score_cache[cache_key] = result
+            if len(self._score_cache) > self._max_cache_entries:
+                self._score_cache.popitem(last=False)
+        return result
+
+
 if __name__ == "__main__":
+    from .db_client import save_signals
+
     data = analyze_market(settings.tickers)
     print(json.dumps(data, indent=2, ensure_ascii=False))
     save_signals(data)
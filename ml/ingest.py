@@ -2,36 +2,153 @@ from __future__ import annotations
 
 import argparse
 import asyncio
-from datetime import datetime
+from datetime import datetime, timedelta
 import time
-from typing import List
+from typing import Any, Dict, List
 
 from .config import settings
-from .feature_store import FeatureStore, bundle_to_feature_rows
-from .tradebox_client import TradeboxClient
+from .feature_store import (
+    INDICATOR_WARMUP_DAYS,
+    LONGEST_INDICATOR_WINDOW,
+    FeatureStore,
+    bundle_to_feature_rows,
+    incremental_feature_rows,
+)
+from .tradebox_client import REQUIRED_ENDPOINTS, TradeboxClient
 
 
-async def ingest_symbol(symbol: str, client: TradeboxClient, store: FeatureStore, range_days: int) -> None:
-    bundle = await client.fetch_asset_bundle(symbol, range_days=range_days)
-    store.save_bronze(symbol, bundle)
+async def ingest_symbol(
+    symbol: str,
+    client: TradeboxClient,
+    store: FeatureStore,
+    range_days: int,
+    full_refresh: bool = False,
+) -> Dict[str, Any]:
+    """
+    Ingere um ativo e retorna o relatório de tempo (fetch x processamento).
 
-    rows = bundle_to_feature_rows(bundle)
-    if not rows:
-        print(f"[WARN] Nenhum histórico retornado para {symbol}")
-        return
+    Com watermark (último price_date ingerido) e silver existente, só a cauda
+    nova é baixada e acrescentada; sem eles, baixa a janela completa de
+    `range_days` e faz upsert. Com `full_refresh`, a janela baixada substitui
+    o trecho correspondente do silver; datas anteriores à janela são mantidas.
+    """
+    report: Dict[str, Any] = {"symbol": symbol, "status": "ok", "rows": 0, "fetch_s": 0.0, "process_s": 0.0}
 
-    path = store.save_silver(symbol, rows)
-    print(f"[OK] {symbol}: {len(rows)} linhas -> {path}")
+    watermark = None
+    previous = None
+    if not full_refresh:
+        watermark = await asyncio.to_thread(store.get_watermark, symbol)
+        previous = await asyncio.to_thread(store.load_symbol_silver, symbol) if watermark else None
+        if previous is not None and len(previous) < LONGEST_INDICATOR_WINDOW:
+            # Silver curto demais para aquecer close_ma_200: as linhas novas sairiam
+            # NaN e seriam descartadas, travando o watermark. Recalcula do zero.
+            print(f"[INFO] {symbol}: {len(previous)} linhas no silver, ingestão completa para aquecer os indicadores")
+            previous = None
+        if previous is None:
+            watermark = None
+    report["mode"] = "incremental" if watermark else "completo"
+
+    # Carga completa: a janela pedida + aquecimento, descartado depois dos indicadores
+    window_start = (datetime.utcnow() - timedelta(days=range_days)).strftime("%Y-%m-%d")
+    started = time.perf_counter()
+    bundle = await client.fetch_asset_bundle(
+        symbol,
+        range_days=range_days + INDICATOR_WARMUP_DAYS,
+        since=watermark,
+    )
+    report["fetch_s"] = time.perf_counter() - started
+
+    fetch_status = bundle.get("fetch_status") or {}
+    failed = [
+        f"{endpoint} ({fetch_status[endpoint].get('error')})"
+        for endpoint in REQUIRED_ENDPOINTS
+        if endpoint in fetch_status and not fetch_status[endpoint].get("ok")
+    ]
+    if failed:
+        print(f"[ERRO] {symbol}: falha em {', '.join(failed)}. Silver não atualizado.")
+        report["status"] = "falha fetch"
+        report["failed_endpoints"] = failed
+        return report
+
+    # Parquet/pandas são bloqueantes: fora do event loop para não travar os outros fetches
+    started = time.perf_counter()
+    await asyncio.to_thread(store.save_bronze, symbol, bundle)
+
+    if watermark:
+        rows = await asyncio.to_thread(incremental_feature_rows, bundle, previous, watermark)
+        if not rows:
+            print(f"[OK] {symbol}: em dia (watermark {watermark})")
+            report["status"] = "em dia"
+            report["process_s"] = time.perf_counter() - started
+            return report
+        path = await asyncio.to_thread(store.save_silver, symbol, rows)
+    else:
+        rows = await asyncio.to_thread(bundle_to_feature_rows, bundle, window_start)
+        if not rows:
+            print(f"[WARN] Nenhum histórico retornado para {symbol}")
+            report["status"] = "sem histórico"
+            report["process_s"] = time.perf_counter() - started
+            return report
+        # --full-refresh reescreve a janela baixada (datas removidas na origem somem);
+        # o histórico anterior a ela continua no silver
+        replace_from = window_start if full_refresh else None
+        path = await asyncio.to_thread(store.save_silver, symbol, rows, replace_from)
+
+    last_price_date = max(str(row["date"]) for row in rows)
+    await asyncio.to_thread(store.set_watermark, symbol, last_price_date)
+    report["rows"] = len(rows)
+    report["process_s"] = time.perf_counter() - started
+    print(f"[OK] {symbol}: {len(rows)} linhas ({report['mode']}) -> {path}")
+    return report
+
+
+def print_timing_report(reports: List[Dict[str, Any]]) -> None:
+    print(f"\n{'ATIVO':<8}{'MODO':<13}{'STATUS':<16}{'LINHAS':>8}{'FETCH (s)':>11}{'PROC (s)':>10}")
+    for report in sorted(reports, key=lambda item: item["fetch_s"] + item["process_s"], reverse=True):
+        print(
+            f"{report['symbol']:<8}{report.get('mode', '-'):<13}{report['status']:<16}{report['rows']:>8}"
+            f"{report['fetch_s']:>11.2f}{report['process_s']:>10.2f}"
+        )
 
 
-async def run_pipeline(tickers: List[str], range_days: int) -> None:
-    client = TradeboxClient()
+async def run_pipeline(
+    tickers: List[str],
+    range_days: int,
+    concurrency: int | None = None,
+    full_refresh: bool = False,
+) -> List[Dict[str, Any]]:
+    """
+    Ingere até `concurrency` (ML_CONCURRENCY) ativos em paralelo. O ritmo é dado
+    pelo token bucket do TradeboxClient (cota da Tradebox), não por sleeps.
+    """
     store = FeatureStore()
+    # Snapshots do formato antigo viram partições antes de qualquer upsert
+    await asyncio.to_thread(store.compact_silver)
+    semaphore = asyncio.Semaphore(max(1, concurrency or settings.concurrent_requests))
 
-    for ticker in tickers:
-        await ingest_symbol(ticker, client, store, range_days)
-        print("⏳ Aguardando 2 segundos para não sobrecarregar a API...")
-        time.sleep(2)
+    async def worker(ticker: str) -> Dict[str, Any]:
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                return await ingest_symbol(ticker, client, store, range_days, full_refresh)
+            except Exception as exc:
+                print(f"[ERRO] {ticker}: {exc}")
+                return {
+                    "symbol": ticker,
+                    "status": "erro",
+                    "rows": 0,
+                    "fetch_s": time.perf_counter() - started,
+                    "process_s": 0.0,
+                }
+
+    # Um único pool de conexões (HTTP/2 se disponível) para toda a ingestão
+    async with TradeboxClient() as client:
+        reports = await asyncio.gather(*(worker(ticker) for ticker in tickers))
+    print_timing_report(list(reports))
+    failed = [report["symbol"] for report in reports if report["status"] in ("falha fetch", "erro")]
+    if failed:
+        print(f"[INGEST] {len(failed)} ativo(s) com falha: {', '.join(failed)}")
+    return list(reports)
 
 
 def parse_args() -> argparse.Namespace:
@@ -43,13 +160,27 @@ def parse_args() -> argparse.Namespace:
         default=settings.history_range_days,
         help="Janela de histórico em dias",
     )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=settings.concurrent_requests,
+        help="Ativos ingeridos em paralelo (default = ML_CONCURRENCY)",
+    )
+    parser.add_argument(
+        "--full-refresh",
+        action="store_true",
+        help="Ignora os watermarks e reescreve no silver a janela completa de --range-days",
+    )
     return parser.parse_args()
 
 
 if __name__ == "__main__":
     args = parse_args()
     started = datetime.now()
-    print(f"[INGEST] Iniciando pipeline - tickers={args.tickers} range={args.range_days}d")
-    asyncio.run(run_pipeline(args.tickers, args.range_days))
+    print(
+        f"[INGEST] Iniciando pipeline - tickers={args.tickers} range={args.range_days}d "
+        f"concorrência={args.concurrency} cota={settings.tradebox_requests_per_minute:.0f} req/min"
+    )
+    asyncio.run(run_pipeline(args.tickers, args.range_days, args.concurrency, args.full_refresh))
     elapsed = (datetime.now() - started).total_seconds()
     print(f"[INGEST] Finalizado em {elapsed:.2f}s -> dados em {settings.data_root}")
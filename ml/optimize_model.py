@@ -11,7 +11,7 @@ from sklearn.model_selection import RandomizedSearchCV
 from sklearn.metrics import make_scorer, mean_squared_error
 
 from .feature_store import FeatureStore
-from .train_buyhold import engineer_targets  #
+from .train_buyhold import engineer_targets, training_columns
 
 try:
     from xgboost import XGBRegressor
@@ -31,7 +31,8 @@ def parse_args() -> argparse.Namespace:
 def main() -> None:
     args = parse_args()
     store = FeatureStore()
-    df = store.load_silver_dataset()
+    # Corte temporal empurrado para o scan: partições posteriores nem são abertas
+    df = store.load_silver_dataset(end=args.train_until, columns=training_columns(store))
     df["date"] = pd.to_datetime(df["date"])
     cutoff = pd.to_datetime(args.train_until)
     df = df[df["date"] <= cutoff].copy()
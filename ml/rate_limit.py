@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+import asyncio
+import time
+
+
+class AsyncTokenBucket:
+    """
+    Token bucket assíncrono: `rate` tokens por segundo, rajada de até `capacity`.
+
+    Cada chamada reserva o próximo token (o saldo pode ficar negativo) e dorme
+    só o tempo até ele ficar disponível, fora de qualquer lock: várias
+    requisições esperam em paralelo e são liberadas na ordem de chegada.
+    Usado pelo cliente da Tradebox (ingestão) e pelo cliente da OpenAI (backend).
+    """
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = max(1.0, float(capacity))
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+
+    @classmethod
+    def per_minute(cls, requests_per_minute: float, burst: float) -> "AsyncTokenBucket":
+        return cls(rate=requests_per_minute / 60.0, capacity=burst)
+
+    def _reserve(self) -> float:
+        """Reserva um token e retorna quantos segundos esperar por ele."""
+        # Sem await entre a leitura e a escrita do saldo: atômico no event loop
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+        self._tokens -= 1
+        return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    async def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        wait = self._reserve()
+        if wait <= 0:
+            return
+        try:
+            await asyncio.sleep(wait)
+        except asyncio.CancelledError:
+            # Quem desistiu devolve a reserva para não atrasar a fila
+            self._tokens += 1
+            raise
@@ -0,0 +1,64 @@
+import threading
+from collections import OrderedDict
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+np = pytest.importorskip("numpy")
+pytest.importorskip("joblib")
+pytest.importorskip("pyarrow")
+pytest.importorskip("dotenv")
+
+from ml import feature_store, inference  # noqa: E402
+from ml.config import Settings  # noqa: E402
+
+
+class RecordingModel:
+    def __init__(self) -> None:
+        self.vectors = []
+
+    def predict(self, vector):
+        self.vectors.append(vector[0].tolist())
+        return [0.05]
+
+
+def backend_history(days: int = 90) -> list[dict]:
+    dates = pd.bdate_range(end="2025-06-30", periods=days)
+    return [{"date": date.strftime("%Y-%m-%d"), "value": 30 + index * 0.1} for index, date in enumerate(dates)]
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    monkeypatch.setattr(feature_store, "settings", Settings(data_root=tmp_path))
+    store = feature_store.FeatureStore()
+    store.save_silver("TEST3", [{"date": "2025-06-27", "close": 38.0, "volume": 5_000_000.0, "volume_ma_20": 4_200_000.0}])
+
+    predictive = inference.PredictiveService.__new__(inference.PredictiveService)
+    predictive.model = RecordingModel()
+    predictive.feature_names = ["close", "volume", "volume_ma_20", "close_ma_20"]
+    predictive.horizon_days = 90
+    predictive.model_version = "test"
+    predictive.store = store
+    predictive._max_cache_entries = 16
+    predictive._score_cache = OrderedDict()
+    predictive._silver_rows = {}
+    predictive._lock = threading.Lock()
+    return predictive
+
+
+def test_snapshot_without_volume_skips_volume_features():
+    features = inference.PredictiveService._snapshot_features({"history": backend_history()})
+    assert "close_ma_20" in features
+    assert "volume" not in features
+    assert "volume_ma_20" not in features
+
+
+def test_volume_features_fall_back_to_silver(service):
+    result = service.predict_score("TEST3", {"history": backend_history()})
+
+    assert result["source"] == "snapshot+silver"
+    assert set(result["silverFeatures"]) == {"volume", "volume_ma_20"}
+    close, volume, volume_ma_20, _ = service.model.vectors[-1]
+    assert volume == 5_000_000.0
+    assert volume_ma_20 == 4_200_000.0
+    assert close == pytest.approx(30 + 89 * 0.1)
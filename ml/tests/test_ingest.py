@@ -0,0 +1,101 @@
+import asyncio
+import math
+from datetime import datetime, timedelta
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+pytest.importorskip("pyarrow")
+pytest.importorskip("httpx")
+pytest.importorskip("dotenv")
+
+from ml import feature_store, ingest  # noqa: E402
+from ml.config import Settings  # noqa: E402
+
+
+def make_history(days: int) -> list[dict]:
+    dates = pd.bdate_range(end=datetime.utcnow().date(), periods=days)
+    return [
+        {
+            "price_date": date.strftime("%Y-%m-%d"),
+            "close": 20 + 3 * math.sin(index / 9) + index * 0.01,
+            "volume": 1_000_000 + index,
+        }
+        for index, date in enumerate(dates)
+    ]
+
+
+class FakeClient:
+    """Imita a Tradebox: ignora `range` e o cliente recorta pelo início da janela."""
+
+    def __init__(self, history: list[dict]) -> None:
+        self.history = history
+        self.calls: list[dict] = []
+
+    async def fetch_asset_bundle(self, symbol, range_days=None, since=None):
+        self.calls.append({"range_days": range_days, "since": since})
+        if since:
+            start = (datetime.fromisoformat(since[:10]) - timedelta(days=5)).strftime("%Y-%m-%d")
+        else:
+            start = (datetime.utcnow() - timedelta(days=range_days)).strftime("%Y-%m-%d")
+        data = [item for item in self.history if item["price_date"] >= start]
+        ok = {"ok": True}
+        return {
+            "symbol": symbol,
+            "histories": {"data": data},
+            "fundamentals": {"data": [{}]},
+            "fetch_status": {"histories": ok, "fundamentals": ok},
+        }
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(feature_store, "settings", Settings(data_root=tmp_path))
+    return feature_store.FeatureStore()
+
+
+def test_full_load_keeps_window_after_warmup():
+    history = make_history(600)
+    start_date = history[400]["price_date"]
+    rows = feature_store.bundle_to_feature_rows({"symbol": "TEST3", "histories": {"data": history}}, start_date)
+    assert len(rows) == 200
+    assert min(str(row["date"]) for row in rows) == start_date
+
+
+def test_short_silver_falls_back_to_full_ingest(store):
+    history = make_history(400)
+    seeded = feature_store.bundle_to_feature_rows({"symbol": "TEST3", "histories": {"data": history[:-10]}})
+    assert 0 < len(seeded) < feature_store.LONGEST_INDICATOR_WINDOW
+    store.save_silver("TEST3", seeded)
+    store.set_watermark("TEST3", max(str(row["date"]) for row in seeded))
+
+    client = FakeClient(history)
+    report = asyncio.run(ingest.ingest_symbol("TEST3", client, store, range_days=365))
+
+    assert report["status"] == "ok"
+    assert report["mode"] == "completo"
+    assert client.calls[0]["since"] is None
+    assert store.get_watermark("TEST3") == history[-1]["price_date"]
+    assert store.latest_silver_date("TEST3") == history[-1]["price_date"]
+
+
+def test_full_refresh_keeps_partitions_older_than_window(store):
+    history = make_history(1000)
+    seeded = feature_store.bundle_to_feature_rows({"symbol": "TEST3", "histories": {"data": history}})
+    store.save_silver("TEST3", seeded)
+    oldest = min(str(row["date"]) for row in seeded)
+    older_years = {year for year in store.silver_partitions("TEST3") if year < history[-300]["price_date"][:4]}
+    assert older_years
+
+    # A origem removeu um pregão dentro da janela
+    removed = history[-20]["price_date"]
+    client = FakeClient([item for item in history if item["price_date"] != removed])
+    report = asyncio.run(ingest.ingest_symbol("TEST3", client, store, range_days=365, full_refresh=True))
+
+    assert report["status"] == "ok"
+    silver = store.load_symbol_silver("TEST3")
+    dates = set(silver["date"].astype(str))
+    assert oldest in dates
+    assert removed not in dates
+    assert older_years <= set(store.silver_partitions("TEST3"))
+    assert len(silver) == len(seeded) - 1
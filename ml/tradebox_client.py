@@ -1,36 +1,224 @@
 from __future__ import annotations
 
-from typing import Any, Dict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Dict, FrozenSet, Optional, Tuple
 import asyncio
+import os
+import random
+import time
 
 import httpx
 
 from .config import settings
+from .rate_limit import AsyncTokenBucket
+
+# Status que valem nova tentativa (cota estourada ou erro do servidor)
+RETRYABLE_STATUS = frozenset({429, 500, 502, 503, 504})
+
+ENDPOINTS = ("info", "intraday", "histories", "fundamentals")
+# Sem estes endpoints o silver sairia vazio ou sem fundamentals: falha explícita em vez de dado incompleto.
+# Os demais (info, intraday) são opcionais e degradam para None no bundle.
+REQUIRED_ENDPOINTS = ("histories", "fundamentals")
+
+# Dias antes do watermark mantidos na busca incremental (feriados/ajustes do último pregão)
+HISTORY_SLACK_DAYS = 5
+
+
+def trim_history(payload: Any, start_date: str, status: Dict[str, Any]) -> Any:
+    """
+    Mantém em `payload["data"]` só os pregões com data >= `start_date` (AAAA-MM-DD).
+    Registra em `status` quantas linhas vieram da API e quantas ficaram.
+    """
+    if not isinstance(payload, dict) or not isinstance(payload.get("data"), list):
+        return payload
+    rows = payload["data"]
+    kept = [
+        item
+        for item in rows
+        if isinstance(item, dict) and str(item.get("price_date") or item.get("date") or "")[:10] >= start_date
+    ]
+    status["rows_received"] = len(rows)
+    status["rows_kept"] = len(kept)
+    return {**payload, "data": kept}
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """Política de novas tentativas de um endpoint."""
+
+    max_retries: int = 3
+    backoff_seconds: float = 1.0
+    max_backoff_seconds: float = 30.0
+    retry_statuses: FrozenSet[int] = field(default=RETRYABLE_STATUS)
+
+    def delay(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        delay = min(self.backoff_seconds * (2 ** (attempt - 1)), self.max_backoff_seconds)
+        if retry_after and retry_after.isdigit():
+            delay = max(delay, float(retry_after))
+        # Jitter para as tentativas concorrentes não baterem juntas de novo
+        return delay * random.uniform(0.5, 1.5)
+
+
+def default_retry_policies() -> Dict[str, RetryPolicy]:
+    """
+    Política por endpoint a partir de settings; TRADEBOX_MAX_RETRIES_<ENDPOINT>
+    (ex.: TRADEBOX_MAX_RETRIES_HISTORIES=5) sobrescreve o número de tentativas.
+    """
+    policies: Dict[str, RetryPolicy] = {}
+    for endpoint in ENDPOINTS:
+        max_retries = int(os.getenv(f"TRADEBOX_MAX_RETRIES_{endpoint.upper()}", settings.tradebox_max_retries))
+        policies[endpoint] = RetryPolicy(max_retries=max_retries, backoff_seconds=settings.tradebox_backoff_seconds)
+    return policies
 
 
 class TradeboxClient:
     """
-    Cliente assíncrono simples para buscar blocos de dados diretamente da Tradebox.
-    Reutiliza autenticação Basic Auth e permite adicionar novos endpoints facilmente.
+    Cliente assíncrono para buscar blocos de dados diretamente da Tradebox.
+
+    Usado como context manager, mantém um único pool de conexões (HTTP/2 quando
+    o pacote `h2` está instalado) durante toda a ingestão. Toda requisição passa
+    pelo rate limiter e é refeita conforme a RetryPolicy do endpoint; o bundle
+    traz o status de cada endpoint em `fetch_status`.
+
+        async with TradeboxClient() as client:
+            bundle = await client.fetch_asset_bundle("PETR4")
     """
 
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        rate_limiter: AsyncTokenBucket | None = None,
+        retry_policies: Dict[str, RetryPolicy] | None = None,
+    ) -> None:
         self._auth = httpx.BasicAuth(settings.tradebox_user, settings.tradebox_pass)
         self._base_url = settings.tradebox_base_url.rstrip("/")
         self._timeout = httpx.Timeout(30.0)
+        # Compartilhado por todas as requisições da ingestão para respeitar a cota da Tradebox
+        self._rate_limiter = rate_limiter or AsyncTokenBucket.per_minute(
+            settings.tradebox_requests_per_minute, settings.tradebox_burst
+        )
+        self._retry_policies = {**default_retry_policies(), **(retry_policies or {})}
+        self._client: httpx.AsyncClient | None = None
+
+    def _build_client(self) -> httpx.AsyncClient:
+        try:
+            import h2  # noqa: F401
 
-    async def fetch_asset_bundle(self, symbol: str, range_days: int | None = None) -> Dict[str, Any]:
+            http2 = True
+        except ImportError:
+            http2 = False
+        return httpx.AsyncClient(
+            auth=self._auth,
+            timeout=self._timeout,
+            limits=httpx.Limits(
+                max_connections=max(4, settings.concurrent_requests * len(ENDPOINTS)),
+                max_keepalive_connections=max(4, settings.concurrent_requests * len(ENDPOINTS)),
+            ),
+            http2=http2,
+        )
+
+    async def __aenter__(self) -> "TradeboxClient":
+        if self._client is None:
+            self._client = self._build_client()
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _attempt(
+        self, client: httpx.AsyncClient, url: str, policy: RetryPolicy, status: Dict[str, Any]
+    ) -> Tuple[Any, bool, Optional[str]]:
+        """
+        Uma tentativa: (json ou None, vale retry, Retry-After). Erros de rede,
+        de status, de decodificação e JSON inválido viram `status["error"]`;
+        nada de httpx/JSON escapa daqui.
+        """
+        try:
+            response = await client.get(url)
+            status["http_status"] = response.status_code
+            if response.status_code != 200:
+                status["error"] = f"HTTP {response.status_code}"
+                return None, response.status_code in policy.retry_statuses, response.headers.get("Retry-After")
+            payload = response.json()
+        except httpx.TransportError as exc:
+            # Conexão, timeout, protocolo: transitórios
+            status["error"] = f"{type(exc).__name__}: {exc}"
+            return None, True, None
+        except httpx.HTTPError as exc:
+            # Decodificação, redirects etc.: repetir não resolve
+            status["error"] = f"{type(exc).__name__}: {exc}"
+            return None, False, None
+        except ValueError as exc:
+            status["error"] = f"JSON inválido: {exc}"
+            return None, False, None
+        status["ok"] = True
+        status["error"] = None
+        return payload, False, None
+
+    async def _get(self, client: httpx.AsyncClient, endpoint: str, url: str) -> Tuple[Any, Dict[str, Any]]:
+        """Retorna (json ou None, status estruturado do endpoint), refazendo conforme a RetryPolicy."""
+        policy = self._retry_policies.get(endpoint) or RetryPolicy()
+        status: Dict[str, Any] = {"ok": False, "http_status": None, "attempts": 0, "error": None}
+        started = time.perf_counter()
+
+        while True:
+            status["attempts"] += 1
+            await self._rate_limiter.acquire()
+            payload, retryable, retry_after = await self._attempt(client, url, policy, status)
+            if status["ok"] or not retryable or status["attempts"] > policy.max_retries:
+                break
+
+            delay = policy.delay(status["attempts"], retry_after)
+            print(
+                f"[TRADEBOX] {endpoint} ({status['error']}). "
+                f"Tentativa {status['attempts']}/{policy.max_retries} em {delay:.1f}s"
+            )
+            await asyncio.sleep(delay)
+
+        status["elapsed_s"] = round(time.perf_counter() - started, 3)
+        return payload, status
+
+    async def fetch_asset_bundle(
+        self,
+        symbol: str,
+        range_days: int | None = None,
+        since: str | None = None,
+    ) -> Dict[str, Any]:
         """
         Busca informações, históricos e fundamentals em paralelo.
 
         Args:
             symbol: código do ativo (ex.: PETR4)
             range_days: janela histórica em dias (default = settings.history_range_days)
+            since: watermark (último price_date já ingerido); quando informado,
+                só a cauda desde essa data é mantida, ignorando `range_days`
+
+        A API de históricos ignora `range` na prática (devolve a série inteira,
+        desde 1998) e o menor range aceito é "1mo". Por isso o recorte de fato
+        é feito aqui: `histories["data"]` chega ao chamador só com os pregões a
+        partir do início da janela (`since` menos uma folga, ou hoje - `range_days`).
+
+        Returns:
+            Bundle com um item por endpoint (None se falhou) e `fetch_status`
+            {endpoint: {"ok", "http_status", "attempts", "error", "elapsed_s"}}.
+            Falhas HTTP/JSON ficam só no status (quem chama decide, ver
+            REQUIRED_ENDPOINTS); exceções inesperadas só propagam dos obrigatórios.
         """
         symbol = symbol.upper()
         range_days = range_days or settings.history_range_days
-        # Tradebox aceita range no formato "1y", "6mo" ou datas absolutas.
-        # Converter range em meses aproximados para requests atuais.
+        if since:
+            # Folga de alguns dias para feriados/ajustes no último pregão
+            start_date = datetime.fromisoformat(str(since)[:10]) - timedelta(days=HISTORY_SLACK_DAYS)
+            range_days = max(1, (datetime.utcnow() - start_date).days)
+        else:
+            start_date = datetime.utcnow() - timedelta(days=range_days)
+        # Tradebox documenta range no formato "1y", "6mo" ou datas absolutas; mandamos
+        # meses aproximados (mínimo "1mo"), mas o recorte vale pelo filtro abaixo.
         months = max(1, int(range_days / 30))
         range_param = f"{months}mo"
 
@@ -41,24 +229,30 @@ class TradeboxClient:
             "fundamentals": f"{self._base_url}/assetFundamentals/{symbol}",
         }
 
-        async with httpx.AsyncClient(timeout=self._timeout) as client:
-            tasks = [client.get(url, auth=self._auth) for url in urls.values()]
-            responses = await asyncio.gather(*tasks, return_exceptions=True)
-
-        data_bundle: Dict[str, Any] = {"symbol": symbol}
-
-        for key, response in zip(urls.keys(), responses):
-            if isinstance(response, Exception):
-                data_bundle[key] = None
-                continue
-
-            if response.status_code != 200:
-                data_bundle[key] = None
-                continue
+        # return_exceptions: um erro inesperado num endpoint opcional não derruba o bundle
+        if self._client is not None:
+            results = await asyncio.gather(
+                *(self._get(self._client, key, url) for key, url in urls.items()), return_exceptions=True
+            )
+        else:
+            # Fora do context manager: pool temporário só para este ativo
+            async with self._build_client() as client:
+                results = await asyncio.gather(
+                    *(self._get(client, key, url) for key, url in urls.items()), return_exceptions=True
+                )
 
-            try:
-                data_bundle[key] = response.json()
-            except ValueError:
-                data_bundle[key] = None
+        data_bundle: Dict[str, Any] = {"symbol": symbol, "fetch_status": {}}
+        for key, result in zip(urls.keys(), results):
+            if isinstance(result, BaseException):
+                if key in REQUIRED_ENDPOINTS or not isinstance(result, Exception):
+                    raise result
+                print(f"[TRADEBOX] {symbol}: {key} ignorado ({type(result).__name__}: {result})")
+                error = f"{type(result).__name__}: {result}"
+                result = (None, {"ok": False, "http_status": None, "attempts": 1, "error": error})
+            payload, status = result
+            if key == "histories" and payload:
+                payload = trim_history(payload, start_date.strftime("%Y-%m-%d"), status)
+            data_bundle[key] = payload
+            data_bundle["fetch_status"][key] = status
 
         return data_bundle
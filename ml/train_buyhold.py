@@ -15,6 +15,22 @@ try:
 except ImportError:
     from ml.feature_store import FeatureStore
 
+# Colunas técnicas padrão que sabemos que existem ou foram calculadas
+TECHNICAL_FEATURES = [
+    "close_ma_20", "close_ma_50", "close_ma_200", # Médias Longas
+    "rsi_14", "macd_hist", "bollinger_pband",     # Osciladores
+    "volatility_30", "momentum_10",               # Risco/Tendência
+    "volume_ma_20"
+]
+
+
+def training_columns(store: FeatureStore) -> List[str]:
+    """Colunas do silver que o treino usa: preço (alvo) + features técnicas e fund_*."""
+    available = store.silver_columns()
+    fundamental_cols = [c for c in available if c.startswith("fund_")]
+    return ["close"] + [c for c in TECHNICAL_FEATURES if c in available] + fundamental_cols
+
+
 def engineer_targets(df: pd.DataFrame, horizon_days: int = 90) -> Tuple[pd.DataFrame, np.ndarray, List[str], pd.Series]:
     """
     Cria a variável alvo (retorno futuro) e prepara as features.
@@ -37,14 +53,8 @@ def engineer_targets(df: pd.DataFrame, horizon_days: int = 90) -> Tuple[pd.DataF
     df = df.dropna(subset=["target_return"])
     
     # 5. Seleção de Features (Técnicas + Fundamentos)
-    # Definimos as colunas técnicas padrão que sabemos que existem ou foram calculadas
-    technical_cols = [
-        "close_ma_20", "close_ma_50", "close_ma_200", # Médias Longas
-        "rsi_14", "macd_hist", "bollinger_pband",     # Osciladores
-        "volatility_30", "momentum_10",               # Risco/Tendência
-        "volume_ma_20"
-    ]
-    
+    technical_cols = TECHNICAL_FEATURES
+
     # Pegamos dinamicamente todas as colunas de fundamentos (começam com fund_)
     fundamental_cols = [c for c in df.columns if c.startswith("fund_")]
     
@@ -87,7 +97,8 @@ if __name__ == "__main__":
     
     print("[TRAIN] Carregando dados da Feature Store (Silver)...")
     try:
-        df = store.load_silver_dataset()
+        # Leitura colunar: só as colunas de alvo e features, sem o restante do silver
+        df = store.load_silver_dataset(columns=training_columns(store))
     except FileNotFoundError:
         print("❌ Erro: Nenhum dado encontrado. Rode 'python -m ml.ingest --range-days 10000' primeiro.")
         exit(1)
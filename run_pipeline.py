@@ -4,6 +4,7 @@ import argparse
 import subprocess
 import sys
 from datetime import datetime, timedelta
+from pathlib import Path
 
 
 def run_step(name: str, command: list[str]) -> None:
@@ -17,12 +18,17 @@ def run_step(name: str, command: list[str]) -> None:
 
 
 def main() -> None:
-    parser = argparse.ArgumentParser(description="Pipeline completo Taze AI (ingest + train + inference)")
+    parser = argparse.ArgumentParser(description="Pipeline completo Taze AI (ingest + train + inference + análises IA)")
     parser.add_argument(
         "--skip-train",
         action="store_true",
         help="Pula a etapa de treinamento (útil para testes rápidos).",
     )
+    parser.add_argument(
+        "--skip-ai",
+        action="store_true",
+        help="Pula a geração das análises de IA em lote (GPT-4o).",
+    )
     args = parser.parse_args()
 
     print("🚀 Iniciando pipeline Taze AI\n")
@@ -43,6 +49,13 @@ def main() -> None:
     # Step 3: Inference
     run_step("Inferência / geração de sinais", [sys.executable, "-m", "ml.inference"])
 
+    # Step 4: Análises de IA em lote (cache + Signal), para o dia começar com cache quente
+    if args.skip_ai:
+        print("⏭️  Análises de IA ignoradas por --skip-ai\n")
+    else:
+        batch_script = str(Path(__file__).resolve().parent / "backend" / "batch_analysis.py")
+        run_step("Análises de IA em lote", [sys.executable, batch_script])
+
     print("\n✅ Pipeline concluído com sucesso! Acesse http://localhost:3000/admin para validar.")
 
 